@@ -0,0 +1,89 @@
+"""
+Memory footprint of the in-memory view history.
+
+Compares the previous `defaultdict(OrderedDict)` layout with the array-backed
+`InMemoryLastViewCache` by filling both with the same views.
+
+    PYTHONPATH=src python benchmarks/last_view_memory.py --users 100000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from collections import OrderedDict, defaultdict
+
+from tg_wiki.cache.in_memory.last_view import InMemoryLastViewCache
+
+
+class OrderedDictLastViewCache:
+    """The implementation replaced by InMemoryLastViewCache."""
+
+    def __init__(self, max_articles_per_user: int = 20) -> None:
+        self._max_articles_per_user = max_articles_per_user
+        self._lru: dict[int, OrderedDict[int, None]] = defaultdict(OrderedDict)
+
+    async def get(self, user_id: int) -> list[int]:
+        return list(self._lru[user_id].keys())
+
+    async def update(self, user_id: int, pageid: int) -> None:
+        user_cache = self._lru[user_id]
+        user_cache[pageid] = None
+        user_cache.move_to_end(pageid)
+        while len(user_cache) > self._max_articles_per_user:
+            user_cache.popitem(last=False)
+
+
+async def fill(cache, users: int, views: int, seed: int) -> float:
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for user_id in range(users):
+        for _ in range(views):
+            await cache.update(user_id, rng.randrange(1, 10_000_000))
+    return time.perf_counter() - started
+
+
+async def measure(name: str, factory, users: int, views: int, seed: int) -> None:
+    # timed separately: tracemalloc slows down every allocation
+    elapsed = await fill(factory(), users, views, seed)
+
+    tracemalloc.start()
+    cache = factory()
+    await fill(cache, users, views, seed)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<12} {current / 2**20:8.1f} MiB  peak {peak / 2**20:8.1f} MiB  "
+        f"{current / users:7.0f} B/user  fill {elapsed:6.2f} s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--views", type=int, default=25, help="views per user")
+    parser.add_argument("--history", type=int, default=20, help="pageids kept per user")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.views} views each, history {args.history}")
+    await measure(
+        "ordereddict",
+        lambda: OrderedDictLastViewCache(args.history),
+        args.users,
+        args.views,
+        args.seed,
+    )
+    await measure(
+        "array",
+        lambda: InMemoryLastViewCache(args.history, max_users=args.users),
+        args.users,
+        args.views,
+        args.seed,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
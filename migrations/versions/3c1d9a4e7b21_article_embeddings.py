@@ -0,0 +1,58 @@
+"""article embeddings
+
+Revision ID: 3c1d9a4e7b21
+Revises: 692fe7020bd8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c1d9a4e7b21"
+down_revision: Union[str, Sequence[str], None] = "692fe7020bd8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "article_embeddings",
+        sa.Column("lang", sa.Text(), nullable=False),
+        sa.Column("pageid", sa.BigInteger(), nullable=False),
+        sa.Column("embedding", Vector(dim=1536), nullable=False),
+        sa.Column("model", sa.Text(), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            onupdate=sa.func.now(),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("lang", "pageid"),
+    )
+    # HNSW keeps nearest-neighbour queries at a few milliseconds for millions
+    # of rows; cosine distance matches normalized embeddings
+    op.create_index(
+        "ix_article_embeddings_embedding_hnsw",
+        "article_embeddings",
+        ["embedding"],
+        unique=False,
+        postgresql_using="hnsw",
+        postgresql_with={"m": 16, "ef_construction": 64},
+        postgresql_ops={"embedding": "vector_cosine_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_article_embeddings_embedding_hnsw", table_name="article_embeddings"
+    )
+    op.drop_table("article_embeddings")
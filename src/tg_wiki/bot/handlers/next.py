@@ -1,5 +1,4 @@
 import html
-import asyncio
 
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -36,14 +35,12 @@ async def next_handler(
         await message.answer(msg.ERR_NO_USERID)
         return
 
-    user_id = await settings_service.ensure_telegram_user(tg_user_id)
-
-    settings, article = await asyncio.gather(
-        settings_service.get_settings(user_id),
-        reco_service.get_next_article(user_id),
+    ctx = await settings_service.load_telegram_context(tg_user_id)
+    settings = ctx.settings
+    article = await reco_service.get_next_article(
+        ctx.user_id, recent=ctx.recent, settings=settings
     )
 
-    article = await reco_service.get_next_article(user_id)
     if not article:
         await message.answer(msg.ERR_NETWORK)
         return
@@ -33,24 +33,27 @@ async def select_callback_handler(
     if not tg_user_id:
         await callback.answer(msg.ERR_NO_USERID)
         return
-    user_id = await settings_service.ensure_telegram_user(tg_user_id)
-    settings = await settings_service.get_settings(user_id)
+    ctx = await settings_service.load_telegram_context(tg_user_id)
+    user_id, settings = ctx.user_id, ctx.settings
 
     page_num = 1
     page_len = settings.page_len
     is_edit = False
 
-    if len(data) == 2:
-        pageid = int(data[1])
-    elif len(data) == 3:
-        page_num = int(data[1])
-        pageid = int(data[2])
-    elif len(data) == 4:
-        page_num = int(data[1])
-        page_len = int(data[2])
-        pageid = int(data[3])
-        is_edit = True
-    else:
+    try:
+        if len(data) == 2:
+            pageid = int(data[1])
+        elif len(data) == 3:
+            page_num = int(data[1])
+            pageid = int(data[2])
+        elif len(data) == 4:
+            page_num = int(data[1])
+            page_len = int(data[2])
+            pageid = int(data[3])
+            is_edit = True
+        else:
+            raise ValueError(callback.data)
+    except ValueError:
         await callback.answer(msg.ERR_BAD_INPUT)
         return
 
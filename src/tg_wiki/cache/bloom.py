@@ -0,0 +1,108 @@
+import hashlib
+import math
+
+from dataclasses import dataclass
+
+
+def key_hashes(key: int) -> tuple[int, int]:
+    """
+    Returns the two 32-bit hashes `key`'s bit offsets are derived from.
+
+    They are small enough for (h1 + i * h2) to stay exact in the doubles of
+    Redis Lua scripts, so the same offsets can be computed server-side.
+    """
+    digest = hashlib.blake2b(
+        int(key).to_bytes(8, "little", signed=True), digest_size=8
+    ).digest()
+    h1 = int.from_bytes(digest[:4], "little")
+    h2 = int.from_bytes(digest[4:], "little") | 1
+    return h1, h2
+
+
+@dataclass(frozen=True, slots=True)
+class BloomParams:
+    """Size and hash count of a Bloom filter over integer keys."""
+
+    bits: int
+    hashes: int
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float) -> "BloomParams":
+        """
+        Sizes a filter to hold `capacity` keys at the given false-positive rate.
+
+        Args:
+            capacity: The expected number of keys.
+            fp_rate: The acceptable false-positive rate, e.g. 0.001.
+
+        Returns:
+            The optimal BloomParams.
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < fp_rate < 1:
+            raise ValueError("fp_rate must be in (0, 1)")
+        bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        return cls(bits=bits, hashes=hashes)
+
+    @property
+    def size_bytes(self) -> int:
+        return (self.bits + 7) // 8
+
+    def positions(self, key: int) -> list[int]:
+        """Returns the bit offsets of `key` (Kirsch-Mitzenmacher double hashing)."""
+        h1, h2 = key_hashes(key)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+
+@dataclass(frozen=True, slots=True)
+class ScalableBloomParams:
+    """
+    Generations of a filter that starts small and doubles while it fills up.
+
+    Generation i holds `initial_capacity * 2**i` keys, the last one holds
+    `capacity`. Smaller generations get a tighter false-positive rate, so
+    that all of them together stay within `fp_rate`, and a casual user's
+    filter takes a few hundred bytes instead of the full size.
+    """
+
+    capacities: tuple[int, ...]
+    generations: tuple[BloomParams, ...]
+
+    @classmethod
+    def for_capacity(
+        cls, capacity: int, fp_rate: float, initial_capacity: int = 256
+    ) -> "ScalableBloomParams":
+        """
+        Plans the generations of a filter.
+
+        Args:
+            capacity: The number of keys of the last (full-size) generation.
+            fp_rate: The false-positive rate of the full-size generation and
+                the bound for all smaller generations together.
+            initial_capacity: The number of keys of the first generation.
+
+        Returns:
+            The ScalableBloomParams.
+        """
+        if initial_capacity <= 0:
+            raise ValueError("initial_capacity must be positive")
+        capacities = [min(initial_capacity, capacity)]
+        while capacities[-1] < capacity:
+            capacities.append(min(2 * capacities[-1], capacity))
+
+        last = len(capacities) - 1
+        generations = tuple(
+            BloomParams.for_capacity(c, fp_rate / 2 ** (last - i))
+            for i, c in enumerate(capacities)
+        )
+        return cls(capacities=tuple(capacities), generations=generations)
+
+    @property
+    def levels(self) -> int:
+        return len(self.generations)
+
+    @property
+    def full(self) -> BloomParams:
+        return self.generations[-1]
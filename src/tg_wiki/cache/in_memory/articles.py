@@ -1,25 +1,312 @@
+import random
+import sys
+import time
+
 from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
 from typing import Optional
 
+from tg_wiki.cache.ports import ArticleEntry, ArticleObserver
 from tg_wiki.domain.article import Article
+from .sketch import FrequencySketch
+
+
+# rough per-entry overhead of the dataclasses, dict slots and bookkeeping
+ENTRY_OVERHEAD = 400
+# average entry size used to size the frequency sketch
+EXPECTED_ENTRY_SIZE = 2048
+
+
+def article_size(article: Article) -> int:
+    """Approximates the memory held by a cached article, in bytes."""
+    size = ENTRY_OVERHEAD
+    for value in (
+        article.meta.title,
+        article.meta.url,
+        article.meta.thumbnail_url,
+        article.extract,
+        article.lang,
+    ):
+        if value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    admission_rejects: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass(slots=True)
+class _Entry:
+    article: Article
+    size: int
+    expires_at: Optional[float]
+    stored_at: float
+
+
+class _Segment:
+    __slots__ = ("items", "bytes")
+
+    def __init__(self) -> None:
+        self.items: OrderedDict[int, _Entry] = OrderedDict()
+        self.bytes = 0
+
+    def add(self, pageid: int, entry: _Entry) -> None:
+        self.items[pageid] = entry
+        self.bytes += entry.size
+
+    def remove(self, pageid: int) -> _Entry:
+        entry = self.items.pop(pageid)
+        self.bytes -= entry.size
+        return entry
+
+    def pop_lru(self) -> tuple[int, _Entry]:
+        pageid, entry = self.items.popitem(last=False)
+        self.bytes -= entry.size
+        return pageid, entry
 
 
 class InMemoryArticleCache:
-    def __init__(self, max_articles: int = 200) -> None:
-        if max_articles <= 0:
-            raise ValueError("max_articles must be positive")
-        self._max_articles = max_articles
-        self._lru: OrderedDict[int, Article] = OrderedDict()
+    """
+    Byte-budgeted W-TinyLFU article cache.
+
+    New entries land in a small LRU window. Entries leaving the window compete
+    with the main segment's eviction victim and are only admitted if the
+    frequency sketch says they are more popular, so one-shot scans (random
+    `/next` articles) cannot flush frequently requested pages. The main segment
+    is a segmented LRU (probation + protected).
+
+    An optional observer is told about every stored, evicted, rejected and
+    expired entry (e.g. to keep a vector index over the cached articles).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        *,
+        ttl: Optional[float] = None,
+        window_ratio: float = 0.01,
+        protected_ratio: float = 0.8,
+        negative_ttl: float = 300,
+        max_missing: int = 10000,
+        observer: Optional[ArticleObserver] = None,
+    ) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if negative_ttl <= 0:
+            raise ValueError("negative_ttl must be positive")
+        if max_missing <= 0:
+            raise ValueError("max_missing must be positive")
+        if not 0 < window_ratio < 1:
+            raise ValueError("window_ratio must be in (0, 1)")
+        if not 0 < protected_ratio < 1:
+            raise ValueError("protected_ratio must be in (0, 1)")
+
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._window_max = max(1, int(max_bytes * window_ratio))
+        self._main_max = max_bytes - self._window_max
+        self._protected_max = int(self._main_max * protected_ratio)
+
+        self._window = _Segment()
+        self._probation = _Segment()
+        self._protected = _Segment()
+        self._sketch = FrequencySketch(max(16, max_bytes // EXPECTED_ENTRY_SIZE))
+        self._negative_ttl = negative_ttl
+        self._max_missing = max_missing
+        self._missing: OrderedDict[tuple[str, int], float] = OrderedDict()
+        self._observer = observer
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return (
+            len(self._window.items)
+            + len(self._probation.items)
+            + len(self._protected.items)
+        )
+
+    @property
+    def bytes(self) -> int:
+        return self._window.bytes + self._probation.bytes + self._protected.bytes
+
+    def _segment_of(self, pageid: int) -> Optional[_Segment]:
+        for segment in (self._window, self._probation, self._protected):
+            if pageid in segment.items:
+                return segment
+        return None
+
+    def _removed(self, pageid: int) -> None:
+        if self._observer is not None:
+            self._observer.removed(pageid)
+
+    def _evicted(self, pageid: int, entry: _Entry) -> None:
+        self.stats.evictions += 1
+        self._removed(pageid)
+
+    def _rejected(self, pageid: int, entry: _Entry) -> None:
+        self.stats.admission_rejects += 1
+        self._removed(pageid)
+
+    def _admit_from_window(self) -> None:
+        while self._window.bytes > self._window_max and self._window.items:
+            pageid, candidate = self._window.pop_lru()
+            self._probation.add(pageid, candidate)
+            self._evict_main(pageid)
+
+    def _victim(self, candidate_id: int) -> Optional[tuple[_Segment, int]]:
+        for pageid in islice(self._probation.items, 2):
+            if pageid != candidate_id:
+                return self._probation, pageid
+        for pageid in self._protected.items:
+            return self._protected, pageid
+        return None
+
+    def _evict_main(self, candidate_id: int) -> None:
+        """Shrinks the main segment, letting the candidate duel each victim."""
+        while self._probation.bytes + self._protected.bytes > self._main_max:
+            victim = self._victim(candidate_id)
+            candidate_pending = candidate_id in self._probation.items
+            if victim is None or (
+                candidate_pending
+                and self._sketch.frequency(candidate_id)
+                <= self._sketch.frequency(victim[1])
+            ):
+                if candidate_pending:
+                    entry = self._probation.remove(candidate_id)
+                    self._rejected(candidate_id, entry)
+                    continue
+                return
+
+            segment, victim_id = victim
+            self._evicted(victim_id, segment.remove(victim_id))
+
+    def _promote(self, pageid: int) -> None:
+        entry = self._probation.remove(pageid)
+        self._protected.add(pageid, entry)
+        while self._protected.bytes > self._protected_max and self._protected.items:
+            demoted_id, demoted = self._protected.pop_lru()
+            self._probation.add(demoted_id, demoted)
+            self._probation.items.move_to_end(demoted_id, last=False)
 
     async def get(self, pageid: int) -> Optional[Article]:
-        item = self._lru.get(pageid)
-        if item is None:
+        entry = self._lookup(pageid)
+        return entry.article if entry is not None else None
+
+    async def get_entry(self, pageid: int) -> Optional[ArticleEntry]:
+        entry = self._lookup(pageid)
+        if entry is None:
+            return None
+        return ArticleEntry(article=entry.article, stored_at=entry.stored_at)
+
+    async def touch(self, pageid: int, *, lang: str = "ru") -> None:
+        segment = self._segment_of(pageid)
+        if segment is None:
+            return
+        entry = segment.items[pageid]
+        if entry.article.lang != lang:
+            return
+        entry.stored_at = time.time()
+        if self._ttl is not None:
+            entry.expires_at = time.monotonic() + self._ttl
+
+    def _lookup(self, pageid: int) -> Optional[_Entry]:
+        self._sketch.increment(pageid)
+
+        segment = self._segment_of(pageid)
+        if segment is None:
+            self.stats.misses += 1
+            return None
+
+        entry = segment.items[pageid]
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            segment.remove(pageid)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            self._removed(pageid)
             return None
-        self._lru.move_to_end(pageid)
-        return item
-
-    async def update(self, article: Article) -> None:
-        self._lru[article.meta.pageid] = article
-        self._lru.move_to_end(article.meta.pageid)
-        while len(self._lru) > self._max_articles:
-            self._lru.popitem(last=False)
+
+        self.stats.hits += 1
+        if segment is self._probation:
+            self._promote(pageid)
+        else:
+            segment.items.move_to_end(pageid)
+        return entry
+
+    async def is_missing(self, pageid: int, *, lang: str = "ru") -> bool:
+        key = (lang, pageid)
+        expires_at = self._missing.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._missing[key]
+            return False
+        return True
+
+    async def mark_missing(self, pageid: int, *, lang: str = "ru") -> None:
+        key = (lang, pageid)
+        self._missing[key] = time.monotonic() + self._negative_ttl
+        self._missing.move_to_end(key)
+        while len(self._missing) > self._max_missing:
+            self._missing.popitem(last=False)
+
+    async def update(self, article: Article, *, ttl: Optional[float] = None) -> None:
+        pageid = article.meta.pageid
+        self._missing.pop((article.lang, pageid), None)
+        ttl = ttl if ttl is not None else self._ttl
+        size = article_size(article)
+        entry = _Entry(
+            article=article,
+            size=size,
+            expires_at=time.monotonic() + ttl if ttl is not None else None,
+            stored_at=time.time(),
+        )
+
+        self._sketch.increment(pageid)
+        segment = self._segment_of(pageid)
+        if size > self._main_max:
+            if segment is not None:
+                segment.remove(pageid)
+            self._rejected(pageid, entry)
+            return
+
+        if self._observer is not None:
+            self._observer.added(article)
+        if segment is not None:
+            segment.remove(pageid)
+            segment.add(pageid, entry)
+            if segment is self._window:
+                self._admit_from_window()
+            else:
+                self._evict_main(-1)
+            return
+
+        self._window.add(pageid, entry)
+        self._admit_from_window()
+
+    async def update_many(self, articles: list[Article]) -> None:
+        for article in articles:
+            await self.update(article)
+
+    async def sample(self, n: int, *, lang: str = "ru") -> list[Article]:
+        now = time.monotonic()
+        items = [
+            entry.article
+            for segment in (self._window, self._probation, self._protected)
+            for entry in segment.items.values()
+            if entry.article.lang == lang
+            and (entry.expires_at is None or entry.expires_at > now)
+        ]
+        return random.sample(items, min(n, len(items)))
@@ -0,0 +1,42 @@
+from tg_wiki.cache.ports import (
+    ArticleCache,
+    LastViewCache,
+    SeenFilter,
+    UserContext,
+    UserIDCache,
+    UserSettingsCache,
+)
+from tg_wiki.domain.article import Article
+
+
+class InMemoryUserContextStore:
+    def __init__(
+        self,
+        *,
+        articles: ArticleCache,
+        last_view: LastViewCache,
+        user_settings: UserSettingsCache,
+        user_ids: UserIDCache,
+        seen: SeenFilter,
+    ) -> None:
+        self._articles = articles
+        self._last_view = last_view
+        self._user_settings = user_settings
+        self._user_ids = user_ids
+        self._seen = seen
+
+    async def load(self, provider: str, external_id: int) -> UserContext:
+        user_id = await self._user_ids.get(provider, external_id)
+        if user_id is None:
+            return UserContext()
+        settings = await self._user_settings.get(user_id)
+        recent = await self._last_view.get(user_id)
+        return UserContext(user_id=user_id, settings=settings, recent=tuple(recent))
+
+    async def record_view(
+        self, user_id: int, article: Article, *, store_article: bool = True
+    ) -> None:
+        await self._last_view.update(user_id, article.meta.pageid)
+        await self._seen.add(user_id, article.meta.pageid)
+        if store_article:
+            await self._articles.update(article)
@@ -1,19 +1,111 @@
-from collections import OrderedDict, defaultdict
+from array import array
+from collections import OrderedDict
+from typing import Optional, Sequence
 
 
 class InMemoryLastViewCache:
-    def __init__(self, max_articles_per_user: int = 20) -> None:
+    """
+    View history kept as fixed-size ring buffers in one `array('q')` slab.
+
+    Every tracked user owns a slot of `max_articles_per_user` int64 cells plus
+    a head and a length counter, so a full history costs 8 bytes per pageid
+    instead of an OrderedDict node. At most `max_users` users are tracked; the
+    least recently active one is evicted and their slot is reused.
+    """
+
+    def __init__(
+        self, max_articles_per_user: int = 20, max_users: int = 100_000
+    ) -> None:
         if max_articles_per_user <= 0:
             raise ValueError("max_articles_per_user must be positive")
+        if max_users <= 0:
+            raise ValueError("max_users must be positive")
         self._max_articles_per_user = max_articles_per_user
-        self._lru: dict[int, OrderedDict[int, None]] = defaultdict(OrderedDict)
+        self._max_users = max_users
+        self._slots: OrderedDict[int, int] = OrderedDict()
+        self._slab = array("q")
+        self._empty_slot = array("q", [0]) * max_articles_per_user
+        self._heads = array("I")
+        self._lens = array("I")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _find_slot(self, user_id: int) -> Optional[int]:
+        slot = self._slots.get(user_id)
+        if slot is not None:
+            self._slots.move_to_end(user_id)
+        return slot
+
+    def _allocate_slot(self, user_id: int) -> int:
+        if len(self._slots) >= self._max_users:
+            _, slot = self._slots.popitem(last=False)
+        else:
+            slot = len(self._heads)
+            self._slab.extend(self._empty_slot)
+            self._heads.append(0)
+            self._lens.append(0)
+        self._heads[slot] = 0
+        self._lens[slot] = 0
+        self._slots[user_id] = slot
+        return slot
+
+    def _contains(self, slot: int, pageid: int) -> bool:
+        start = slot * self._max_articles_per_user
+        return pageid in self._slab[start : start + self._lens[slot]]
+
+    def _window(self, slot: int) -> array:
+        """Returns the slot's pageids, oldest first."""
+        k = self._max_articles_per_user
+        start = slot * k
+        n = self._lens[slot]
+        if n < k:
+            return self._slab[start : start + n]
+        head = self._heads[slot]
+        return self._slab[start + head : start + k] + self._slab[start : start + head]
+
+    def _rewrite(self, slot: int, pageids: array) -> None:
+        k = self._max_articles_per_user
+        start = slot * k
+        self._slab[start : start + len(pageids)] = pageids
+        self._lens[slot] = len(pageids)
+        self._heads[slot] = len(pageids) % k
 
     async def get(self, user_id: int) -> list[int]:
-        return list(self._lru[user_id].keys())
+        slot = self._find_slot(user_id)
+        if slot is None:
+            return []
+        return self._window(slot).tolist()
+
+    async def record_if_unseen(
+        self, user_id: int, pageids: Sequence[int]
+    ) -> Optional[int]:
+        slot = self._slots.get(user_id)
+        for pageid in pageids:
+            if slot is None or not self._contains(slot, int(pageid)):
+                await self.update(user_id, pageid)
+                return int(pageid)
+        return None
 
     async def update(self, user_id: int, pageid: int) -> None:
-        user_cache = self._lru[user_id]
-        user_cache[pageid] = None
-        user_cache.move_to_end(pageid)
-        while len(user_cache) > self._max_articles_per_user:
-            user_cache.popitem(last=False)
+        pageid = int(pageid)
+        slot = self._find_slot(user_id)
+        if slot is None:
+            slot = self._allocate_slot(user_id)
+
+        k = self._max_articles_per_user
+        start = slot * k
+        n = self._lens[slot]
+        if self._contains(slot, pageid):
+            # a repeated view moves the pageid to the newest position
+            window = self._window(slot)
+            window.remove(pageid)
+            window.append(pageid)
+            self._rewrite(slot, window)
+            return
+
+        head = self._heads[slot]
+        self._slab[start + head] = pageid
+        self._heads[slot] = head + 1 if head + 1 < k else 0
+        if n < k:
+            self._lens[slot] = n + 1
@@ -0,0 +1,50 @@
+import time
+
+from collections import OrderedDict
+from typing import Optional
+
+from tg_wiki.domain.article import ArticleMeta
+
+
+class InMemorySearchCache:
+    def __init__(
+        self, max_queries: int = 1000, ttl: int = 3600, negative_ttl: int = 300
+    ) -> None:
+        if max_queries <= 0:
+            raise ValueError("max_queries must be positive")
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if negative_ttl <= 0:
+            raise ValueError("negative_ttl must be positive")
+        self._max_queries = max_queries
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._lru: OrderedDict[
+            tuple[str, str, int], tuple[float, tuple[ArticleMeta, ...]]
+        ] = OrderedDict()
+
+    async def get(
+        self, query: str, limit: int, *, lang: str = "ru"
+    ) -> Optional[list[ArticleMeta]]:
+        key = (lang, query, limit)
+
+        item = self._lru.get(key)
+        if item is None:
+            return None
+        expires_at, results = item
+        if expires_at <= time.monotonic():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return list(results)
+
+    async def update(
+        self, query: str, limit: int, results: list[ArticleMeta], *, lang: str = "ru"
+    ) -> None:
+        key = (lang, query, limit)
+
+        ttl = self._ttl if results else self._negative_ttl
+        self._lru[key] = (time.monotonic() + ttl, tuple(results))
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._max_queries:
+            self._lru.popitem(last=False)
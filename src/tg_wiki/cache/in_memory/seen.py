@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Sequence
+
+from tg_wiki.cache.bloom import BloomParams, ScalableBloomParams
+
+
+@dataclass(slots=True)
+class _UserFilter:
+    current: bytearray
+    level: int = 0
+    count: int = 0
+    # earlier generations still being tested, with their levels
+    older: list[tuple[int, bytearray]] = field(default_factory=list)
+
+
+class InMemorySeenFilter:
+    """
+    Per-user Bloom filters of every article shown to the user.
+
+    A new user's filter holds `initial_capacity` keys and doubles with every
+    new generation until one holds `capacity`. When that full-size generation
+    is full it becomes the previous one and the smaller ones are dropped, so
+    at least the last `capacity` views are always remembered while the
+    false-positive rate stays bounded. At most `max_users` users are tracked
+    (LRU).
+    """
+
+    def __init__(
+        self,
+        capacity: int = 20000,
+        fp_rate: float = 0.001,
+        *,
+        initial_capacity: int = 256,
+        max_users: int = 1000,
+    ) -> None:
+        if max_users <= 0:
+            raise ValueError("max_users must be positive")
+        self._params = ScalableBloomParams.for_capacity(
+            capacity, fp_rate, initial_capacity
+        )
+        self._max_users = max_users
+        self._users: OrderedDict[int, _UserFilter] = OrderedDict()
+
+    @property
+    def params(self) -> ScalableBloomParams:
+        return self._params
+
+    def _new(self, level: int) -> bytearray:
+        return bytearray(self._params.generations[level].size_bytes)
+
+    @staticmethod
+    def _test(params: BloomParams, bits: bytearray, pageid: int) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in params.positions(pageid))
+
+    async def add(self, user_id: int, pageid: int) -> None:
+        user = self._users.get(user_id)
+        if user is None:
+            user = _UserFilter(current=self._new(0))
+            self._users[user_id] = user
+            while len(self._users) > self._max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+
+        for p in self._params.generations[user.level].positions(pageid):
+            user.current[p >> 3] |= 1 << (p & 7)
+        user.count += 1
+        if user.count < self._params.capacities[user.level]:
+            return
+
+        if user.level + 1 < self._params.levels:
+            user.older.append((user.level, user.current))
+            user.level += 1
+        else:
+            user.older = [(user.level, user.current)]
+        user.current = self._new(user.level)
+        user.count = 0
+
+    async def contains_many(self, user_id: int, pageids: Sequence[int]) -> list[bool]:
+        user = self._users.get(user_id)
+        if user is None:
+            return [False] * len(pageids)
+
+        generations = [(user.level, user.current), *user.older]
+        out = []
+        for pageid in pageids:
+            out.append(
+                any(
+                    self._test(self._params.generations[level], bits, pageid)
+                    for level, bits in generations
+                )
+            )
+        return out
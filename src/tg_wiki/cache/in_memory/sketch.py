@@ -0,0 +1,57 @@
+_SEEDS = (
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+)
+_MASK64 = (1 << 64) - 1
+_MAX_COUNT = 15
+_HALVE = bytes(i >> 1 for i in range(256))
+
+
+class FrequencySketch:
+    """
+    Count-min sketch of 4-bit-like counters (saturating at 15) with aging.
+
+    After `sample_size` increments all counters are halved, so the estimate
+    reflects recent popularity rather than all-time counts (TinyLFU).
+    """
+
+    def __init__(self, capacity: int) -> None:
+        width = 16
+        while width < capacity:
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in _SEEDS]
+        self._sample_size = 10 * width
+        self._additions = 0
+
+    def _indexes(self, key: int) -> list[int]:
+        out = []
+        for seed in _SEEDS:
+            h = ((key + 1) * seed) & _MASK64
+            h ^= h >> 32
+            out.append(h & self._mask)
+        return out
+
+    def frequency(self, key: int) -> int:
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+    def increment(self, key: int) -> None:
+        indexes = self._indexes(key)
+        current = min(row[i] for row, i in zip(self._rows, indexes))
+        if current >= _MAX_COUNT:
+            return
+        # conservative update: only raise the counters holding the minimum
+        for row, i in zip(self._rows, indexes):
+            if row[i] == current:
+                row[i] = current + 1
+
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._reset()
+
+    def _reset(self) -> None:
+        for row in self._rows:
+            row[:] = row.translate(_HALVE)
+        self._additions //= 2
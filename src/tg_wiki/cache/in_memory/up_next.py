@@ -0,0 +1,72 @@
+import time
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+from tg_wiki.cache.ports import UpNextEntry
+from tg_wiki.domain.article import Article
+
+
+@dataclass(slots=True)
+class _Queue:
+    articles: deque[Article] = field(default_factory=deque)
+    used_at: float = 0.0
+
+
+class InMemoryUpNextQueue:
+    """
+    Per-user deques of precomputed next articles.
+
+    The articles themselves are kept, so queued entries survive eviction from
+    the in-memory article cache.
+
+    Queues of users idle for longer than `idle_ttl` are dropped, and at most
+    `max_users` queues are kept (least recently used first out).
+    """
+
+    def __init__(
+        self, *, max_len: int = 10, idle_ttl: float = 3600, max_users: int = 10000
+    ) -> None:
+        if max_len <= 0:
+            raise ValueError("max_len must be positive")
+        if idle_ttl <= 0:
+            raise ValueError("idle_ttl must be positive")
+        if max_users <= 0:
+            raise ValueError("max_users must be positive")
+        self._max_len = max_len
+        self._idle_ttl = idle_ttl
+        self._max_users = max_users
+        self._queues: OrderedDict[int, _Queue] = OrderedDict()
+
+    def _expire_idle(self, now: float) -> None:
+        while self._queues:
+            oldest = next(iter(self._queues.values()))
+            if now - oldest.used_at < self._idle_ttl:
+                break
+            self._queues.popitem(last=False)
+
+    async def pop(self, user_id: int) -> tuple[Optional[UpNextEntry], int]:
+        now = time.monotonic()
+        self._expire_idle(now)
+        queue = self._queues.get(user_id)
+        if queue is None or not queue.articles:
+            return None, 0
+        queue.used_at = now
+        self._queues.move_to_end(user_id)
+        article = queue.articles.popleft()
+        return UpNextEntry(article.meta.pageid, article), len(queue.articles)
+
+    async def push_many(self, user_id: int, articles: Sequence[Article]) -> int:
+        now = time.monotonic()
+        self._expire_idle(now)
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = _Queue(articles=deque(maxlen=self._max_len))
+            self._queues[user_id] = queue
+            while len(self._queues) > self._max_users:
+                self._queues.popitem(last=False)
+        queue.used_at = now
+        self._queues.move_to_end(user_id)
+        queue.articles.extend(articles)
+        return len(queue.articles)
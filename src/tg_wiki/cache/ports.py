@@ -1,10 +1,23 @@
-from typing import Protocol, Optional
+import time
+
+from typing import Protocol, Optional, Sequence
 from dataclasses import dataclass
 
-from tg_wiki.domain.article import Article
+from tg_wiki.domain.article import Article, ArticleMeta
 from tg_wiki.domain.user import UserSettings
 
 
+@dataclass(frozen=True, slots=True)
+class ArticleEntry:
+    article: Article
+    stored_at: float
+
+    @property
+    def age(self) -> float:
+        """Seconds since the entry was stored or last confirmed fresh."""
+        return max(0.0, time.time() - self.stored_at)
+
+
 class ArticleCache(Protocol):
     async def get(self, pageid: int) -> Optional[Article]:
         """
@@ -18,6 +31,52 @@ class ArticleCache(Protocol):
         """
         ...
 
+    async def get_entry(self, pageid: int) -> Optional[ArticleEntry]:
+        """
+        Retrieves an article together with the time it was stored.
+
+        Args:
+            pageid: The pageid of the article to retrieve.
+
+        Returns:
+            An ArticleEntry object, or None if the article is not found in the cache.
+        """
+        ...
+
+    async def touch(self, pageid: int, *, lang: str = "ru") -> None:
+        """
+        Marks a cached article as fresh again without rewriting it.
+
+        Args:
+            pageid: The pageid of the article to refresh.
+            lang: The wiki language of the article.
+        """
+        ...
+
+    async def is_missing(self, pageid: int, *, lang: str = "ru") -> bool:
+        """
+        Checks whether a pageid was recently found not to exist.
+
+        Args:
+            pageid: The pageid to check.
+            lang: The wiki language of the article.
+
+        Returns:
+            True if a negative entry for the pageid is cached.
+        """
+        ...
+
+    async def mark_missing(self, pageid: int, *, lang: str = "ru") -> None:
+        """
+        Remembers for a short time that a pageid does not exist or is not a
+        valid article. Storing the article later clears the mark.
+
+        Args:
+            pageid: The pageid that was not found.
+            lang: The wiki language of the article.
+        """
+        ...
+
     async def update(self, article: Article) -> None:
         """
         Stores an article in the cache.
@@ -28,6 +87,39 @@ class ArticleCache(Protocol):
         """
         ...
 
+    async def update_many(self, articles: list[Article]) -> None:
+        """
+        Stores several articles in the cache in one batch.
+
+        Args:
+            articles: The Article objects to store.
+        """
+        ...
+
+    async def sample(self, n: int, *, lang: str = "ru") -> list[Article]:
+        """
+        Retrieves up to n random cached articles.
+
+        Args:
+            n: The maximum number of articles to return.
+            lang: The wiki language of the articles.
+
+        Returns:
+            A list of cached Article objects, possibly empty.
+        """
+        ...
+
+
+class ArticleObserver(Protocol):
+    """
+    Notified as an in-process article holder (cache, pool) gains or drops
+    articles. Both calls may repeat for the same pageid.
+    """
+
+    def added(self, article: Article) -> None: ...
+
+    def removed(self, pageid: int) -> None: ...
+
 
 class LastViewCache(Protocol):
     async def get(self, user_id: int) -> list[int]:
@@ -42,6 +134,22 @@ class LastViewCache(Protocol):
         """
         ...
 
+    async def record_if_unseen(
+        self, user_id: int, pageids: Sequence[int]
+    ) -> Optional[int]:
+        """
+        Atomically picks the first candidate not in the user's recent history
+        and records it as viewed.
+
+        Args:
+            user_id: The user_id of the user.
+            pageids: Candidate pageids in order of preference.
+
+        Returns:
+            The recorded pageid, or None if every candidate was already seen.
+        """
+        ...
+
     async def update(self, user_id: int, pageid: int) -> None:
         """
         Stores a pageid in the cache for a given user.
@@ -99,9 +207,146 @@ class UserIDCache(Protocol):
         """
 
 
+class SearchCache(Protocol):
+    async def get(
+        self, query: str, limit: int, *, lang: str = "ru"
+    ) -> Optional[list[ArticleMeta]]:
+        """
+        Retrieves cached search results.
+
+        Args:
+            query: The normalized search query.
+            limit: The maximum number of results the search was made with.
+            lang: The wiki language the search was made in.
+
+        Returns:
+            A list of ArticleMeta objects, or None if the query is not cached.
+        """
+        ...
+
+    async def update(
+        self, query: str, limit: int, results: list[ArticleMeta], *, lang: str = "ru"
+    ) -> None:
+        """
+        Stores search results. Empty results are kept for a shorter time.
+
+        Args:
+            query: The normalized search query.
+            limit: The maximum number of results the search was made with.
+            results: The found articles in ranking order.
+            lang: The wiki language the search was made in.
+        """
+        ...
+
+
+class SeenFilter(Protocol):
+    async def add(self, user_id: int, pageid: int) -> None:
+        """
+        Remembers that an article was shown to a user.
+
+        Args:
+            user_id: The user_id of the user.
+            pageid: The pageid of the shown article.
+        """
+        ...
+
+    async def contains_many(self, user_id: int, pageids: Sequence[int]) -> list[bool]:
+        """
+        Tests a batch of candidates against everything shown to a user.
+
+        The answer is probabilistic: False is exact, True may be a false positive.
+
+        Args:
+            user_id: The user_id of the user.
+            pageids: The candidate pageids.
+
+        Returns:
+            One flag per candidate, True if it was (probably) shown before.
+        """
+        ...
+
+
+@dataclass(frozen=True, slots=True)
+class UpNextEntry:
+    pageid: int
+    # set by backends that keep the article itself; otherwise it is expected
+    # to be in the article cache
+    article: Optional[Article] = None
+
+
+class UpNextQueue(Protocol):
+    async def pop(self, user_id: int) -> tuple[Optional[UpNextEntry], int]:
+        """
+        Takes the next precomputed article for a user.
+
+        Args:
+            user_id: The user_id of the user.
+
+        Returns:
+            The entry (or None if the queue is empty) and the number of
+            entries left after the pop.
+        """
+        ...
+
+    async def push_many(self, user_id: int, articles: Sequence[Article]) -> int:
+        """
+        Appends articles to a user's queue. Backends that only store pageids
+        expect the articles to be in the article cache.
+
+        Args:
+            user_id: The user_id of the user.
+            articles: The articles to queue, in serving order.
+
+        Returns:
+            The queue length after the push.
+        """
+        ...
+
+
+@dataclass(frozen=True, slots=True)
+class UserContext:
+    user_id: Optional[int] = None
+    settings: Optional[UserSettings] = None
+    # None: the history was not loaded (e.g. the user id is not cached)
+    recent: Optional[tuple[int, ...]] = None
+
+
+class UserContextStore(Protocol):
+    async def load(self, provider: str, external_id: int) -> UserContext:
+        """
+        Retrieves everything an update needs about a user in one round-trip.
+
+        Args:
+            provider: The identity provider, e.g. "telegram".
+            external_id: The user's id at the provider.
+
+        Returns:
+            A UserContext; fields are None for whatever is not cached.
+        """
+        ...
+
+    async def record_view(
+        self, user_id: int, article: Article, *, store_article: bool = True
+    ) -> None:
+        """
+        Records a viewed article in the user's history and seen filter and,
+        optionally, stores the article itself, in one round-trip.
+
+        Args:
+            user_id: The user_id of the user who viewed the article.
+            article: The viewed article.
+            store_article: Whether the article should be written to the article cache.
+        """
+        ...
+
+
 @dataclass
 class Cache:
     articles: ArticleCache
     last_view: LastViewCache
     user_settings: UserSettingsCache
     user_ids: UserIDCache
+    search: SearchCache
+    context: UserContextStore
+    seen: SeenFilter
+    up_next: UpNextQueue
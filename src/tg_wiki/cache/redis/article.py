@@ -1,31 +1,121 @@
+import time
+
 from typing import Optional
 
+from tg_wiki.cache.ports import ArticleEntry
 from tg_wiki.domain.article import Article
-from .codec import dumps_article, loads_article
+from .codec import decode_article, encode_article
+from .keys import article_index_key, article_key, missing_article_key
 
 
 class RedisArticleCache:
-    def __init__(self, redis, *, prefix: str = "tg_wiki", ttl: int = 24 * 3600) -> None:
+    """
+    Articles as binary-encoded strings with a TTL.
+
+    A sorted set indexes the cached pageids by expiry time for `sample`;
+    expired ids are pruned on every write, so the index stays as large as
+    the live part of the cache.
+    """
+
+    def __init__(
+        self,
+        redis,
+        *,
+        prefix: str = "tg_wiki",
+        ttl: int = 24 * 3600,
+        negative_ttl: int = 300,
+    ) -> None:
         self._r = redis
         self._prefix = prefix
         if ttl <= 0:
             raise ValueError("ttl must be positive")
+        if negative_ttl <= 0:
+            raise ValueError("negative_ttl must be positive")
         self._ttl = ttl
+        self._negative_ttl = negative_ttl
 
     def _key(self, article: Article | int, *, lang: str = "ru") -> str:
         pageid = article if isinstance(article, int) else article.meta.pageid
-        return f"{self._prefix}:article:{lang}:{int(pageid)}"
+        return article_key(self._prefix, lang, pageid)
+
+    def _index_key(self, lang: str = "ru") -> str:
+        return article_index_key(self._prefix, lang)
+
+    def _missing_key(self, pageid: int, lang: str = "ru") -> str:
+        return missing_article_key(self._prefix, lang, pageid)
 
     async def get(self, pageid: int) -> Optional[Article]:
         key = self._key(pageid)
         raw = await self._r.get(key)
         if raw is None:
             return None
-        if isinstance(raw, (bytes, bytearray)):
-            raw = raw.decode("utf-8")
-        return loads_article(raw)
+        return decode_article(raw)
 
-    async def update(self, article: Article) -> None:
+    async def get_entry(self, pageid: int) -> Optional[ArticleEntry]:
+        key = self._key(pageid)
+        pipe = self._r.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.ttl(key)
+        raw, ttl_left = await pipe.execute()
+        if raw is None:
+            return None
+        # the age is derived from the remaining TTL, so touch() is just an EXPIRE
+        age = self._ttl - ttl_left if ttl_left is not None and ttl_left >= 0 else 0
+        return ArticleEntry(article=decode_article(raw), stored_at=time.time() - age)
+
+    async def touch(self, pageid: int, *, lang: str = "ru") -> None:
+        pipe = self._r.pipeline(transaction=False)
+        pipe.expire(self._key(pageid, lang=lang), self._ttl)
+        pipe.zadd(self._index_key(lang), {str(pageid): time.time() + self._ttl}, xx=True)
+        await pipe.execute()
+
+    async def is_missing(self, pageid: int, *, lang: str = "ru") -> bool:
+        return bool(await self._r.exists(self._missing_key(pageid, lang)))
+
+    async def mark_missing(self, pageid: int, *, lang: str = "ru") -> None:
+        await self._r.set(self._missing_key(pageid, lang), b"1", ex=self._negative_ttl)
+
+    def queue_update(self, pipe, article: Article) -> None:
+        """Adds the commands storing `article` to a pipeline."""
         key = self._key(article, lang=article.lang)
-        val = dumps_article(article)
-        await self._r.set(key, val, ex=self._ttl)
+        pipe.set(key, encode_article(article), ex=self._ttl)
+        pipe.delete(self._missing_key(article.meta.pageid, article.lang))
+        index_key = self._index_key(article.lang)
+        now = time.time()
+        pipe.zadd(index_key, {str(article.meta.pageid): now + self._ttl})
+        pipe.zremrangebyscore(index_key, "-inf", now)
+        pipe.expire(index_key, self._ttl)
+
+    async def update(self, article: Article) -> None:
+        await self.update_many([article])
+
+    async def update_many(self, articles: list[Article]) -> None:
+        if not articles:
+            return
+        pipe = self._r.pipeline(transaction=False)
+        for article in articles:
+            self.queue_update(pipe, article)
+        await pipe.execute()
+
+    async def sample(self, n: int, *, lang: str = "ru") -> list[Article]:
+        index_key = self._index_key(lang)
+        pipe = self._r.pipeline(transaction=False)
+        pipe.zremrangebyscore(index_key, "-inf", time.time())
+        pipe.zrandmember(index_key, n)
+        _, pageids = await pipe.execute()
+        if not pageids:
+            return []
+
+        raws = await self._r.mget([self._key(int(p), lang=lang) for p in pageids])
+        out: list[Article] = []
+        expired = []
+        for pageid, raw in zip(pageids, raws):
+            if raw is None:
+                expired.append(pageid)
+                continue
+            out.append(decode_article(raw))
+
+        if expired:
+            # evicted before their TTL (e.g. by maxmemory)
+            await self._r.zrem(index_key, *expired)
+        return out
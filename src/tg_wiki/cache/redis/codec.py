@@ -1,4 +1,5 @@
 import json
+import zlib
 
 from typing import Any
 
@@ -16,6 +17,8 @@ def dumps_article(article: Article) -> str:
         },
         "extract": article.extract,
         "lang": article.lang,
+        "lastrevid": article.lastrevid,
+        "touched": article.touched,
     }
     return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
 
@@ -28,13 +31,37 @@ def loads_article(raw: str) -> Article:
             pageid=int(meta["pageid"]),
             title=str(meta.get("title", "")),
             url=str(meta.get("url", "")),
-            thumbnail_url=str(meta.get("thumbnail_url")),
+            thumbnail_url=(
+                str(meta["thumbnail_url"])
+                if meta.get("thumbnail_url") is not None
+                else None
+            ),
         ),
         extract=data.get("extract"),
         lang=str(data.get("lang", "ru")),
+        lastrevid=int(data["lastrevid"]) if data.get("lastrevid") else None,
+        touched=str(data["touched"]) if data.get("touched") else None,
     )
 
 
+def dumps_metas(metas: list[ArticleMeta]) -> str:
+    payload = [[m.pageid, m.title, m.url, m.thumbnail_url] for m in metas]
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads_metas(raw: str) -> list[ArticleMeta]:
+    data: list[list[Any]] = json.loads(raw)
+    return [
+        ArticleMeta(
+            pageid=int(pageid),
+            title=str(title),
+            url=str(url),
+            thumbnail_url=str(thumb) if thumb is not None else None,
+        )
+        for pageid, title, url, thumb in data
+    ]
+
+
 def dumps_settings(settings: UserSettings) -> str:
     payload = {
         "page_len": settings.page_len,
@@ -55,3 +82,186 @@ def loads_settings(raw: str) -> UserSettings:
         app_lang=str(data["app_lang"]),
         wiki_lang=str(data["wiki_lang"]),
     )
+
+
+# Binary format: [version][flags][fields...]. Integers are unsigned LEB128
+# varints, strings are varint-length-prefixed UTF-8. Legacy JSON payloads
+# start with "{" and are still decoded transparently.
+# Version 2 added the article revision fields.
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+COMPRESS_THRESHOLD = 512
+
+_ARTICLE_THUMBNAIL = 0x01
+_ARTICLE_EXTRACT = 0x02
+_ARTICLE_COMPRESSED = 0x04
+_ARTICLE_LASTREVID = 0x08
+_ARTICLE_TOUCHED = 0x10
+
+_SETTINGS_SEND_TEXT = 0x01
+_SETTINGS_SEND_IMAGE = 0x02
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError("varint must be non-negative")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _put_bytes(out: bytearray, data: bytes) -> None:
+    _put_varint(out, len(data))
+    out += data
+
+
+def _put_str(out: bytearray, value: str) -> None:
+    _put_bytes(out, value.encode("utf-8"))
+
+
+class _Reader:
+    __slots__ = ("_buf", "_pos")
+
+    def __init__(self, buf: bytes) -> None:
+        self._buf = memoryview(buf)
+        self._pos = 0
+
+    def byte(self) -> int:
+        value = self._buf[self._pos]
+        self._pos += 1
+        return value
+
+    def varint(self) -> int:
+        shift = 0
+        value = 0
+        while True:
+            b = self.byte()
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value
+            shift += 7
+
+    def bytes(self) -> bytes:
+        n = self.varint()
+        data = bytes(self._buf[self._pos : self._pos + n])
+        if len(data) != n:
+            raise ValueError("Truncated payload")
+        self._pos += n
+        return data
+
+    def str(self) -> str:
+        return self.bytes().decode("utf-8")
+
+
+def _check_version(reader: _Reader) -> int:
+    version = reader.byte()
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported cache format version: {version}")
+    return version
+
+
+def encode_article(
+    article: Article, *, compress_threshold: int = COMPRESS_THRESHOLD
+) -> bytes:
+    flags = 0
+    extract = b""
+    if article.meta.thumbnail_url is not None:
+        flags |= _ARTICLE_THUMBNAIL
+    if article.lastrevid is not None:
+        flags |= _ARTICLE_LASTREVID
+    if article.touched is not None:
+        flags |= _ARTICLE_TOUCHED
+    if article.extract is not None:
+        flags |= _ARTICLE_EXTRACT
+        extract = article.extract.encode("utf-8")
+        if len(extract) > compress_threshold:
+            compressed = zlib.compress(extract, 6)
+            if len(compressed) < len(extract):
+                flags |= _ARTICLE_COMPRESSED
+                extract = compressed
+
+    out = bytearray((FORMAT_VERSION, flags))
+    _put_varint(out, article.meta.pageid)
+    _put_str(out, article.meta.title)
+    _put_str(out, article.meta.url)
+    if flags & _ARTICLE_THUMBNAIL:
+        _put_str(out, article.meta.thumbnail_url or "")
+    _put_str(out, article.lang)
+    if flags & _ARTICLE_LASTREVID:
+        _put_varint(out, article.lastrevid or 0)
+    if flags & _ARTICLE_TOUCHED:
+        _put_str(out, article.touched or "")
+    if flags & _ARTICLE_EXTRACT:
+        _put_bytes(out, extract)
+    return bytes(out)
+
+
+def decode_article(raw: bytes | str) -> Article:
+    if isinstance(raw, str):
+        return loads_article(raw)
+    if raw[:1] == b"{":
+        return loads_article(raw.decode("utf-8"))
+
+    reader = _Reader(raw)
+    version = _check_version(reader)
+    flags = reader.byte()
+    pageid = reader.varint()
+    title = reader.str()
+    url = reader.str()
+    thumbnail_url = reader.str() if flags & _ARTICLE_THUMBNAIL else None
+    lang = reader.str()
+
+    lastrevid = touched = None
+    if version >= 2:
+        lastrevid = reader.varint() if flags & _ARTICLE_LASTREVID else None
+        touched = reader.str() if flags & _ARTICLE_TOUCHED else None
+
+    extract = None
+    if flags & _ARTICLE_EXTRACT:
+        data = reader.bytes()
+        if flags & _ARTICLE_COMPRESSED:
+            data = zlib.decompress(data)
+        extract = data.decode("utf-8")
+
+    return Article(
+        meta=ArticleMeta(
+            pageid=pageid, title=title, url=url, thumbnail_url=thumbnail_url
+        ),
+        extract=extract,
+        lang=lang,
+        lastrevid=lastrevid,
+        touched=touched,
+    )
+
+
+def encode_settings(settings: UserSettings) -> bytes:
+    flags = 0
+    if settings.send_text:
+        flags |= _SETTINGS_SEND_TEXT
+    if settings.send_image:
+        flags |= _SETTINGS_SEND_IMAGE
+
+    out = bytearray((FORMAT_VERSION, flags))
+    _put_varint(out, settings.page_len)
+    _put_str(out, settings.app_lang)
+    _put_str(out, settings.wiki_lang)
+    return bytes(out)
+
+
+def decode_settings(raw: bytes | str) -> UserSettings:
+    if isinstance(raw, str):
+        return loads_settings(raw)
+    if raw[:1] == b"{":
+        return loads_settings(raw.decode("utf-8"))
+
+    reader = _Reader(raw)
+    _check_version(reader)
+    flags = reader.byte()
+    return UserSettings(
+        page_len=reader.varint(),
+        send_text=bool(flags & _SETTINGS_SEND_TEXT),
+        send_image=bool(flags & _SETTINGS_SEND_IMAGE),
+        app_lang=reader.str(),
+        wiki_lang=reader.str(),
+    )
@@ -0,0 +1,132 @@
+from redis.exceptions import NoScriptError
+
+from typing import Optional
+
+from tg_wiki.cache.ports import UserContext
+from tg_wiki.cache.tiered.caches import (
+    TieredArticleCache,
+    TieredUserIDCache,
+    TieredUserSettingsCache,
+)
+from tg_wiki.domain.article import Article
+from .article import RedisArticleCache
+from .codec import decode_settings
+from .keys import settings_key_prefix, user_id_key, user_key_prefix
+from .last_view import RedisLastViewCache
+from .seen import RedisSeenFilter
+
+
+# Resolves the internal user id and reads the settings and history keyed by it.
+# The dependent keys are built inside the script, so this assumes a single
+# (non-cluster) Redis deployment.
+LOAD_CONTEXT_LUA = """
+local user_id = redis.call('GET', KEYS[1])
+if not user_id then
+    return {false, false, {}}
+end
+local settings = redis.call('GET', ARGV[1] .. user_id)
+local recent = redis.call('LRANGE', ARGV[2] .. user_id .. ARGV[3], 0, -1)
+return {user_id, settings, recent}
+"""
+
+
+def _text(raw) -> str:
+    if isinstance(raw, (bytes, bytearray)):
+        return raw.decode("utf-8")
+    return str(raw)
+
+
+class RedisUserContextStore:
+    """
+    Reads and writes a user's per-update state in one round-trip.
+
+    With L1 tiers, a user id and settings held in L1 are not read from Redis
+    again, and viewed articles are stored through the tiered article cache,
+    so that its L1 is updated and the other replicas are notified within the
+    same pipeline.
+    """
+
+    def __init__(
+        self,
+        redis,
+        *,
+        prefix: str = "tg_wiki",
+        articles: RedisArticleCache | TieredArticleCache,
+        last_view: RedisLastViewCache,
+        seen: RedisSeenFilter,
+        user_ids: Optional[TieredUserIDCache] = None,
+        user_settings: Optional[TieredUserSettingsCache] = None,
+    ) -> None:
+        self._r = redis
+        self._prefix = prefix
+        self._articles = articles
+        self._last_view = last_view
+        self._seen = seen
+        self._user_ids = user_ids
+        self._user_settings = user_settings
+        self._load = redis.register_script(LOAD_CONTEXT_LUA)
+
+    async def load(self, provider: str, external_id: int) -> UserContext:
+        if self._user_ids is not None and self._user_settings is not None:
+            user_id = self._user_ids.peek(provider, external_id)
+            if user_id is not None:
+                settings = self._user_settings.peek(user_id)
+                if settings is not None:
+                    recent = await self._last_view.get(user_id)
+                    return UserContext(user_id, settings, tuple(recent))
+
+        user_id, settings, recent = await self._load(
+            keys=[user_id_key(self._prefix, provider, external_id)],
+            args=[
+                settings_key_prefix(self._prefix),
+                user_key_prefix(self._prefix),
+                ":recent",
+            ],
+        )
+        if user_id is None:
+            return UserContext()
+
+        pageids: list[int] = []
+        for x in recent or ():
+            try:
+                pageids.append(int(_text(x)))
+            except ValueError:
+                continue
+
+        ctx = UserContext(
+            user_id=int(_text(user_id)),
+            settings=decode_settings(settings) if settings is not None else None,
+            recent=tuple(pageids),
+        )
+        if self._user_ids is not None:
+            self._user_ids.fill(ctx.user_id, provider, external_id)
+        if self._user_settings is not None and ctx.settings is not None:
+            self._user_settings.fill(ctx.user_id, ctx.settings)
+        return ctx
+
+    async def load_scripts(self) -> None:
+        """Loads the Lua scripts that `record_view` runs by SHA."""
+        await self._r.script_load(LOAD_CONTEXT_LUA)
+        await self._last_view.load_scripts()
+        await self._seen.load_scripts()
+
+    async def record_view(
+        self, user_id: int, article: Article, *, store_article: bool = True
+    ) -> None:
+        try:
+            await self._write_view(user_id, article, store_article=store_article)
+        except NoScriptError:
+            # the script cache was flushed (e.g. Redis restarted); recording a
+            # view is safe to repeat, so load the scripts again and retry once
+            await self.load_scripts()
+            await self._write_view(user_id, article, store_article=store_article)
+
+    async def _write_view(
+        self, user_id: int, article: Article, *, store_article: bool
+    ) -> None:
+        pipe = self._r.pipeline(transaction=True)
+        self._last_view.queue_update(pipe, user_id, article.meta.pageid)
+        self._seen.queue_add(pipe, user_id, article.meta.pageid)
+        if store_article:
+            self._articles.queue_update(pipe, article)
+        await pipe.execute()
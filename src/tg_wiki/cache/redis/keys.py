@@ -0,0 +1,34 @@
+def article_key(prefix: str, lang: str, pageid: int) -> str:
+    return f"{prefix}:article:{lang}:{int(pageid)}"
+
+
+def missing_article_key(prefix: str, lang: str, pageid: int) -> str:
+    return f"{prefix}:missing:{lang}:{int(pageid)}"
+
+
+def article_index_key(prefix: str, lang: str) -> str:
+    return f"{prefix}:article:{lang}:live"
+
+
+def user_id_key(prefix: str, provider: str, external_id: int) -> str:
+    return f"{prefix}:settings:{provider}:{external_id}"
+
+
+def settings_key(prefix: str, user_id: int) -> str:
+    return f"{settings_key_prefix(prefix)}{user_id}"
+
+
+def settings_key_prefix(prefix: str) -> str:
+    return f"{prefix}:settings:"
+
+
+def user_key(prefix: str, user_id: int, suffix: str) -> str:
+    return f"{user_key_prefix(prefix)}{int(user_id)}:{suffix}"
+
+
+def user_key_prefix(prefix: str) -> str:
+    return f"{prefix}:user:"
+
+
+def search_key(prefix: str, lang: str, limit: int, digest: str) -> str:
+    return f"{prefix}:search:{lang}:{int(limit)}:{digest}"
@@ -1,3 +1,61 @@
+from typing import Optional, Sequence
+
+from .keys import user_key
+
+
+# The history is a list (newest first) mirrored by a set for O(1) membership
+# tests. Histories written before the set existed get it rebuilt on first use.
+_HISTORY_LUA = """
+local function sync_set(list, set)
+    if redis.call('EXISTS', set) == 0 then
+        local items = redis.call('LRANGE', list, 0, -1)
+        if #items > 0 then
+            redis.call('SADD', set, unpack(items))
+        end
+    end
+end
+
+local function push(list, set, pageid, max, ttl)
+    redis.call('LPUSH', list, pageid)
+    redis.call('SADD', set, pageid)
+    while redis.call('LLEN', list) > max do
+        redis.call('SREM', set, redis.call('RPOP', list))
+    end
+    redis.call('EXPIRE', list, ttl)
+    redis.call('EXPIRE', set, ttl)
+end
+"""
+
+# KEYS: list, set; ARGV: max, ttl, pageid
+RECORD_VIEW_LUA = (
+    _HISTORY_LUA
+    + """
+sync_set(KEYS[1], KEYS[2])
+if redis.call('SISMEMBER', KEYS[2], ARGV[3]) == 1 then
+    redis.call('LREM', KEYS[1], 0, ARGV[3])
+    redis.call('SREM', KEYS[2], ARGV[3])
+end
+push(KEYS[1], KEYS[2], ARGV[3], tonumber(ARGV[1]), tonumber(ARGV[2]))
+return 1
+"""
+)
+
+# KEYS: list, set; ARGV: max, ttl, candidate pageids in order of preference
+RECORD_FIRST_UNSEEN_LUA = (
+    _HISTORY_LUA
+    + """
+sync_set(KEYS[1], KEYS[2])
+for i = 3, #ARGV do
+    if redis.call('SISMEMBER', KEYS[2], ARGV[i]) == 0 then
+        push(KEYS[1], KEYS[2], ARGV[i], tonumber(ARGV[1]), tonumber(ARGV[2]))
+        return ARGV[i]
+    end
+end
+return false
+"""
+)
+
+
 class RedisLastViewCache:
     def __init__(
         self,
@@ -15,9 +73,14 @@ class RedisLastViewCache:
         if ttl <= 0:
             raise ValueError("ttl must be positive")
         self._ttl = ttl
+        self._record = redis.register_script(RECORD_VIEW_LUA)
+        self._record_first_unseen = redis.register_script(RECORD_FIRST_UNSEEN_LUA)
 
     def _key(self, user_id: int) -> str:
-        return f"{self._prefix}:user:{int(user_id)}:recent"
+        return user_key(self._prefix, user_id, "recent")
+
+    def _set_key(self, user_id: int) -> str:
+        return user_key(self._prefix, user_id, "recent_set")
 
     async def get(self, user_id: int) -> list[int]:
         key = self._key(user_id)
@@ -32,12 +95,45 @@ class RedisLastViewCache:
                 continue
         return out
 
-    async def update(self, user_id: int, pageid: int) -> None:
-        key = self._key(user_id)
+    async def record_if_unseen(
+        self, user_id: int, pageids: Sequence[int]
+    ) -> Optional[int]:
+        if not pageids:
+            return None
+        accepted = await self._record_first_unseen(
+            keys=[self._key(user_id), self._set_key(user_id)],
+            args=[self._max, self._ttl, *(int(p) for p in pageids)],
+        )
+        if accepted is None:
+            return None
+        if isinstance(accepted, (bytes, bytearray)):
+            accepted = accepted.decode("utf-8")
+        return int(accepted)
+
+    def queue_update(self, pipe, user_id: int, pageid: int) -> None:
+        """
+        Adds the script recording a view to a pipeline.
 
-        pipe = self._r.pipeline(transaction=True)
-        pipe.lrem(key, 0, int(pageid))
-        pipe.lpush(key, int(pageid))
-        pipe.ltrim(key, 0, self._max - 1)
-        pipe.expire(key, self._ttl)
-        await pipe.execute()
+        The script runs by SHA, so the pipeline stays a single round-trip; it
+        must have been loaded (`load_scripts`), otherwise the pipeline fails
+        with NoScriptError.
+        """
+        pipe.evalsha(
+            self._record.sha,
+            2,
+            self._key(user_id),
+            self._set_key(user_id),
+            self._max,
+            self._ttl,
+            int(pageid),
+        )
+
+    async def load_scripts(self) -> None:
+        await self._r.script_load(RECORD_VIEW_LUA)
+        await self._r.script_load(RECORD_FIRST_UNSEEN_LUA)
+
+    async def update(self, user_id: int, pageid: int) -> None:
+        await self._record(
+            keys=[self._key(user_id), self._set_key(user_id)],
+            args=[self._max, self._ttl, int(pageid)],
+        )
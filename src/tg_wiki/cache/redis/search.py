@@ -0,0 +1,54 @@
+import hashlib
+
+from typing import Optional
+
+from tg_wiki.domain.article import ArticleMeta
+from .codec import dumps_metas, loads_metas
+from .keys import search_key
+
+
+class RedisSearchCache:
+    def __init__(
+        self,
+        redis,
+        *,
+        prefix: str = "tg_wiki",
+        ttl: int = 3600,
+        negative_ttl: int = 300,
+        max_query_len: int = 256,
+    ) -> None:
+        self._r = redis
+        self._prefix = prefix
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if negative_ttl <= 0:
+            raise ValueError("negative_ttl must be positive")
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._max_query_len = max_query_len
+
+    def _key(self, query: str, limit: int, lang: str) -> str:
+        digest = hashlib.blake2b(query.encode("utf-8"), digest_size=16).hexdigest()
+        return search_key(self._prefix, lang, limit, digest)
+
+    async def get(
+        self, query: str, limit: int, *, lang: str = "ru"
+    ) -> Optional[list[ArticleMeta]]:
+        if len(query) > self._max_query_len:
+            return None
+        key = self._key(query, limit, lang)
+        raw = await self._r.get(key)
+        if raw is None:
+            return None
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode("utf-8")
+        return loads_metas(raw)
+
+    async def update(
+        self, query: str, limit: int, results: list[ArticleMeta], *, lang: str = "ru"
+    ) -> None:
+        if len(query) > self._max_query_len:
+            return
+        key = self._key(query, limit, lang)
+        ttl = self._ttl if results else self._negative_ttl
+        await self._r.set(key, dumps_metas(results), ex=ttl)
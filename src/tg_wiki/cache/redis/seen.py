@@ -0,0 +1,173 @@
+from typing import Sequence
+
+from tg_wiki.cache.bloom import ScalableBloomParams, key_hashes
+from .keys import user_key
+
+
+# Both scripts get the generation plan first: ARGV[1] is the number of levels,
+# followed by (bits, hashes, capacity) per level. KEYS are the state hash
+# (level, count), the previous full-size generation and one key per level.
+_PLAN_LUA = """
+local levels = tonumber(ARGV[1])
+local function plan(level)
+    local base = 2 + level * 3
+    return tonumber(ARGV[base]), tonumber(ARGV[base + 1]), tonumber(ARGV[base + 2])
+end
+local rest = 2 + levels * 3
+"""
+
+# ARGV after the plan: ttl, h1, h2. Adds the key to the generation being
+# filled and grows or rotates the filter once it is full, atomically.
+ADD_LUA = (
+    _PLAN_LUA
+    + """
+local ttl = tonumber(ARGV[rest])
+local h1, h2 = tonumber(ARGV[rest + 1]), tonumber(ARGV[rest + 2])
+local level = tonumber(redis.call('HGET', KEYS[1], 'level') or '0')
+local key = KEYS[3 + level]
+local bits, hashes, capacity = plan(level)
+for i = 0, hashes - 1 do
+    redis.call('SETBIT', key, (h1 + i * h2) % bits, 1)
+end
+if redis.call('HINCRBY', KEYS[1], 'count', 1) >= capacity then
+    if level + 1 < levels then
+        redis.call('HSET', KEYS[1], 'level', level + 1, 'count', 0)
+    else
+        redis.call('RENAME', key, KEYS[2])
+        for i = 0, levels - 2 do
+            redis.call('DEL', KEYS[3 + i])
+        end
+        redis.call('HSET', KEYS[1], 'count', 0)
+    end
+end
+for i = 1, #KEYS do
+    redis.call('EXPIRE', KEYS[i], ttl)
+end
+return 1
+"""
+)
+
+# ARGV after the plan: (h1, h2) per candidate. Returns a 0/1 flag for each.
+CONTAINS_LUA = (
+    _PLAN_LUA
+    + """
+local present = {}
+for level = 0, levels - 1 do
+    if redis.call('EXISTS', KEYS[3 + level]) == 1 then
+        present[#present + 1] = {KEYS[3 + level], level}
+    end
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    present[#present + 1] = {KEYS[2], levels - 1}
+end
+
+local out = {}
+for c = rest, #ARGV, 2 do
+    local h1, h2 = tonumber(ARGV[c]), tonumber(ARGV[c + 1])
+    local found = 0
+    for _, generation in ipairs(present) do
+        local bits, hashes = plan(generation[2])
+        local all = 1
+        for i = 0, hashes - 1 do
+            if redis.call('GETBIT', generation[1], (h1 + i * h2) % bits) == 0 then
+                all = 0
+                break
+            end
+        end
+        if all == 1 then
+            found = 1
+            break
+        end
+    end
+    out[#out + 1] = found
+end
+return out
+"""
+)
+
+
+class RedisSeenFilter:
+    """
+    Per-user Bloom filters stored as plain Redis strings and maintained by
+    Lua scripts, so no Redis module is needed.
+
+    A new user's filter holds `initial_capacity` keys and doubles with every
+    new generation until one holds `capacity`; when that one is full it is
+    renamed to the previous generation and the smaller ones are deleted, all
+    within the adding script. At least the last `capacity` views are always
+    remembered while the false-positive rate stays bounded. Every call costs
+    one round-trip and O(hashes) bit operations per pageid and generation,
+    however long the history is.
+    """
+
+    def __init__(
+        self,
+        redis,
+        *,
+        prefix: str = "tg_wiki",
+        capacity: int = 20000,
+        fp_rate: float = 0.001,
+        initial_capacity: int = 256,
+        ttl: int = 180 * 24 * 3600,
+    ) -> None:
+        self._r = redis
+        self._prefix = prefix
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self._params = ScalableBloomParams.for_capacity(
+            capacity, fp_rate, initial_capacity
+        )
+        self._ttl = ttl
+        self._plan: list[int] = [self._params.levels]
+        for size, params in zip(self._params.capacities, self._params.generations):
+            self._plan += [params.bits, params.hashes, size]
+        self._add = redis.register_script(ADD_LUA)
+        self._contains = redis.register_script(CONTAINS_LUA)
+
+    @property
+    def params(self) -> ScalableBloomParams:
+        return self._params
+
+    def _keys(self, user_id: int) -> list[str]:
+        return [
+            user_key(self._prefix, user_id, "bloom:state"),
+            user_key(self._prefix, user_id, "bloom:prev"),
+            *(
+                user_key(self._prefix, user_id, f"bloom:{level}")
+                for level in range(self._params.levels)
+            ),
+        ]
+
+    def queue_add(self, pipe, user_id: int, pageid: int) -> None:
+        """
+        Adds the script recording a shown article to a pipeline (by SHA, see
+        `load_scripts`).
+        """
+        keys = self._keys(user_id)
+        pipe.evalsha(
+            self._add.sha,
+            len(keys),
+            *keys,
+            *self._plan,
+            self._ttl,
+            *key_hashes(pageid),
+        )
+
+    async def load_scripts(self) -> None:
+        await self._r.script_load(ADD_LUA)
+        await self._r.script_load(CONTAINS_LUA)
+
+    async def add(self, user_id: int, pageid: int) -> None:
+        await self._add(
+            keys=self._keys(user_id),
+            args=[*self._plan, self._ttl, *key_hashes(pageid)],
+        )
+
+    async def contains_many(self, user_id: int, pageids: Sequence[int]) -> list[bool]:
+        if not pageids:
+            return []
+        args: list[int] = list(self._plan)
+        for pageid in pageids:
+            args += key_hashes(pageid)
+        flags = await self._contains(keys=self._keys(user_id), args=args)
+        return [bool(int(flag)) for flag in flags]
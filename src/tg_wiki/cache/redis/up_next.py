@@ -0,0 +1,59 @@
+from typing import Optional, Sequence
+
+from tg_wiki.cache.ports import UpNextEntry
+from tg_wiki.domain.article import Article
+
+from .keys import user_key
+
+
+class RedisUpNextQueue:
+    """
+    Per-user Redis lists of precomputed next articles.
+
+    Every pop and push refreshes the key's TTL, so queues of idle users expire
+    after `idle_ttl` seconds. Only pageids are stored; the articles live in
+    the article cache.
+    """
+
+    def __init__(
+        self,
+        redis,
+        *,
+        prefix: str = "tg_wiki",
+        max_len: int = 10,
+        idle_ttl: int = 3600,
+    ) -> None:
+        self._r = redis
+        self._prefix = prefix
+        if max_len <= 0:
+            raise ValueError("max_len must be positive")
+        if idle_ttl <= 0:
+            raise ValueError("idle_ttl must be positive")
+        self._max_len = max_len
+        self._idle_ttl = idle_ttl
+
+    def _key(self, user_id: int) -> str:
+        return user_key(self._prefix, user_id, "up_next")
+
+    async def pop(self, user_id: int) -> tuple[Optional[UpNextEntry], int]:
+        key = self._key(user_id)
+        pipe = self._r.pipeline(transaction=True)
+        pipe.lpop(key)
+        pipe.llen(key)
+        pipe.expire(key, self._idle_ttl)
+        pageid, remaining, _ = await pipe.execute()
+        if pageid is None:
+            return None, 0
+        return UpNextEntry(int(pageid)), int(remaining)
+
+    async def push_many(self, user_id: int, articles: Sequence[Article]) -> int:
+        if not articles:
+            return 0
+        key = self._key(user_id)
+        pipe = self._r.pipeline(transaction=True)
+        pipe.rpush(key, *(a.meta.pageid for a in articles))
+        pipe.ltrim(key, -self._max_len, -1)
+        pipe.llen(key)
+        pipe.expire(key, self._idle_ttl)
+        _, _, length, _ = await pipe.execute()
+        return int(length)
@@ -1,5 +1,7 @@
 from typing import Optional
 
+from .keys import user_id_key
+
 
 class RedisUserIDCache:
     def __init__(self, redis, *, prefix: str = "tg_wiki", ttl: int = 24 * 3600) -> None:
@@ -10,7 +12,7 @@ class RedisUserIDCache:
         self._ttl = ttl
 
     def _key(self, provider: str, external_id: int) -> str:
-        return f"{self._prefix}:settings:{provider}:{external_id}"
+        return user_id_key(self._prefix, provider, external_id)
 
     async def get(self, provider: str, external_id: int) -> Optional[int]:
         key = self._key(provider, external_id)
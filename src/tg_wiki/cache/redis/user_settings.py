@@ -1,7 +1,8 @@
 from typing import Optional
 
 from tg_wiki.domain.user import UserSettings
-from .codec import dumps_settings, loads_settings
+from .codec import decode_settings, encode_settings
+from .keys import settings_key
 
 
 class RedisUserSettingsCache:
@@ -13,18 +14,16 @@ class RedisUserSettingsCache:
         self._ttl = ttl
 
     def _key(self, user_id: int) -> str:
-        return f"{self._prefix}:settings:{user_id}"
+        return settings_key(self._prefix, user_id)
 
     async def get(self, user_id: int) -> Optional[UserSettings]:
         key = self._key(user_id)
         raw = await self._r.get(key)
         if raw is None:
             return None
-        if isinstance(raw, (bytes, bytearray)):
-            raw = raw.decode("utf-8")
-        return loads_settings(raw)
+        return decode_settings(raw)
 
     async def update(self, user_id: int, settings: UserSettings) -> None:
         key = self._key(user_id)
-        val = dumps_settings(settings)
+        val = encode_settings(settings)
         await self._r.set(key, val, ex=self._ttl)
@@ -0,0 +1,205 @@
+import time
+
+from typing import Optional
+
+from tg_wiki.cache.ports import (
+    ArticleCache,
+    ArticleEntry,
+    UserIDCache,
+    UserSettingsCache,
+)
+from tg_wiki.domain.article import Article
+from tg_wiki.domain.user import UserSettings
+from .invalidation import InvalidationBus
+from .local import LocalLRU, TierStats
+
+
+class TieredArticleCache:
+    """In-process L1 in front of any ArticleCache, invalidated across replicas."""
+
+    namespace = "article"
+
+    def __init__(
+        self,
+        l2: ArticleCache,
+        *,
+        bus: InvalidationBus | None = None,
+        max_items: int = 500,
+        ttl: float = 300,
+    ) -> None:
+        self._l2 = l2
+        self._l1: LocalLRU[int, ArticleEntry] = LocalLRU(max_items, ttl)
+        self._bus = bus
+        self.stats = TierStats(self.namespace)
+        if bus is not None:
+            bus.register(self.namespace, lambda key: self._l1.pop(int(key)))
+
+    async def get(self, pageid: int) -> Optional[Article]:
+        entry = await self.get_entry(pageid)
+        return entry.article if entry is not None else None
+
+    async def get_entry(self, pageid: int) -> Optional[ArticleEntry]:
+        entry = self._l1.get(pageid)
+        if entry is not None:
+            self.stats.l1_hit()
+            return entry
+
+        entry = await self._l2.get_entry(pageid)
+        if entry is None:
+            self.stats.miss()
+            return None
+        self.stats.l2_hit()
+        self._l1.set(pageid, entry)
+        return entry
+
+    async def touch(self, pageid: int, *, lang: str = "ru") -> None:
+        await self._l2.touch(pageid, lang=lang)
+        entry = self._l1.get(pageid)
+        if entry is not None:
+            self._l1.set(pageid, ArticleEntry(entry.article, time.time()))
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, [str(pageid)])
+
+    async def is_missing(self, pageid: int, *, lang: str = "ru") -> bool:
+        return await self._l2.is_missing(pageid, lang=lang)
+
+    async def mark_missing(self, pageid: int, *, lang: str = "ru") -> None:
+        await self._l2.mark_missing(pageid, lang=lang)
+
+    async def update(self, article: Article) -> None:
+        await self.update_many([article])
+
+    async def update_many(self, articles: list[Article]) -> None:
+        if not articles:
+            return
+        await self._l2.update_many(articles)
+        now = time.time()
+        for article in articles:
+            self._l1.set(article.meta.pageid, ArticleEntry(article, now))
+        if self._bus is not None:
+            await self._bus.publish(
+                self.namespace, (str(a.meta.pageid) for a in articles)
+            )
+
+    async def sample(self, n: int, *, lang: str = "ru") -> list[Article]:
+        return await self._l2.sample(n, lang=lang)
+
+    def queue_update(self, pipe, article: Article) -> None:
+        """
+        Adds the commands storing `article` and announcing it to the other
+        replicas to a Redis pipeline (the L2 must support `queue_update`).
+        """
+        self._l2.queue_update(pipe, article)
+        self._l1.set(article.meta.pageid, ArticleEntry(article, time.time()))
+        if self._bus is not None:
+            self._bus.queue_publish(pipe, self.namespace, [str(article.meta.pageid)])
+
+
+class TieredUserSettingsCache:
+    """In-process L1 in front of any UserSettingsCache, invalidated across replicas."""
+
+    namespace = "settings"
+
+    def __init__(
+        self,
+        l2: UserSettingsCache,
+        *,
+        bus: InvalidationBus | None = None,
+        max_items: int = 1000,
+        ttl: float = 60,
+    ) -> None:
+        self._l2 = l2
+        self._l1: LocalLRU[int, UserSettings] = LocalLRU(max_items, ttl)
+        self._bus = bus
+        self.stats = TierStats(self.namespace)
+        if bus is not None:
+            bus.register(self.namespace, lambda key: self._l1.pop(int(key)))
+
+    async def get(self, user_id: int) -> Optional[UserSettings]:
+        settings = self._l1.get(user_id)
+        if settings is not None:
+            self.stats.l1_hit()
+            return settings
+
+        settings = await self._l2.get(user_id)
+        if settings is None:
+            self.stats.miss()
+            return None
+        self.stats.l2_hit()
+        self._l1.set(user_id, settings)
+        return settings
+
+    def peek(self, user_id: int) -> Optional[UserSettings]:
+        """Returns the settings if they are in L1, without asking L2."""
+        settings = self._l1.get(user_id)
+        if settings is not None:
+            self.stats.l1_hit()
+        return settings
+
+    def fill(self, user_id: int, settings: UserSettings) -> None:
+        """Puts settings read from L2 by someone else into L1."""
+        self._l1.set(user_id, settings)
+
+    async def update(self, user_id: int, settings: UserSettings) -> None:
+        await self._l2.update(user_id, settings)
+        self._l1.set(user_id, settings)
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, [str(user_id)])
+
+
+class TieredUserIDCache:
+    """In-process L1 in front of any UserIDCache, invalidated across replicas."""
+
+    namespace = "user_id"
+
+    def __init__(
+        self,
+        l2: UserIDCache,
+        *,
+        bus: InvalidationBus | None = None,
+        max_items: int = 1000,
+        ttl: float = 600,
+    ) -> None:
+        self._l2 = l2
+        self._l1: LocalLRU[str, int] = LocalLRU(max_items, ttl)
+        self._bus = bus
+        self.stats = TierStats(self.namespace)
+        if bus is not None:
+            bus.register(self.namespace, self._l1.pop)
+
+    @staticmethod
+    def _key(provider: str, external_id: int) -> str:
+        return f"{provider}:{external_id}"
+
+    async def get(self, provider: str, external_id: int) -> Optional[int]:
+        key = self._key(provider, external_id)
+        user_id = self._l1.get(key)
+        if user_id is not None:
+            self.stats.l1_hit()
+            return user_id
+
+        user_id = await self._l2.get(provider, external_id)
+        if user_id is None:
+            self.stats.miss()
+            return None
+        self.stats.l2_hit()
+        self._l1.set(key, user_id)
+        return user_id
+
+    def peek(self, provider: str, external_id: int) -> Optional[int]:
+        """Returns the user id if it is in L1, without asking L2."""
+        user_id = self._l1.get(self._key(provider, external_id))
+        if user_id is not None:
+            self.stats.l1_hit()
+        return user_id
+
+    def fill(self, user_id: int, provider: str, external_id: int) -> None:
+        """Puts a user id read from L2 by someone else into L1."""
+        self._l1.set(self._key(provider, external_id), user_id)
+
+    async def update(self, user_id: int, provider: str, external_id: int) -> None:
+        key = self._key(provider, external_id)
+        await self._l2.update(user_id, provider, external_id)
+        self._l1.set(key, user_id)
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, [key])
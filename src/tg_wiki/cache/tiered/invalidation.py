@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import uuid
+
+from typing import Callable, Iterable
+
+
+logger = logging.getLogger(__name__)
+
+Invalidate = Callable[[str], None]
+
+
+class InvalidationBus:
+    """
+    Broadcasts L1 invalidations between replicas over Redis pub/sub.
+
+    Message format: `{instance_id}|{namespace}|{key1},{key2},...`. Messages sent
+    by this instance are ignored, its own L1 is already up to date.
+    """
+
+    def __init__(self, redis, *, prefix: str = "tg_wiki") -> None:
+        self._r = redis
+        self._channel = f"{prefix}:invalidate"
+        self._instance_id = uuid.uuid4().hex
+        self._handlers: dict[str, Invalidate] = {}
+        self._pubsub = None
+        self._task: asyncio.Task | None = None
+
+    def register(self, namespace: str, handler: Invalidate) -> None:
+        if "|" in namespace:
+            raise ValueError("namespace must not contain '|'")
+        self._handlers[namespace] = handler
+
+    def _message(self, namespace: str, keys: Iterable[str]) -> str | None:
+        payload = ",".join(keys)
+        if not payload:
+            return None
+        return f"{self._instance_id}|{namespace}|{payload}"
+
+    async def publish(self, namespace: str, keys: Iterable[str]) -> None:
+        message = self._message(namespace, keys)
+        if message is not None:
+            await self._r.publish(self._channel, message)
+
+    def queue_publish(self, pipe, namespace: str, keys: Iterable[str]) -> None:
+        """Adds the invalidation to a pipeline of the same Redis server."""
+        message = self._message(namespace, keys)
+        if message is not None:
+            pipe.publish(self._channel, message)
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._pubsub = self._r.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._channel)
+        self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self._channel)
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    def _dispatch(self, data: str | bytes) -> None:
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode("utf-8")
+        try:
+            sender, namespace, payload = data.split("|", 2)
+        except ValueError:
+            return
+        if sender == self._instance_id:
+            return
+        handler = self._handlers.get(namespace)
+        if handler is None:
+            return
+        for key in payload.split(","):
+            handler(key)
+
+    async def _listen(self) -> None:
+        pubsub = self._pubsub
+        while True:
+            try:
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Cache invalidation listener failed")
+                await asyncio.sleep(1.0)
@@ -0,0 +1,97 @@
+import logging
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, Hashable, Optional, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+logger = logging.getLogger(__name__)
+
+# lookups between two hit rate reports in the log
+STATS_REPORT_EVERY = 1000
+
+
+@dataclass(slots=True)
+class TierStats:
+    """Lookup outcomes of one tiered cache, logged every STATS_REPORT_EVERY."""
+
+    namespace: str = ""
+    l1_hits: int = 0
+    l2_hits: int = 0
+    misses: int = 0
+
+    def l1_hit(self) -> None:
+        self.l1_hits += 1
+        self._report()
+
+    def l2_hit(self) -> None:
+        self.l2_hits += 1
+        self._report()
+
+    def miss(self) -> None:
+        self.misses += 1
+        self._report()
+
+    def _report(self) -> None:
+        if self.requests % STATS_REPORT_EVERY == 0:
+            logger.info(
+                "Tiered %s cache: %d lookups, L1 hit rate %.1f%%, L2 hit rate %.1f%%",
+                self.namespace,
+                self.requests,
+                self.l1_hit_rate * 100,
+                self.l2_hit_rate * 100,
+            )
+
+    @property
+    def requests(self) -> int:
+        return self.l1_hits + self.l2_hits + self.misses
+
+    @property
+    def l1_hit_rate(self) -> float:
+        return self.l1_hits / self.requests if self.requests else 0.0
+
+    @property
+    def l2_hit_rate(self) -> float:
+        """Share of L1 misses that were served by L2."""
+        l1_misses = self.l2_hits + self.misses
+        return self.l2_hits / l1_misses if l1_misses else 0.0
+
+
+class LocalLRU(Generic[K, V]):
+    """Bounded in-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_items: int, ttl: float) -> None:
+        if max_items <= 0:
+            raise ValueError("max_items must be positive")
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self._max_items = max_items
+        self._ttl = ttl
+        self._lru: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def get(self, key: K) -> Optional[V]:
+        item = self._lru.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._lru[key] = (time.monotonic() + self._ttl, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._max_items:
+            self._lru.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._lru.pop(key, None)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Final
+
+
+@dataclass(frozen=True, slots=True)
+class CircuitBreakerConfig:
+    failure_threshold: int = 5
+    slow_call_sec: float = 5.0
+    open_duration_sec: float = 30.0
+    half_open_max_calls: int = 1
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Opens after `failure_threshold` failed or slow calls in a row and rejects
+    calls for `open_duration_sec`. Then up to `half_open_max_calls` probes are
+    let through: a successful probe closes the circuit, a failed one reopens it.
+    """
+
+    def __init__(self, config: CircuitBreakerConfig | None = None) -> None:
+        self._cfg: Final[CircuitBreakerConfig] = config or CircuitBreakerConfig()
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> CircuitState:
+        # an unresolved probe (e.g. a cancelled call) must not pin the circuit
+        # half-open forever, so probing restarts after another open period
+        if (
+            self._state is not CircuitState.CLOSED
+            and time.monotonic() - self._opened_at >= self._cfg.open_duration_sec
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._opened_at = time.monotonic()
+            self._probes = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """Returns True if a call may proceed, reserving a probe when half-open."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if (
+            state is CircuitState.HALF_OPEN
+            and self._probes < self._cfg.half_open_max_calls
+        ):
+            self._probes += 1
+            return True
+        return False
+
+    def record_success(self, latency_sec: float = 0.0) -> None:
+        if latency_sec >= self._cfg.slow_call_sec:
+            self.record_failure()
+            return
+        self._failures = 0
+        self._state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if (
+            self._state is CircuitState.HALF_OPEN
+            or self._failures >= self._cfg.failure_threshold
+        ):
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            self._probes = 0
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Final
+
+
+@dataclass(frozen=True, slots=True)
+class HedgeConfig:
+    quantile: float = 0.95
+    min_delay_sec: float = 0.05
+    default_delay_sec: float = 1.0
+    min_samples: int = 20
+    window: int = 500
+
+    budget_ratio: float = 0.05
+    max_budget: float = 10.0
+
+
+class LatencyTracker:
+    """Sliding window of recent successful request latencies."""
+
+    def __init__(self, window: int) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, latency_sec: float) -> None:
+        self._samples.append(latency_sec)
+
+    def quantile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[idx]
+
+
+class HedgeBudget:
+    """
+    Caps hedged requests at `budget_ratio` of all hedgeable requests.
+
+    Every request deposits `budget_ratio` tokens and every hedge spends one,
+    so hedging can add at most that fraction of extra load.
+    """
+
+    def __init__(self, budget_ratio: float, max_budget: float) -> None:
+        self._ratio = budget_ratio
+        self._max = max_budget
+        self._tokens = 0.0
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def deposit(self) -> None:
+        self._tokens = min(self._max, self._tokens + self._ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+class HedgePolicy:
+    def __init__(self, config: HedgeConfig | None = None) -> None:
+        self._cfg: Final[HedgeConfig] = config or HedgeConfig()
+        self._latency: dict[str, LatencyTracker] = {}
+        self._budget = HedgeBudget(self._cfg.budget_ratio, self._cfg.max_budget)
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @property
+    def budget(self) -> HedgeBudget:
+        return self._budget
+
+    def tracker(self, host: str) -> LatencyTracker:
+        tracker = self._latency.get(host)
+        if tracker is None:
+            tracker = LatencyTracker(self._cfg.window)
+            self._latency[host] = tracker
+        return tracker
+
+    def delay(self, host: str) -> float:
+        """Returns how long to wait for the first attempt before hedging."""
+        tracker = self.tracker(host)
+        if len(tracker) < self._cfg.min_samples:
+            return self._cfg.default_delay_sec
+        q = tracker.quantile(self._cfg.quantile) or self._cfg.default_delay_sec
+        return max(self._cfg.min_delay_sec, q)
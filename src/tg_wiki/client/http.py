@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 import asyncio
+import time
 from dataclasses import dataclass
-from typing import Any, Final
+from typing import Any, Awaitable, Final
+from urllib.parse import urlsplit
 
 import aiohttp
 
+from tg_wiki.client.breaker import CircuitBreaker, CircuitBreakerConfig, CircuitState
+from tg_wiki.client.hedging import HedgeConfig, HedgePolicy
+from tg_wiki.client.limiter import (
+    AdaptiveLimiter,
+    LimiterStats,
+    RateLimitConfig,
+    RateLimitExceeded,
+)
+from tg_wiki.client.singleflight import SingleFlight, normalize_params
 
 Json = dict[str, Any] | list[Any]
 
@@ -22,6 +33,22 @@ class HttpRequestError(HttpClientError):
     """Network/transport or response parse errors."""
 
 
+class HttpThrottledError(HttpRequestError):
+    """Server asked to slow down (429/5xx)."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HttpRateLimitedError(HttpRequestError):
+    """Request was not sent because the outbound budget was exhausted."""
+
+
+class HttpCircuitOpenError(HttpRequestError):
+    """Request was not sent because the host's circuit breaker is open."""
+
+
 @dataclass(frozen=True, slots=True)
 class HttpClientConfig:
     user_agent: str = "tg_wiki_bot/0.1 (contact: arssmol1029@gmail.com)"
@@ -36,11 +63,24 @@ class HttpClientConfig:
     retries: int = 2
     retry_base_delay_sec: float = 0.3
 
+    coalesce_requests: bool = True
+
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    limiter_wait_timeout_sec: float = 5.0
+
+    circuit_breaker: CircuitBreakerConfig = CircuitBreakerConfig()
+
+    hedging: HedgeConfig = HedgeConfig()
+
 
 class HttpClient:
     def __init__(self, config: HttpClientConfig | None = None) -> None:
         self._cfg: Final[HttpClientConfig] = config or HttpClientConfig()
         self._session: aiohttp.ClientSession | None = None
+        self._inflight = SingleFlight()
+        self._limiter = AdaptiveLimiter(self._cfg.rate_limit)
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._hedge = HedgePolicy(self._cfg.hedging)
 
     @property
     def session(self) -> aiohttp.ClientSession:
@@ -82,8 +122,46 @@ class HttpClient:
         await self._session.close()
         self._session = None
 
-    async def get_json(self, url: str, *, params: dict[str, Any] | None = None) -> Json:
-        return await self.request_json("GET", url, params=params)
+    def _breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(self._cfg.circuit_breaker)
+            self._breakers[host] = breaker
+        return breaker
+
+    def circuit_state(self, url: str) -> CircuitState:
+        """Returns the circuit breaker state of the url's host."""
+        return self._breaker(urlsplit(url).hostname or "").state
+
+    def limiter_stats(self) -> dict[str, LimiterStats]:
+        """Returns current per-host limiter state for monitoring."""
+        return self._limiter.stats()
+
+    def hedge_stats(self) -> dict[str, float]:
+        """Returns hedging counters for monitoring."""
+        return {
+            "hedged": self._hedge.hedged,
+            "hedge_wins": self._hedge.hedge_wins,
+            "budget_tokens": self._hedge.budget.tokens,
+        }
+
+    async def get_json(
+        self,
+        url: str,
+        *,
+        params: dict[str, Any] | None = None,
+        wait_timeout_sec: float | None = None,
+        fail_fast: bool = False,
+        hedge: bool = False,
+    ) -> Json:
+        return await self.request_json(
+            "GET",
+            url,
+            params=params,
+            wait_timeout_sec=wait_timeout_sec,
+            fail_fast=fail_fast,
+            hedge=hedge,
+        )
 
     async def request_json(
         self,
@@ -93,9 +171,134 @@ class HttpClient:
         params: dict[str, Any] | None = None,
         json: Any | None = None,
         headers: dict[str, str] | None = None,
+        wait_timeout_sec: float | None = None,
+        fail_fast: bool = False,
+        hedge: bool = False,
+    ) -> Json:
+        """
+        Performs a request and parses the JSON response.
+
+        Every attempt takes a slot from the per-host limiter. Callers either queue
+        for at most `wait_timeout_sec` (the config default if None) or, with
+        `fail_fast`, get HttpRateLimitedError immediately when the budget is spent.
+
+        With `hedge` (idempotent GETs only), a second attempt is started if the
+        first has not answered within the host's recent latency percentile.
+        """
+        if fail_fast:
+            wait_timeout_sec = 0.0
+        elif wait_timeout_sec is None:
+            wait_timeout_sec = self._cfg.limiter_wait_timeout_sec
+
+        idempotent = method.upper() == "GET" and json is None
+
+        def fetch() -> Awaitable[Json]:
+            if hedge and idempotent:
+                return self._hedged_request_json(
+                    url,
+                    params=params,
+                    headers=headers,
+                    wait_timeout_sec=wait_timeout_sec,
+                )
+            return self._request_json(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers=headers,
+                wait_timeout_sec=wait_timeout_sec,
+            )
+
+        if self._cfg.coalesce_requests and idempotent:
+            # callers with a shorter limiter deadline (fail-fast ones included)
+            # must not join a flight that may stay queued for longer
+            key = (
+                url,
+                normalize_params(params),
+                normalize_params(headers),
+                wait_timeout_sec,
+            )
+            return await self._inflight.do(key, fetch)
+        return await fetch()
+
+    async def _hedged_request_json(
+        self,
+        url: str,
+        *,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        wait_timeout_sec: float | None = None,
+    ) -> Json:
+        host = urlsplit(url).hostname or ""
+        self._hedge.budget.deposit()
+
+        def attempt() -> asyncio.Task[Json]:
+            return asyncio.create_task(
+                self._request_json(
+                    "GET",
+                    url,
+                    params=params,
+                    headers=headers,
+                    wait_timeout_sec=wait_timeout_sec,
+                )
+            )
+
+        primary = attempt()
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge.delay(host))
+            if done or not self._hedge.budget.try_spend():
+                return await primary
+
+            self._hedge.hedged += 1
+            tasks.add(attempt())
+            last_exc: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        if task is not primary:
+                            self._hedge.hedge_wins += 1
+                        return task.result()
+                    last_exc = exc
+            raise last_exc or HttpRequestError("HTTP request failed")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request_json(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: dict[str, Any] | None = None,
+        json: Any | None = None,
+        headers: dict[str, str] | None = None,
+        wait_timeout_sec: float | None = None,
     ) -> Json:
+        host = urlsplit(url).hostname or ""
+        limiter = self._limiter.for_host(host)
+        breaker = self._breaker(host)
+
         last_exc: Exception | None = None
         for attempt in range(self._cfg.retries + 1):
+            if breaker.state is CircuitState.OPEN:
+                raise HttpCircuitOpenError(f"Circuit open for {host}") from last_exc
+
+            try:
+                await limiter.acquire(wait_timeout_sec)
+            except RateLimitExceeded as e:
+                raise HttpRateLimitedError(str(e)) from last_exc or e
+
+            if not breaker.allow():
+                limiter.release()
+                raise HttpCircuitOpenError(f"Circuit open for {host}") from last_exc
+
+            delay = self._cfg.retry_base_delay_sec * (2**attempt)
+            started = time.monotonic()
             try:
                 async with self.session.request(
                     method,
@@ -104,25 +307,58 @@ class HttpClient:
                     json=json,
                     headers=headers,
                 ) as resp:
+                    retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+
                     if resp.status == 429 or 500 <= resp.status <= 599:
-                        raise HttpRequestError(f"Transient HTTP status: {resp.status}")
+                        raise HttpThrottledError(
+                            f"Transient HTTP status: {resp.status}", retry_after
+                        )
 
                     if resp.status < 200 or resp.status >= 300:
                         text = await resp.text()
                         raise HttpRequestError(f"HTTP {resp.status}: {text[:300]}")
 
                     try:
-                        return await resp.json()
+                        data = await resp.json()
                     except aiohttp.ContentTypeError as e:
                         text = await resp.text()
                         raise HttpRequestError(
                             f"Invalid JSON response: {text[:300]}"
                         ) from e
 
-            except (aiohttp.ClientError, asyncio.TimeoutError, HttpRequestError) as e:
+                    latency = time.monotonic() - started
+                    limiter.on_success()
+                    breaker.record_success(latency)
+                    self._hedge.tracker(host).observe(latency)
+                    return data
+
+            except HttpThrottledError as e:
+                limiter.on_throttle(e.retry_after)
+                breaker.record_failure()
+                last_exc = e
+                if e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
                 last_exc = e
-                if attempt >= self._cfg.retries:
-                    break
-                await asyncio.sleep(self._cfg.retry_base_delay_sec * (2**attempt))
+            except HttpRequestError as e:
+                # the host answered, so a bad response does not count against it
+                breaker.record_success(time.monotonic() - started)
+                last_exc = e
+            finally:
+                limiter.release()
+
+            if attempt >= self._cfg.retries:
+                break
+            await asyncio.sleep(min(delay, self._cfg.rate_limit.max_retry_after_sec))
 
         raise HttpRequestError("HTTP request failed") from last_exc
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Final
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitConfig:
+    rate_per_sec: float = 20.0
+    burst: int = 20
+
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 32
+    increase_step: float = 1.0
+    decrease_factor: float = 0.5
+
+    max_retry_after_sec: float = 30.0
+
+
+@dataclass(frozen=True, slots=True)
+class LimiterStats:
+    inflight: int
+    concurrency_limit: int
+    tokens: float
+    rate_per_sec: float
+    blocked_for_sec: float
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request slot could not be acquired before the deadline."""
+
+
+class HostLimiter:
+    """
+    Token bucket combined with an AIMD concurrency window for a single host.
+
+    The window grows by `increase_step` per fully used window of successful
+    requests and is multiplied by `decrease_factor` on throttling signals.
+    A `Retry-After` hint blocks the host until the given moment.
+    """
+
+    def __init__(self, config: RateLimitConfig) -> None:
+        self._cfg: Final[RateLimitConfig] = config
+        self._tokens = float(config.burst)
+        self._refilled_at = time.monotonic()
+        self._limit = float(config.initial_concurrency)
+        self._inflight = 0
+        self._blocked_until = 0.0
+        self._changed = asyncio.Event()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._tokens = min(
+            float(self._cfg.burst), self._tokens + elapsed * self._cfg.rate_per_sec
+        )
+
+    def _wait_time(self, now: float) -> float:
+        """Returns 0 if a request can start now, otherwise a hint how long to wait."""
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._inflight >= int(self._limit):
+            # woken up by release()
+            return self._cfg.max_retry_after_sec
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / self._cfg.rate_per_sec
+        return 0.0
+
+    async def acquire(self, timeout: float | None = None) -> None:
+        """
+        Waits for a request slot.
+
+        Args:
+            timeout: Maximum time to wait; 0 fails fast, None waits indefinitely.
+
+        Raises:
+            RateLimitExceeded: If no slot became available in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._wait_time(now)
+            if wait <= 0:
+                self._tokens -= 1.0
+                self._inflight += 1
+                return
+
+            if deadline is not None:
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise RateLimitExceeded("Outbound request budget exhausted")
+                wait = min(wait, remaining)
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self) -> None:
+        self._inflight = max(0, self._inflight - 1)
+        self._changed.set()
+
+    def on_success(self) -> None:
+        self._limit = min(
+            float(self._cfg.max_concurrency),
+            self._limit + self._cfg.increase_step / max(self._limit, 1.0),
+        )
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        self._limit = max(
+            float(self._cfg.min_concurrency), self._limit * self._cfg.decrease_factor
+        )
+        if retry_after is not None and retry_after > 0:
+            delay = min(retry_after, self._cfg.max_retry_after_sec)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+
+    def stats(self) -> LimiterStats:
+        now = time.monotonic()
+        self._refill(now)
+        return LimiterStats(
+            inflight=self._inflight,
+            concurrency_limit=int(self._limit),
+            tokens=self._tokens,
+            rate_per_sec=self._cfg.rate_per_sec,
+            blocked_for_sec=max(0.0, self._blocked_until - now),
+        )
+
+
+class AdaptiveLimiter:
+    """Keeps one HostLimiter per outbound host."""
+
+    def __init__(self, config: RateLimitConfig | None = None) -> None:
+        self._cfg: Final[RateLimitConfig] = config or RateLimitConfig()
+        self._hosts: dict[str, HostLimiter] = {}
+
+    def for_host(self, host: str) -> HostLimiter:
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            limiter = HostLimiter(self._cfg)
+            self._hosts[host] = limiter
+        return limiter
+
+    def stats(self) -> dict[str, LimiterStats]:
+        return {host: limiter.stats() for host, limiter in self._hosts.items()}
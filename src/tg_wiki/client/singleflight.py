@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+def normalize_params(params: dict[str, Any] | None) -> tuple[tuple[str, str], ...]:
+    """
+    Builds an order-independent, hashable representation of query params.
+    """
+    if not params:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in params.items()))
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key.
+
+    The first caller starts the work in a separate task; callers arriving while
+    it is in flight await the same task. Each waiter is shielded, so cancelling
+    one of them never cancels the shared work or affects the other waiters.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[Hashable, asyncio.Task[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task[Any]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark the exception as retrieved when every waiter has gone away
+            task.exception()
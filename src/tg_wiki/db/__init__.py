@@ -16,9 +16,16 @@ Where to hook it later (high-level):
 """
 
 from .config import DBConfig
-from .ports import PreferenceVector, ExternalIdentity, UserRepository, UserSettings
+from .ports import (
+    ArticleEmbeddingRepository,
+    PreferenceVector,
+    ExternalIdentity,
+    UserRepository,
+    UserSettings,
+)
 
 __all__ = [
+    "ArticleEmbeddingRepository",
     "DBConfig",
     "PreferenceVector",
     "ExternalIdentity",
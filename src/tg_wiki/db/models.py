@@ -120,3 +120,30 @@ class UserPreferencesRow(Base):
     )
 
     user: Mapped[User] = relationship(back_populates="preferences")
+
+
+class ArticleEmbeddingRow(Base):
+    __tablename__ = "article_embeddings"
+
+    lang: Mapped[str] = mapped_column(sa.Text, primary_key=True)
+    pageid: Mapped[int] = mapped_column(sa.BigInteger, primary_key=True)
+
+    embedding: Mapped[list[float]] = mapped_column(Vector(1536), nullable=False)
+    model: Mapped[str | None] = mapped_column(sa.Text, nullable=True)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        sa.DateTime(timezone=True),
+        server_default=sa.func.now(),
+        onupdate=sa.func.now(),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        sa.Index(
+            "ix_article_embeddings_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
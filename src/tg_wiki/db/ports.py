@@ -1,5 +1,6 @@
-from typing import Optional, Protocol
+from typing import Mapping, Optional, Protocol, Sequence
 
+from tg_wiki.domain.article import ArticleEmbedding
 from tg_wiki.domain.user import ExternalIdentity, UserSettings, PreferenceVector
 
 
@@ -31,3 +32,37 @@ class UserRepository(Protocol):
     async def set_pref_vector(self, user_id: int, vector: PreferenceVector) -> None:
         """Persist user's preference vector."""
         ...
+
+    async def get_pref_vectors(
+        self, user_ids: Sequence[int]
+    ) -> dict[int, PreferenceVector]:
+        """Return the preference vectors of the users that have one."""
+        ...
+
+    async def set_pref_vectors(self, vectors: Mapping[int, PreferenceVector]) -> None:
+        """Persist many users' preference vectors in one statement."""
+        ...
+
+
+class ArticleEmbeddingRepository(Protocol):
+    async def upsert_embeddings(
+        self, embeddings: Sequence[ArticleEmbedding], *, lang: str = "ru"
+    ) -> None:
+        """Insert or replace article embeddings."""
+        ...
+
+    async def nearest_for_user(
+        self,
+        user_id: int,
+        k: int,
+        *,
+        lang: str = "ru",
+        exclude: Sequence[int] = (),
+        model: Optional[str] = None,
+    ) -> list[int]:
+        """
+        Pageids of the k articles closest to the user's preference vector,
+        nearest first; empty if the user has no preference vector yet. With
+        `model`, only vectors computed by that embedder are compared.
+        """
+        ...
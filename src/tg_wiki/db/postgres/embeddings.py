@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from tg_wiki.domain.article import ArticleEmbedding
+
+from tg_wiki.db.config import DBConfig
+from tg_wiki.db.engine import create_engine, create_session_factory
+from tg_wiki.db.models import ArticleEmbeddingRow, UserPreferencesRow
+from tg_wiki.db.ports import ArticleEmbeddingRepository
+
+
+@dataclass(slots=True)
+class PostgresArticleEmbeddingRepository(ArticleEmbeddingRepository):
+    cfg: DBConfig
+
+    _engine: AsyncEngine | None = None
+    _session_factory: async_sessionmaker | None = None
+
+    async def start(self) -> None:
+        if self._engine is not None:
+            return
+        self._engine = create_engine(self.cfg)
+        self._session_factory = create_session_factory(self._engine)
+
+    async def close(self) -> None:
+        if self._engine is None:
+            return
+        await self._engine.dispose()
+        self._engine = None
+        self._session_factory = None
+
+    def _sf(self) -> async_sessionmaker:
+        if self._session_factory is None:
+            raise RuntimeError(
+                "PostgresArticleEmbeddingRepository is not started (call start())"
+            )
+        return self._session_factory
+
+    async def upsert_embeddings(
+        self, embeddings: Sequence[ArticleEmbedding], *, lang: str = "ru"
+    ) -> None:
+        if not embeddings:
+            return
+        # one statement must not touch a key twice (CardinalityViolation), so
+        # duplicate pageids collapse to the last embedding given for them
+        rows: dict[int, dict] = {}
+        for e in embeddings:
+            if len(e.vector) != self.cfg.pref_vector_dim:
+                raise ValueError(
+                    f"Embedding dim mismatch for pageid {e.pageid}: got {len(e.vector)}, "
+                    f"expected {self.cfg.pref_vector_dim}"
+                )
+            rows[e.pageid] = {
+                "lang": lang,
+                "pageid": e.pageid,
+                "embedding": list(e.vector),
+                "model": e.model,
+            }
+
+        stmt = insert(ArticleEmbeddingRow).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ArticleEmbeddingRow.lang, ArticleEmbeddingRow.pageid],
+            set_={
+                "embedding": stmt.excluded.embedding,
+                "model": stmt.excluded.model,
+                "updated_at": sa.func.now(),
+            },
+        )
+        async with self._sf()() as session:
+            async with session.begin():
+                await session.execute(stmt)
+
+    async def nearest_for_user(
+        self,
+        user_id: int,
+        k: int,
+        *,
+        lang: str = "ru",
+        exclude: Sequence[int] = (),
+        model: Optional[str] = None,
+    ) -> list[int]:
+        if k <= 0:
+            return []
+
+        # the preference vector is an uncorrelated subquery (an InitPlan), so
+        # the ORDER BY ... <=> still walks the HNSW index in the same query
+        pref = (
+            sa.select(UserPreferencesRow.pref_vector)
+            .where(UserPreferencesRow.user_id == user_id)
+            .scalar_subquery()
+        )
+        stmt = (
+            sa.select(ArticleEmbeddingRow.pageid)
+            .where(ArticleEmbeddingRow.lang == lang, pref.is_not(None))
+            .order_by(ArticleEmbeddingRow.embedding.cosine_distance(pref))
+            .limit(k)
+        )
+        if exclude:
+            stmt = stmt.where(ArticleEmbeddingRow.pageid.not_in(list(exclude)))
+        if model is not None:
+            stmt = stmt.where(ArticleEmbeddingRow.model == model)
+
+        async with self._sf()() as session:
+            result = await session.scalars(stmt)
+            return [int(pageid) for pageid in result]
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional, Sequence
+from typing import Mapping, Optional, Sequence
 
 import sqlalchemy as sa
 from sqlalchemy.dialects.postgresql import insert
@@ -13,6 +13,29 @@ from tg_wiki.db.models import User, UserIdentity, UserSettingsRow, UserPreferenc
 from tg_wiki.db.ports import UserRepository
 
 
+# one round-trip for any number of users: the vectors are unnested server-side
+_BULK_UPDATE_PREFS = sa.text(
+    """
+    UPDATE user_preferences AS p
+    SET pref_vector = CAST(u.vec AS vector), updated_at = now()
+    FROM unnest(CAST(:ids AS bigint[]), CAST(:vecs AS text[])) AS u(user_id, vec)
+    WHERE p.user_id = u.user_id
+    RETURNING p.user_id
+    """
+)
+
+# users without a user_preferences row yet
+_BULK_INSERT_PREFS = sa.text(
+    """
+    INSERT INTO user_preferences (user_id, pref_vector)
+    SELECT u.user_id, CAST(u.vec AS vector)
+    FROM unnest(CAST(:ids AS bigint[]), CAST(:vecs AS text[])) AS u(user_id, vec)
+    ON CONFLICT (user_id)
+    DO UPDATE SET pref_vector = EXCLUDED.pref_vector, updated_at = now()
+    """
+)
+
+
 def _settings_from_row(row: UserSettingsRow | None) -> UserSettings:
     if row is None:
         return UserSettings()
@@ -166,3 +189,45 @@ class PostgresUserRepository(UserRepository):
                     row.pref_vector = vec
                     row.updated_at = sa.func.now()
                 await session.flush()
+
+    async def get_pref_vectors(
+        self, user_ids: Sequence[int]
+    ) -> dict[int, PreferenceVector]:
+        if not user_ids:
+            return {}
+        stmt = sa.select(UserPreferencesRow.user_id, UserPreferencesRow.pref_vector).where(
+            UserPreferencesRow.user_id.in_(list(user_ids)),
+            UserPreferencesRow.pref_vector.is_not(None),
+        )
+        async with self._sf()() as session:
+            result = await session.execute(stmt)
+            return {int(user_id): list(vec) for user_id, vec in result}
+
+    async def set_pref_vectors(self, vectors: Mapping[int, PreferenceVector]) -> None:
+        if not vectors:
+            return
+        ids: list[int] = []
+        texts: list[str] = []
+        for user_id, vector in vectors.items():
+            vec = list(vector)
+            if len(vec) != self.cfg.pref_vector_dim:
+                raise ValueError(
+                    f"Preference vector dim mismatch for user {user_id}: got {len(vec)}, "
+                    f"expected {self.cfg.pref_vector_dim}"
+                )
+            ids.append(int(user_id))
+            # pgvector's text input format; arrays of text bind without a custom codec
+            texts.append("[" + ",".join(map(str, vec)) + "]")
+
+        async with self._sf()() as session:
+            async with session.begin():
+                updated = await session.scalars(
+                    _BULK_UPDATE_PREFS, {"ids": ids, "vecs": texts}
+                )
+                missing = set(ids).difference(int(u) for u in updated)
+                if missing:
+                    rows = [(u, v) for u, v in zip(ids, texts) if u in missing]
+                    await session.execute(
+                        _BULK_INSERT_PREFS,
+                        {"ids": [u for u, _ in rows], "vecs": [v for _, v in rows]},
+                    )
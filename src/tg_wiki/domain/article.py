@@ -18,6 +18,8 @@ class Article:
     meta: ArticleMeta
     extract: Optional[str] = None
     lang: str = "ru"
+    lastrevid: Optional[int] = None
+    touched: Optional[str] = None
 
 
 @dataclass(frozen=True, slots=True)
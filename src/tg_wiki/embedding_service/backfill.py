@@ -0,0 +1,171 @@
+"""
+Bulk embedding backfill.
+
+Fetches random articles, embeds them in a process pool and upserts the
+vectors into `article_embeddings`:
+
+    python -m tg_wiki.embedding_service.backfill --articles 50000 --idf idf.npy
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterable, Optional, Sequence
+
+import numpy as np
+
+from tg_wiki.db.ports import ArticleEmbeddingRepository
+from tg_wiki.domain.article import Article, ArticleEmbedding
+from tg_wiki.embedding_service.embedder import (
+    EmbedderConfig,
+    HashingEmbedder,
+    article_text,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_worker_embedder: Optional[HashingEmbedder] = None
+
+
+def _init_worker(config: EmbedderConfig, idf: Optional[np.ndarray]) -> None:
+    # the bucket tables are built once per process, not once per chunk
+    global _worker_embedder
+    _worker_embedder = HashingEmbedder(config, idf)
+
+
+def _embed_chunk(articles: Sequence[Article]) -> list[ArticleEmbedding]:
+    if _worker_embedder is None:
+        raise RuntimeError("Embedding worker is not initialized")
+    return _worker_embedder.embed_articles(articles)
+
+
+async def backfill_embeddings(
+    batches: AsyncIterable[Sequence[Article]],
+    repo: ArticleEmbeddingRepository,
+    embedder: HashingEmbedder,
+    *,
+    workers: int | None = None,
+    max_in_flight: int | None = None,
+    lang: str = "ru",
+) -> int:
+    """
+    Embeds article batches in worker processes and upserts the results.
+
+    Args:
+        batches: Batches of articles; each batch is one unit of work.
+        repo: Where the embeddings are stored.
+        embedder: Provides the configuration and IDF table for the workers.
+        workers: Number of worker processes (defaults to the CPU count).
+        max_in_flight: Batches being embedded at once (defaults to 2 * workers).
+        lang: Wikipedia language of the articles.
+
+    Returns:
+        The number of stored embeddings.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    loop = asyncio.get_running_loop()
+    stored = 0
+    pending: set[asyncio.Future] = set()
+
+    async def drain(return_when: str) -> None:
+        nonlocal stored, pending
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        for future in done:
+            embeddings = future.result()
+            await repo.upsert_embeddings(embeddings, lang=lang)
+            stored += len(embeddings)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(embedder.config, embedder.idf),
+    ) as executor:
+        async for batch in batches:
+            if not batch:
+                continue
+            pending.add(loop.run_in_executor(executor, _embed_chunk, list(batch)))
+            if len(pending) >= max_in_flight:
+                await drain(asyncio.FIRST_COMPLETED)
+                logger.info("Stored %d embeddings", stored)
+        while pending:
+            await drain(asyncio.ALL_COMPLETED)
+    return stored
+
+
+async def main() -> None:
+    from dotenv import load_dotenv
+
+    from tg_wiki.client.http import HttpClient
+    from tg_wiki.db.config import DBConfig
+    from tg_wiki.db.postgres.embeddings import PostgresArticleEmbeddingRepository
+    from tg_wiki.wiki_service.wiki import WikiService
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=200, help="articles per chunk")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--idf", help="IDF table (.npy); fitted on the first chunk if missing")
+    parser.add_argument("--min-length", type=int, default=100)
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    cfg = DBConfig.from_env()
+    http = HttpClient()
+    repo = PostgresArticleEmbeddingRepository(cfg)
+    await http.start()
+    await repo.start()
+    try:
+        wiki = WikiService(http)
+        idf = None
+        if args.idf and os.path.exists(args.idf):
+            idf = np.load(args.idf)
+        embedder = HashingEmbedder(EmbedderConfig(dim=cfg.pref_vector_dim), idf)
+
+        async def fetch_chunk(limit: int) -> list[Article]:
+            # a single random request is capped at EXTRACTS_LIMIT pages, and
+            # separate requests may return the same page
+            chunk: dict[int, Article] = {}
+            while len(chunk) < limit:
+                articles = await wiki.get_random_articles(
+                    limit - len(chunk), min_length=args.min_length
+                )
+                fresh = [a for a in articles if a.meta.pageid not in chunk]
+                if not fresh:
+                    break
+                chunk.update((a.meta.pageid, a) for a in fresh)
+            return list(chunk.values())
+
+        first = await fetch_chunk(min(args.batch, args.articles))
+        if embedder.idf is None and first:
+            embedder.fit_idf([article_text(a) for a in first])
+            if args.idf:
+                np.save(args.idf, embedder.idf)
+
+        async def batches():
+            chunk = first
+            fetched = len(chunk)
+            while chunk:
+                yield chunk
+                if fetched >= args.articles:
+                    break
+                chunk = await fetch_chunk(min(args.batch, args.articles - fetched))
+                fetched += len(chunk)
+
+        stored = await backfill_embeddings(
+            batches(), repo, embedder, workers=args.workers
+        )
+        logger.info("Backfill done: %d embeddings (%s)", stored, embedder.model)
+    finally:
+        await repo.close()
+        await http.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
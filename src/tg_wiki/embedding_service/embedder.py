@@ -0,0 +1,195 @@
+import re
+import zlib
+
+from dataclasses import dataclass
+from typing import Final, Optional, Sequence
+
+import numpy as np
+
+from tg_wiki.domain.article import Article, ArticleEmbedding
+
+
+_WORD_RE = re.compile(r"\w+")
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_POLY = np.uint64(0x100000001B3)
+
+
+@dataclass(frozen=True, slots=True)
+class EmbedderConfig:
+    dim: int = 1536
+    n_buckets: int = 1 << 20
+    char_ngrams: tuple[int, ...] = (3, 4, 5)
+    word_ngrams: bool = True
+    max_chars: int = 4000
+
+
+def article_text(article: Article) -> str:
+    """The text an article is embedded from: its title and extract."""
+    return f"{article.meta.title}\n{article.extract or ''}"
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """Finalizes 64-bit hashes so that the low bits are well distributed."""
+    h = h ^ (h >> np.uint64(33))
+    h = h * _MIX
+    return h ^ (h >> np.uint64(29))
+
+
+class HashingEmbedder:
+    """
+    Dependency-free text embedder: hashed n-grams, TF-IDF, signed projection.
+
+    A batch of texts is encoded into one UTF-8 byte buffer; byte n-grams
+    (roughly character 2-3-grams for Cyrillic) are hashed for the whole
+    buffer at once with NumPy, and words are added as CRC32 hashes. Features
+    live in `n_buckets` hash buckets, where the sublinear TF is weighted by
+    an IDF table (see `fit_idf`); each bucket is then folded into `dim` with a
+    random sign (a count sketch), and rows are L2-normalized so that cosine
+    similarity is a dot product.
+    """
+
+    def __init__(
+        self, config: EmbedderConfig | None = None, idf: Optional[np.ndarray] = None
+    ) -> None:
+        self._cfg: Final[EmbedderConfig] = config or EmbedderConfig()
+        n = self._cfg.n_buckets
+        if n <= 0 or n & (n - 1):
+            raise ValueError("n_buckets must be a power of two")
+        if self._cfg.dim <= 0:
+            raise ValueError("dim must be positive")
+        if idf is not None and idf.shape != (n,):
+            raise ValueError(f"idf must have shape ({n},), got {idf.shape}")
+
+        buckets = np.arange(n, dtype=np.uint64)
+        mixed = _mix(buckets + _MIX)
+        self._dim_index = (mixed % np.uint64(self._cfg.dim)).astype(np.int64)
+        self._sign = np.where(mixed >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+        self._idf = idf.astype(np.float32) if idf is not None else None
+
+    @property
+    def config(self) -> EmbedderConfig:
+        return self._cfg
+
+    @property
+    def idf(self) -> Optional[np.ndarray]:
+        return self._idf
+
+    @property
+    def model(self) -> str:
+        weighting = "tfidf" if self._idf is not None else "tf"
+        return f"hash-{weighting}-v1-{self._cfg.dim}"
+
+    def _normalize(self, text: str) -> str:
+        return text[: self._cfg.max_chars].casefold().replace("ё", "е")
+
+    def _features(self, texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns parallel arrays (doc index, bucket) of every feature occurrence.
+        """
+        mask = np.uint64(self._cfg.n_buckets - 1)
+        docs_out: list[np.ndarray] = []
+        buckets_out: list[np.ndarray] = []
+
+        normalized = [self._normalize(t) for t in texts]
+        encoded = [t.encode("utf-8") for t in normalized]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        buf = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        doc_of_byte = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)
+
+        for n in self._cfg.char_ngrams:
+            windows = len(buf) - n + 1
+            if windows <= 0:
+                continue
+            h = np.full(windows, np.uint64(n), dtype=np.uint64)
+            for j in range(n):
+                h = h * _POLY + buf[j : j + windows]
+            # n-grams spanning two documents are dropped
+            same_doc = doc_of_byte[:windows] == doc_of_byte[n - 1 :]
+            docs_out.append(doc_of_byte[:windows][same_doc])
+            buckets_out.append((_mix(h[same_doc]) & mask).astype(np.int64))
+
+        if self._cfg.word_ngrams:
+            word_docs: list[int] = []
+            word_hashes: list[int] = []
+            for i, text in enumerate(normalized):
+                words = _WORD_RE.findall(text)
+                word_docs.extend([i] * len(words))
+                word_hashes.extend(zlib.crc32(w.encode("utf-8")) for w in words)
+            if word_hashes:
+                h = np.asarray(word_hashes, dtype=np.uint64) | np.uint64(1 << 40)
+                docs_out.append(np.asarray(word_docs, dtype=np.int64))
+                buckets_out.append((_mix(h) & mask).astype(np.int64))
+
+        if not docs_out:
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        return np.concatenate(docs_out), np.concatenate(buckets_out)
+
+    def _term_counts(
+        self, texts: Sequence[str]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        docs, buckets = self._features(texts)
+        keys = docs * np.int64(self._cfg.n_buckets) + buckets
+        unique, counts = np.unique(keys, return_counts=True)
+        return (
+            unique // self._cfg.n_buckets,
+            unique % self._cfg.n_buckets,
+            counts.astype(np.float32),
+        )
+
+    def fit_idf(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Computes a smoothed IDF table over a corpus and starts using it.
+
+        Args:
+            texts: A representative sample of article extracts.
+
+        Returns:
+            The IDF table, e.g. to be saved with `np.save`.
+        """
+        _, buckets, _ = self._term_counts(texts)
+        df = np.bincount(buckets, minlength=self._cfg.n_buckets).astype(np.float32)
+        self._idf = np.log((1.0 + len(texts)) / (1.0 + df)).astype(np.float32) + 1.0
+        return self._idf
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embeds a batch of texts.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            A float32 matrix of shape (len(texts), dim) with L2-normalized rows;
+            rows of empty texts are all zeros.
+        """
+        dim = self._cfg.dim
+        if not texts:
+            return np.zeros((0, dim), dtype=np.float32)
+
+        docs, buckets, counts = self._term_counts(texts)
+        weights = 1.0 + np.log(counts)
+        if self._idf is not None:
+            weights *= self._idf[buckets]
+        weights *= self._sign[buckets]
+
+        flat = docs * dim + self._dim_index[buckets]
+        out = np.bincount(flat, weights=weights, minlength=len(texts) * dim)
+        out = out.reshape(len(texts), dim).astype(np.float32)
+
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+    def embed_articles(self, articles: Sequence[Article]) -> list[ArticleEmbedding]:
+        """
+        Embeds the title and extract of each article.
+
+        Returns:
+            One ArticleEmbedding per article, tagged with this embedder's model.
+        """
+        vectors = self.embed([article_text(a) for a in articles])
+        model = self.model
+        return [
+            ArticleEmbedding(pageid=a.meta.pageid, vector=row.tolist(), model=model)
+            for a, row in zip(articles, vectors)
+        ]
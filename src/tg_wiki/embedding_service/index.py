@@ -0,0 +1,448 @@
+import asyncio
+import logging
+import math
+import time
+
+from dataclasses import dataclass, field
+from typing import Collection, Final, Optional, Sequence
+
+import numpy as np
+
+from tg_wiki.cache.ports import ArticleObserver
+from tg_wiki.client.hedging import LatencyTracker
+from tg_wiki.domain.article import Article
+from tg_wiki.embedding_service.embedder import HashingEmbedder, article_text
+
+
+logger = logging.getLogger(__name__)
+
+# queries between two latency reports in the log
+LATENCY_REPORT_EVERY = 1000
+# articles embedded per worker-thread call
+EMBED_BATCH = 256
+
+
+@dataclass(frozen=True, slots=True)
+class VectorIndexConfig:
+    initial_capacity: int = 1024
+    # IVF partitioning kicks in at this many vectors
+    ivf_threshold: int = 20000
+    ivf_probes: int = 8
+    ivf_iterations: int = 8
+    ivf_sample: int = 16384
+    latency_window: int = 500
+
+
+@dataclass(slots=True)
+class IndexStats:
+    queries: int = 0
+    vectors_scored: int = 0
+    trainings: int = 0
+    latency: LatencyTracker = field(default_factory=lambda: LatencyTracker(500))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def train_centroids(
+    vectors: np.ndarray, n_lists: int, iterations: int, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means over normalized vectors.
+
+    Returns:
+        The (n_lists, dim) normalized centroids and the list of every vector.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    labels = np.zeros(len(vectors), dtype=np.int32)
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.bincount(labels, minlength=n_lists) == 0
+        # an empty list is restarted on a random vector instead of collapsing
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids, labels
+
+
+class VectorIndex:
+    """
+    Exact (optionally IVF-partitioned) cosine top-k over an in-process matrix.
+
+    Vectors are L2-normalized rows of one contiguous float32 matrix, so a
+    batch of queries is scored with a single matrix product. Removal moves
+    the last row into the freed slot, keeping the live rows contiguous.
+    Past `ivf_threshold` vectors the rows can be partitioned with k-means
+    (see `train_centroids`); queries then only score the `ivf_probes` lists
+    nearest to them.
+    """
+
+    def __init__(self, dim: int, config: VectorIndexConfig | None = None) -> None:
+        self._cfg: Final[VectorIndexConfig] = config or VectorIndexConfig()
+        if dim <= 0:
+            raise ValueError("dim must be positive")
+        if self._cfg.initial_capacity <= 0 or self._cfg.ivf_probes <= 0:
+            raise ValueError("initial_capacity and ivf_probes must be positive")
+
+        self._dim = dim
+        self._matrix = np.zeros((self._cfg.initial_capacity, dim), dtype=np.float32)
+        self._ids = np.zeros(self._cfg.initial_capacity, dtype=np.int64)
+        self._lists = np.full(self._cfg.initial_capacity, -1, dtype=np.int32)
+        self._row_of: dict[int, int] = {}
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self.stats = IndexStats(latency=LatencyTracker(self._cfg.latency_window))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, pageid: int) -> bool:
+        return pageid in self._row_of
+
+    @property
+    def config(self) -> VectorIndexConfig:
+        return self._cfg
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    @property
+    def partitioned(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the vector storage, including unused capacity."""
+        return self._matrix.nbytes + self._ids.nbytes + self._lists.nbytes
+
+    @property
+    def needs_training(self) -> bool:
+        """Whether the index grew enough to (re)build its IVF partitions."""
+        if self._size < self._cfg.ivf_threshold:
+            return False
+        return self._centroids is None or self._size >= 2 * self._trained_size
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self._dim), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        lists = np.full(capacity, -1, dtype=np.int32)
+        lists[: self._size] = self._lists[: self._size]
+        self._matrix, self._ids, self._lists = matrix, ids, lists
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def add_many(self, pageids: Sequence[int], vectors: np.ndarray) -> None:
+        """Adds or replaces vectors; they are normalized on the way in."""
+        if len(pageids) != len(vectors):
+            raise ValueError("pageids and vectors must have the same length")
+        if not len(pageids):
+            return
+        vectors = _normalize(vectors)
+        if vectors.shape[1] != self._dim:
+            raise ValueError(
+                f"Expected vectors of dim {self._dim}, got {vectors.shape[1]}"
+            )
+
+        rows = np.empty(len(pageids), dtype=np.int64)
+        new = 0
+        for i, pageid in enumerate(pageids):
+            row = self._row_of.get(pageid)
+            if row is None:
+                row = self._size + new
+                self._row_of[pageid] = row
+                new += 1
+            rows[i] = row
+        self._grow(self._size + new)
+        self._matrix[rows] = vectors
+        self._ids[rows] = pageids
+        self._lists[rows] = self._assign(vectors)
+        self._size += new
+
+    def remove(self, pageid: int) -> bool:
+        row = self._row_of.pop(pageid, None)
+        if row is None:
+            return False
+        last = self._size - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = self._ids[last]
+            self._lists[row] = self._lists[last]
+            self._row_of[int(self._ids[row])] = row
+        self._size = last
+        return True
+
+    def training_sample(self) -> tuple[np.ndarray, int]:
+        """
+        A copy of (up to `ivf_sample`) rows to train on, and the list count.
+        """
+        n_lists = max(1, int(math.sqrt(self._size)))
+        size = min(self._size, max(self._cfg.ivf_sample, n_lists))
+        rows = np.random.default_rng().choice(self._size, size, replace=False)
+        return self._matrix[rows].copy(), n_lists
+
+    def set_centroids(self, centroids: np.ndarray) -> None:
+        """Installs IVF centroids and assigns every row to its list."""
+        self._centroids = _normalize(centroids)
+        self._trained_size = self._size
+        chunk = 4096
+        for start in range(0, self._size, chunk):
+            stop = min(start + chunk, self._size)
+            self._lists[start:stop] = self._assign(self._matrix[start:stop])
+        self.stats.trainings += 1
+
+    def train(self) -> None:
+        """Builds the IVF partitions synchronously."""
+        sample, n_lists = self.training_sample()
+        centroids, _ = train_centroids(sample, n_lists, self._cfg.ivf_iterations)
+        self.set_centroids(centroids)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        *,
+        exclude: Collection[int] = (),
+    ) -> list[list[tuple[int, float]]]:
+        """
+        Finds the k vectors most similar to each query.
+
+        Args:
+            queries: A (q, dim) batch of query vectors (or a single vector).
+            k: The number of results per query.
+            exclude: Pageids that must not be returned.
+
+        Returns:
+            For each query, (pageid, cosine similarity) pairs, best first.
+        """
+        started = time.perf_counter()
+        queries = _normalize(np.atleast_2d(queries))
+        results: list[list[tuple[int, float]]] = [[] for _ in range(len(queries))]
+        n = self._size
+        if k <= 0 or n == 0:
+            return results
+
+        excluded = np.fromiter(
+            (self._row_of[p] for p in exclude if p in self._row_of), dtype=np.int64
+        )
+        matrix = self._matrix[:n]
+        if self._centroids is None:
+            scores = queries @ matrix.T
+            scores[:, excluded] = -np.inf
+            for i in range(len(queries)):
+                results[i] = self._top_k(scores[i], None, k)
+            self.stats.vectors_scored += n * len(queries)
+        else:
+            probes = min(self._cfg.ivf_probes, len(self._centroids))
+            near = np.argpartition(-(queries @ self._centroids.T), probes - 1, axis=1)
+            lists = self._lists[:n]
+            blocked = np.zeros(n, dtype=bool)
+            blocked[excluded] = True
+            for i, query in enumerate(queries):
+                rows = np.flatnonzero(np.isin(lists, near[i, :probes]) & ~blocked)
+                results[i] = self._top_k(matrix[rows] @ query, rows, k)
+                self.stats.vectors_scored += len(rows)
+
+        self.stats.queries += len(queries)
+        self.stats.latency.observe(time.perf_counter() - started)
+        return results
+
+    def _top_k(
+        self, scores: np.ndarray, rows: Optional[np.ndarray], k: int
+    ) -> list[tuple[int, float]]:
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        ids = self._ids[rows[top] if rows is not None else top]
+        return [(int(p), float(s)) for p, s in zip(ids, scores[top])]
+
+
+class _Holder:
+    """ArticleObserver for one article holder; notifications are idempotent."""
+
+    __slots__ = ("_index", "_ids")
+
+    def __init__(self, index: "ArticleIndex") -> None:
+        self._index = index
+        self._ids: set[int] = set()
+
+    def added(self, article: Article) -> None:
+        pageid = article.meta.pageid
+        if pageid not in self._ids:
+            self._ids.add(pageid)
+            self._index._retain(pageid)
+        self._index._store(article)
+
+    def removed(self, pageid: int) -> None:
+        if pageid in self._ids:
+            self._ids.discard(pageid)
+            self._index._release(pageid)
+
+
+class ArticleIndex:
+    """
+    Keeps a VectorIndex in sync with the articles held in memory.
+
+    Each holder (the article cache, the prefetch pool) reports what it holds
+    through its own observer from `observer()`; an article stays indexed while
+    at least one holder has it. New articles are embedded in the background,
+    in batches of EMBED_BATCH in a worker thread, so queries never wait for
+    embedding (an article becomes searchable a moment after it is added).
+    IVF partitions are (re)built in a worker thread once the index grows past
+    the threshold.
+
+    The vectors take `dim * 4` bytes per article (6 KB at 1536 dimensions)
+    plus up to as much again of unused capacity; this is on top of the
+    memory budget of the article cache.
+    """
+
+    def __init__(
+        self, embedder: HashingEmbedder, config: VectorIndexConfig | None = None
+    ) -> None:
+        self._embedder = embedder
+        self._index = VectorIndex(embedder.config.dim, config)
+        self._articles: dict[int, Article] = {}
+        self._refs: dict[int, int] = {}
+        self._pending: dict[int, Article] = {}
+        self._syncing: asyncio.Task | None = None
+        self._training: asyncio.Task | None = None
+
+    @property
+    def index(self) -> VectorIndex:
+        return self._index
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def observer(self) -> ArticleObserver:
+        """A new observer for one more article holder."""
+        return _Holder(self)
+
+    def get(self, pageid: int) -> Optional[Article]:
+        return self._articles.get(pageid)
+
+    def _retain(self, pageid: int) -> None:
+        self._refs[pageid] = self._refs.get(pageid, 0) + 1
+
+    def _release(self, pageid: int) -> None:
+        refs = self._refs.pop(pageid, 0) - 1
+        if refs > 0:
+            self._refs[pageid] = refs
+            return
+        self._articles.pop(pageid, None)
+        self._pending.pop(pageid, None)
+        self._index.remove(pageid)
+
+    def _store(self, article: Article) -> None:
+        pageid = article.meta.pageid
+        previous = self._articles.get(pageid)
+        self._articles[pageid] = article
+        if previous is None or article_text(previous) != article_text(article):
+            self._pending[pageid] = article
+            self._schedule_sync()
+
+    def _schedule_sync(self) -> None:
+        if not self._pending or (
+            self._syncing is not None and not self._syncing.done()
+        ):
+            return
+        try:
+            self._syncing = asyncio.get_running_loop().create_task(self._sync())
+        except RuntimeError:
+            # no event loop yet: the first query schedules it
+            pass
+
+    async def _sync(self) -> None:
+        while self._pending:
+            batch = []
+            for pageid in list(self._pending)[:EMBED_BATCH]:
+                batch.append(self._pending.pop(pageid))
+            try:
+                vectors = await asyncio.to_thread(
+                    self._embedder.embed, [article_text(a) for a in batch]
+                )
+            except Exception:
+                logger.exception("Embedding %d articles failed", len(batch))
+                continue
+
+            # skip articles released or changed while they were being embedded
+            fresh = [
+                i
+                for i, article in enumerate(batch)
+                if self._articles.get(article.meta.pageid) is article
+            ]
+            if fresh:
+                self._index.add_many(
+                    [batch[i].meta.pageid for i in fresh], vectors[fresh]
+                )
+
+        if self._index.needs_training and (
+            self._training is None or self._training.done()
+        ):
+            self._training = asyncio.create_task(self._train())
+
+    async def _train(self) -> None:
+        sample, n_lists = self._index.training_sample()
+        try:
+            centroids, _ = await asyncio.to_thread(
+                train_centroids, sample, n_lists, self._index.config.ivf_iterations
+            )
+        except Exception:
+            logger.exception("IVF training failed")
+            return
+        self._index.set_centroids(centroids)
+        logger.info(
+            "Article index partitioned: %d vectors in %d lists",
+            len(self._index),
+            n_lists,
+        )
+
+    def nearest(
+        self, query: Sequence[float], k: int, *, exclude: Collection[int] = ()
+    ) -> list[int]:
+        """Pageids of the k indexed articles most similar to `query`."""
+        self._schedule_sync()
+        if len(query) != self._index.dim:
+            return []
+        (hits,) = self._index.search(np.asarray(query), k, exclude=exclude)
+
+        stats = self._index.stats
+        if stats.queries % LATENCY_REPORT_EVERY == 0:
+            logger.info(
+                "Article index: %d vectors%s, %.1f MiB, query p50 %.2f ms, p95 %.2f ms",
+                len(self._index),
+                " (IVF)" if self._index.partitioned else "",
+                self._index.nbytes / 1024**2,
+                (stats.latency.quantile(0.5) or 0.0) * 1000,
+                (stats.latency.quantile(0.95) or 0.0) * 1000,
+            )
+        return [pageid for pageid, _ in hits]
+
+    async def close(self) -> None:
+        if self._syncing is not None:
+            self._syncing.cancel()
+            await asyncio.gather(self._syncing, return_exceptions=True)
+            self._syncing = None
+        if self._training is not None:
+            self._training.cancel()
+            await asyncio.gather(self._training, return_exceptions=True)
+            self._training = None
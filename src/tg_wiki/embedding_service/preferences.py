@@ -0,0 +1,338 @@
+import asyncio
+import logging
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Final, Optional, Sequence
+
+import numpy as np
+
+from tg_wiki.db.ports import UserRepository
+from tg_wiki.domain.article import Article
+from tg_wiki.embedding_service.embedder import HashingEmbedder, article_text
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class PreferenceAggregatorConfig:
+    alpha: float = 0.1
+    view_weight: float = 1.0
+    skip_weight: float = 0.5
+    skip_within_sec: float = 10.0
+    flush_interval_sec: float = 5.0
+    flush_max_users: int = 500
+    max_open: int = 10000
+    max_vectors: int = 10000
+    # signals kept while flushes fail; the oldest are dropped beyond this
+    max_pending: int = 50000
+
+
+@dataclass(slots=True)
+class _Impression:
+    user_id: int
+    article: Article
+    shown_at: float
+    opened: bool = False
+
+
+def fold_signals(
+    base: np.ndarray,
+    user_index: np.ndarray,
+    weights: np.ndarray,
+    vectors: np.ndarray,
+    alpha: float,
+) -> np.ndarray:
+    """
+    Applies per-user sequences of signals to preference vectors with an EMA.
+
+    For a user with base vector v and signals (w_1, e_1) .. (w_m, e_m) in
+    order, the result is the L2-normalized closed form of m EMA steps
+    v <- (1 - alpha) * v + alpha * w * e, computed for all users at once.
+
+    Args:
+        base: (users, dim) current vectors; zero rows for users without one.
+        user_index: (signals,) row of `base` each signal belongs to, in
+            chronological order.
+        weights: (signals,) signed signal weights.
+        vectors: (signals, dim) normalized article embeddings.
+        alpha: The EMA smoothing factor in (0, 1].
+
+    Returns:
+        The updated (users, dim) float32 matrix.
+    """
+    n_users = base.shape[0]
+    counts = np.bincount(user_index, minlength=n_users)
+
+    # rank of each signal within its user's sequence, keeping the time order
+    order = np.argsort(user_index, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order)) - starts[user_index[order]]
+    age = counts[user_index] - 1 - rank
+
+    decay = 1.0 - alpha
+    coef = (alpha * weights * decay**age).astype(np.float32)
+    out = base.astype(np.float32) * (decay ** counts)[:, None].astype(np.float32)
+
+    # signals are contiguous per user once sorted, so one reduceat sums them
+    weighted = vectors[order] * coef[order, None]
+    present = counts > 0
+    out[present] += np.add.reduceat(weighted, starts[present], axis=0)
+
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    np.divide(out, norms, out=out, where=norms > 0)
+    return out
+
+
+class PreferenceAggregator:
+    """
+    Write-behind aggregation of view/skip signals into preference vectors.
+
+    Every article shown by `/next` stays open until the user's next event: if
+    the next article is requested within `skip_within_sec` it counts as a skip,
+    otherwise as a view; opening an article (`select:`) counts as a view at
+    once. Signals are only collected in memory. Every `flush_interval_sec`,
+    or as soon as `flush_max_users` users have pending signals, they are
+    embedded in one batch, folded into the stored vectors with an EMA, and
+    written back with one bulk statement. `close` resolves the open
+    impressions and flushes whatever is left.
+    """
+
+    def __init__(
+        self,
+        repo: UserRepository,
+        embedder: HashingEmbedder,
+        config: PreferenceAggregatorConfig | None = None,
+    ) -> None:
+        self._cfg: Final[PreferenceAggregatorConfig] = (
+            config or PreferenceAggregatorConfig()
+        )
+        if not 0 < self._cfg.alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        if self._cfg.flush_interval_sec <= 0:
+            raise ValueError("flush_interval_sec must be positive")
+        limits = (
+            self._cfg.flush_max_users,
+            self._cfg.max_open,
+            self._cfg.max_vectors,
+            self._cfg.max_pending,
+        )
+        if min(limits) <= 0:
+            raise ValueError(
+                "flush_max_users, max_open, max_vectors and max_pending must be positive"
+            )
+
+        self._repo = repo
+        self._embedder = embedder
+        self._open: OrderedDict[int, _Impression] = OrderedDict()
+        self._pending: list[tuple[int, Article, float]] = []
+        self._pending_users: set[int] = set()
+        self._dropped = 0
+        # latest known vector per user (None: the user has none yet)
+        self._vectors: OrderedDict[int, Optional[np.ndarray]] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def config(self) -> PreferenceAggregatorConfig:
+        return self._cfg
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def dropped(self) -> int:
+        """Signals dropped because `max_pending` was exceeded."""
+        return self._dropped
+
+    def _remember(self, user_id: int, vector: Optional[np.ndarray]) -> None:
+        self._vectors[user_id] = vector
+        self._vectors.move_to_end(user_id)
+        while len(self._vectors) > self._cfg.max_vectors:
+            self._vectors.popitem(last=False)
+
+    async def vector(self, user_id: int) -> Optional[np.ndarray]:
+        """
+        The user's current preference vector.
+
+        Vectors written by this aggregator are kept in memory, so only the first
+        lookup of a user the process has not updated yet reads the database.
+        """
+        if user_id in self._vectors:
+            self._vectors.move_to_end(user_id)
+            return self._vectors[user_id]
+        stored = await self._repo.get_pref_vector(user_id)
+        vector = np.asarray(stored, dtype=np.float32) if stored is not None else None
+        self._remember(user_id, vector)
+        return vector
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while self._open:
+            _, impression = self._open.popitem(last=False)
+            self._resolve(impression, None)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception(
+                "Final preference flush failed, %d signals dropped", len(self._pending)
+            )
+
+    def _signal(self, user_id: int, article: Article, weight: float) -> None:
+        self._pending.append((user_id, article, weight))
+        self._pending_users.add(user_id)
+        self._trim()
+        if len(self._pending_users) >= self._cfg.flush_max_users:
+            self._wakeup.set()
+
+    def _trim(self) -> None:
+        """Drops the oldest signals once there are more than `max_pending`."""
+        limit = self._cfg.max_pending
+        if len(self._pending) <= limit:
+            return
+        # drop a tenth more than needed, so that the set rebuild is amortized
+        excess = len(self._pending) - limit + limit // 10
+        del self._pending[:excess]
+        self._pending_users = {user_id for user_id, _, _ in self._pending}
+        self._dropped += excess
+        logger.warning(
+            "Preference signal buffer is full, dropped %d oldest signals (%d total)",
+            excess,
+            self._dropped,
+        )
+
+    def _resolve(self, impression: _Impression, next_at: Optional[float]) -> None:
+        """
+        Turns an impression into a signal once the user moved on (`next_at`)
+        or it is dropped without a follow-up (None, counted as a view).
+        """
+        if impression.opened:
+            return
+        skipped = (
+            next_at is not None
+            and next_at - impression.shown_at < self._cfg.skip_within_sec
+        )
+        if skipped:
+            weight = -self._cfg.skip_weight
+        else:
+            weight = self._cfg.view_weight
+        self._signal(impression.user_id, impression.article, weight)
+
+    def _replace_open(self, impression: _Impression) -> None:
+        now = impression.shown_at
+        previous = self._open.pop(impression.user_id, None)
+        if previous is not None:
+            self._resolve(previous, now)
+        self._open[impression.user_id] = impression
+        while len(self._open) > self._cfg.max_open:
+            _, oldest = self._open.popitem(last=False)
+            self._resolve(oldest, None)
+
+    def shown(self, user_id: int, article: Article) -> None:
+        """Records that `/next` showed an article; resolves the previous one."""
+        self._replace_open(_Impression(user_id, article, time.monotonic()))
+
+    def viewed(self, user_id: int, article: Article) -> None:
+        """Records that the user opened an article (or paged through it)."""
+        impression = self._open.get(user_id)
+        if (
+            impression is not None
+            and impression.article.meta.pageid == article.meta.pageid
+        ):
+            if not impression.opened:
+                impression.opened = True
+                self._signal(user_id, article, self._cfg.view_weight)
+            return
+        self._replace_open(
+            _Impression(user_id, article, time.monotonic(), opened=True)
+        )
+        self._signal(user_id, article, self._cfg.view_weight)
+
+    async def flush(self) -> int:
+        """
+        Writes all pending signals.
+
+        Returns:
+            The number of users whose vectors were updated.
+        """
+        async with self._lock:
+            signals = self._pending
+            if not signals:
+                return 0
+            self._pending = []
+            self._pending_users = set()
+            try:
+                return await self._apply(signals)
+            except BaseException:
+                # keep the signals (ahead of newer ones) for the next attempt
+                self._pending[:0] = signals
+                self._pending_users.update(user_id for user_id, _, _ in signals)
+                self._trim()
+                raise
+
+    async def _apply(self, signals: Sequence[tuple[int, Article, float]]) -> int:
+        users = np.fromiter((s[0] for s in signals), dtype=np.int64, count=len(signals))
+        user_ids, user_index = np.unique(users, return_inverse=True)
+        weights = np.fromiter((s[2] for s in signals), dtype=np.float32, count=len(signals))
+        texts = [article_text(s[1]) for s in signals]
+
+        stored = await self._repo.get_pref_vectors(user_ids.tolist())
+        dim = self._embedder.config.dim
+
+        def compute() -> np.ndarray:
+            vectors = self._embedder.embed(texts)
+            base = np.zeros((len(user_ids), dim), dtype=np.float32)
+            for row, user_id in enumerate(user_ids.tolist()):
+                vector = stored.get(user_id)
+                if vector is not None and len(vector) == dim:
+                    base[row] = vector
+            return fold_signals(base, user_index, weights, vectors, self._cfg.alpha)
+
+        # embedding and folding are CPU-bound; keep them off the event loop
+        folded = await asyncio.to_thread(compute)
+        rows = {
+            user_id: row for user_id, row in zip(user_ids.tolist(), folded) if row.any()
+        }
+        await self._repo.set_pref_vectors(
+            {user_id: row.tolist() for user_id, row in rows.items()}
+        )
+        for user_id, row in rows.items():
+            self._remember(user_id, row)
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self._cfg.flush_interval_sec
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    "Preference flush failed, %d signals kept", len(self._pending)
+                )
+                # do not retry on every new signal while the database is down
+                await asyncio.sleep(self._cfg.flush_interval_sec)
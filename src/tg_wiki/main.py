@@ -1,6 +1,7 @@
 import asyncio
 import os
 import inspect
+import numpy as np
 import redis.asyncio as redis
 
 from aiogram import Bot, Dispatcher
@@ -16,16 +17,42 @@ from tg_wiki.cache.in_memory.last_view import InMemoryLastViewCache
 from tg_wiki.cache.in_memory.articles import InMemoryArticleCache
 from tg_wiki.cache.in_memory.user_settings import InMemoryUserSettingsCache
 from tg_wiki.cache.in_memory.user_id import InMemoryUserIDCache
+from tg_wiki.cache.in_memory.search import InMemorySearchCache
+from tg_wiki.cache.in_memory.context import InMemoryUserContextStore
+from tg_wiki.cache.in_memory.seen import InMemorySeenFilter
+from tg_wiki.cache.in_memory.up_next import InMemoryUpNextQueue
 
 from tg_wiki.cache.redis.last_view import RedisLastViewCache
 from tg_wiki.cache.redis.article import RedisArticleCache
 from tg_wiki.cache.redis.user_settings import RedisUserSettingsCache
 from tg_wiki.cache.redis.user_id import RedisUserIDCache
+from tg_wiki.cache.redis.search import RedisSearchCache
+from tg_wiki.cache.redis.context import RedisUserContextStore
+from tg_wiki.cache.redis.seen import RedisSeenFilter
+from tg_wiki.cache.redis.up_next import RedisUpNextQueue
+
+from tg_wiki.cache.tiered.invalidation import InvalidationBus
+from tg_wiki.cache.tiered.caches import (
+    TieredArticleCache,
+    TieredUserIDCache,
+    TieredUserSettingsCache,
+)
 
 from tg_wiki.db.config import DBConfig
+from tg_wiki.db.postgres.embeddings import PostgresArticleEmbeddingRepository
 from tg_wiki.db.postgres.postgres import PostgresUserRepository
 
+from tg_wiki.embedding_service.embedder import EmbedderConfig, HashingEmbedder
+from tg_wiki.embedding_service.index import ArticleIndex, VectorIndexConfig
+from tg_wiki.embedding_service.preferences import (
+    PreferenceAggregator,
+    PreferenceAggregatorConfig,
+)
+
+from tg_wiki.reco_service.pipeline import PipelineConfig, build_pipeline
+from tg_wiki.reco_service.pool import ArticlePool, ArticlePoolConfig
 from tg_wiki.reco_service.reco import RecoService
+from tg_wiki.reco_service.up_next import UpNextConfig, UpNextRefiller
 from tg_wiki.search_service.search import SearchService
 from tg_wiki.settings_service.user_settings import UserSettingsService
 
@@ -63,8 +90,16 @@ async def main() -> None:
     load_dotenv()
 
     redis_client = None
+    redis_bytes = None
     http = None
     bot = None
+    pool = None
+    user_repo = None
+    invalidation_bus = None
+    up_next = None
+    embeddings = None
+    preferences = None
+    article_index = None
 
     try:
         bot = Bot(token=os.environ["BOT_TOKEN"])
@@ -75,6 +110,39 @@ async def main() -> None:
 
         wiki_service = WikiService(http)
 
+        negative_ttl = int(os.getenv("NEGATIVE_CACHE_TTL_S", "300"))
+        seen_capacity = int(os.getenv("SEEN_FILTER_CAPACITY", "20000"))
+        seen_fp_rate = float(os.getenv("SEEN_FILTER_FP_RATE", "0.001"))
+        seen_initial = int(os.getenv("SEEN_FILTER_INITIAL_CAPACITY", "256"))
+        up_next_config = UpNextConfig(
+            depth=int(os.getenv("UP_NEXT_DEPTH", "5")),
+            refill_below=int(os.getenv("UP_NEXT_REFILL_BELOW", "2")),
+        )
+        up_next_idle_ttl = int(os.getenv("UP_NEXT_IDLE_TTL_S", "3600"))
+
+        reco_mode = os.getenv("RECO_MODE", "random")
+        embedder = None
+        if reco_mode in ("embedding", "local"):
+            idf_path = os.getenv("EMBEDDER_IDF_PATH")
+            if reco_mode == "embedding" and not idf_path:
+                # the backfill writes TF-IDF vectors; TF-only preferences
+                # would not be comparable with them
+                raise RuntimeError(
+                    "EMBEDDER_IDF_PATH is required with RECO_MODE=embedding"
+                )
+            embedder = HashingEmbedder(
+                EmbedderConfig(dim=DBConfig.from_env().pref_vector_dim),
+                np.load(idf_path) if idf_path else None,
+            )
+        if reco_mode == "local":
+            article_index = ArticleIndex(
+                embedder,
+                VectorIndexConfig(
+                    ivf_threshold=int(os.getenv("LOCAL_INDEX_IVF_THRESHOLD", "20000")),
+                    ivf_probes=int(os.getenv("LOCAL_INDEX_IVF_PROBES", "8")),
+                ),
+            )
+
         cache_type = os.getenv("CACHE_BACKEND", "in-memory")
         if cache_type == "redis":
             redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -85,46 +153,215 @@ async def main() -> None:
                 encoding="utf-8",
                 decode_responses=True,
             )
+            # article and settings payloads use the binary codec
+            redis_bytes = redis.from_url(redis_url, decode_responses=False)
+
+            articles = RedisArticleCache(
+                redis_bytes,
+                prefix=prefix,
+                ttl=int(os.getenv("REDIS_ARTICLE_TTL_S", str(24 * 3600))),
+                negative_ttl=negative_ttl,
+            )
+            last_view = RedisLastViewCache(
+                redis_client,
+                prefix=prefix,
+                max_articles_per_user=int(os.getenv("REDIS_MAX_PER_USER", "20")),
+                ttl=int(os.getenv("REDIS_LASTVIEW_TTL_S", str(7 * 24 * 3600))),
+            )
+            seen = RedisSeenFilter(
+                redis_client,
+                prefix=prefix,
+                capacity=seen_capacity,
+                fp_rate=seen_fp_rate,
+                initial_capacity=seen_initial,
+                ttl=int(os.getenv("REDIS_SEEN_TTL_S", str(180 * 24 * 3600))),
+            )
+            user_settings = RedisUserSettingsCache(
+                redis_bytes,
+                prefix=prefix,
+                ttl=int(os.getenv("REDIS_SETTINGS_TTL_S", str(24 * 3600))),
+            )
+            user_ids = RedisUserIDCache(
+                redis_client,
+                prefix=prefix,
+                ttl=int(os.getenv("REDIS_USERID_TTL_S", str(24 * 3600))),
+            )
+            l1_user_ids = None
+            l1_settings = None
+
+            if os.getenv("L1_CACHE_ENABLED", "1") == "1":
+                invalidation_bus = InvalidationBus(redis_client, prefix=prefix)
+                articles = TieredArticleCache(
+                    articles,
+                    bus=invalidation_bus,
+                    max_items=int(os.getenv("L1_ARTICLE_MAX_ITEMS", "500")),
+                    ttl=int(os.getenv("L1_ARTICLE_TTL_S", "300")),
+                )
+                user_settings = l1_settings = TieredUserSettingsCache(
+                    user_settings,
+                    bus=invalidation_bus,
+                    max_items=int(os.getenv("L1_SETTINGS_MAX_ITEMS", "1000")),
+                    ttl=int(os.getenv("L1_SETTINGS_TTL_S", "60")),
+                )
+                user_ids = l1_user_ids = TieredUserIDCache(
+                    user_ids,
+                    bus=invalidation_bus,
+                    max_items=int(os.getenv("L1_USERID_MAX_ITEMS", "1000")),
+                    ttl=int(os.getenv("L1_USERID_TTL_S", "600")),
+                )
+                await invalidation_bus.start()
 
+            # built after the tiers, so that hot-path reads go through L1 and
+            # stored articles reach L1 and the other replicas
+            context = RedisUserContextStore(
+                redis_bytes,
+                prefix=prefix,
+                articles=articles,
+                last_view=last_view,
+                seen=seen,
+                user_ids=l1_user_ids,
+                user_settings=l1_settings,
+            )
+            await context.load_scripts()
             cache = Cache(
-                articles=RedisArticleCache(
+                articles=articles,
+                last_view=last_view,
+                user_settings=user_settings,
+                user_ids=user_ids,
+                search=RedisSearchCache(
                     redis_client,
                     prefix=prefix,
-                    ttl=int(os.getenv("REDIS_ARTICLE_TTL_S", str(24 * 3600))),
+                    ttl=int(os.getenv("SEARCH_CACHE_TTL_S", "3600")),
+                    negative_ttl=negative_ttl,
                 ),
-                last_view=RedisLastViewCache(
+                context=context,
+                seen=seen,
+                up_next=RedisUpNextQueue(
                     redis_client,
                     prefix=prefix,
-                    max_articles_per_user=int(os.getenv("REDIS_MAX_PER_USER", "20")),
-                    ttl=int(os.getenv("REDIS_LASTVIEW_TTL_S", str(7 * 24 * 3600))),
-                ),
-                user_settings=RedisUserSettingsCache(
-                    redis_client,
-                    prefix=prefix,
-                    ttl=int(os.getenv("REDIS_SETTINGS_TTL_S", str(24 * 3600))),
-                ),
-                user_ids=RedisUserIDCache(
-                    redis_client,
-                    prefix=prefix,
-                    ttl=int(os.getenv("REDIS_USERID_TTL_S", str(24 * 3600))),
+                    max_len=up_next_config.depth,
+                    idle_ttl=up_next_idle_ttl,
                 ),
             )
         else:
+            article_ttl = os.getenv("ARTICLE_CACHE_TTL_S")
+            articles = InMemoryArticleCache(
+                max_bytes=int(os.getenv("ARTICLE_CACHE_MAX_BYTES", str(32 * 1024**2))),
+                ttl=int(article_ttl) if article_ttl else None,
+                negative_ttl=negative_ttl,
+                observer=(
+                    article_index.observer() if article_index is not None else None
+                ),
+            )
+            last_view = InMemoryLastViewCache(
+                max_users=int(os.getenv("LAST_VIEW_MAX_USERS", "100000")),
+            )
+            user_settings = InMemoryUserSettingsCache()
+            user_ids = InMemoryUserIDCache()
+            seen = InMemorySeenFilter(
+                seen_capacity,
+                seen_fp_rate,
+                initial_capacity=seen_initial,
+                max_users=int(os.getenv("SEEN_FILTER_MAX_USERS", "1000")),
+            )
             cache = Cache(
-                InMemoryArticleCache(),
-                InMemoryLastViewCache(),
-                InMemoryUserSettingsCache(),
-                InMemoryUserIDCache(),
+                articles,
+                last_view,
+                user_settings,
+                user_ids,
+                InMemorySearchCache(
+                    max_queries=int(os.getenv("SEARCH_CACHE_MAX_QUERIES", "1000")),
+                    ttl=int(os.getenv("SEARCH_CACHE_TTL_S", "3600")),
+                    negative_ttl=negative_ttl,
+                ),
+                InMemoryUserContextStore(
+                    articles=articles,
+                    last_view=last_view,
+                    user_settings=user_settings,
+                    user_ids=user_ids,
+                    seen=seen,
+                ),
+                seen,
+                InMemoryUpNextQueue(
+                    max_len=up_next_config.depth,
+                    idle_ttl=up_next_idle_ttl,
+                    max_users=int(os.getenv("UP_NEXT_MAX_USERS", "10000")),
+                ),
             )
 
-        reco_service = RecoService(wiki_service, cache)
-        dp.workflow_data["reco_service"] = reco_service
+        if os.getenv("RECO_POOL_ENABLED", "1") == "1":
+            pool = ArticlePool(
+                wiki_service,
+                ArticlePoolConfig(
+                    low_watermark=int(os.getenv("RECO_POOL_LOW_WATERMARK", "20")),
+                    high_watermark=int(os.getenv("RECO_POOL_HIGH_WATERMARK", "60")),
+                    refill_concurrency=int(
+                        os.getenv("RECO_POOL_REFILL_CONCURRENCY", "3")
+                    ),
+                ),
+                article_index.observer() if article_index is not None else None,
+            )
+            await pool.start()
 
-        search_service = SearchService(wiki_service, cache)
-        dp.workflow_data["search_service"] = search_service
+        if os.getenv("UP_NEXT_ENABLED", "1") == "1":
+            up_next = UpNextRefiller(wiki_service, cache, pool, up_next_config)
 
         user_repo = PostgresUserRepository(DBConfig.from_env())
         await user_repo.start()
+
+        if reco_mode == "embedding":
+            embeddings = PostgresArticleEmbeddingRepository(DBConfig.from_env())
+            await embeddings.start()
+
+        if embedder is not None:
+            preferences = PreferenceAggregator(
+                user_repo,
+                embedder,
+                PreferenceAggregatorConfig(
+                    alpha=float(os.getenv("PREF_EMA_ALPHA", "0.1")),
+                    skip_within_sec=float(os.getenv("PREF_SKIP_WITHIN_S", "10")),
+                    flush_interval_sec=float(os.getenv("PREF_FLUSH_INTERVAL_S", "5")),
+                    flush_max_users=int(os.getenv("PREF_FLUSH_MAX_USERS", "500")),
+                    max_pending=int(os.getenv("PREF_MAX_PENDING", "50000")),
+                ),
+            )
+            await preferences.start()
+
+        pipeline = build_pipeline(
+            wiki_service,
+            cache,
+            pool=pool,
+            index=article_index,
+            preferences=preferences,
+            embeddings=embeddings,
+            embedding_model=embedder.model if embedder is not None else None,
+            related=os.getenv("RECO_RELATED_SOURCES", "1") == "1",
+            config=PipelineConfig(
+                deadline_sec=float(os.getenv("RECO_DEADLINE_S", "2.0")),
+                fallback_sec=float(os.getenv("RECO_FALLBACK_RESERVE_S", "0.8")),
+            ),
+        )
+        reco_service = RecoService(
+            wiki_service,
+            cache,
+            pool,
+            up_next,
+            embeddings,
+            float(os.getenv("RECO_EXPLORE_RATIO", "0.2")),
+            preferences,
+            article_index,
+            pipeline,
+        )
+        dp.workflow_data["reco_service"] = reco_service
+
+        search_service = SearchService(
+            wiki_service,
+            cache,
+            float(os.getenv("ARTICLE_SOFT_TTL_S", "21600")),
+            _preferences=preferences,
+        )
+        dp.workflow_data["search_service"] = search_service
+
         settings_service = UserSettingsService(user_repo, cache)
         dp.workflow_data["settings_service"] = settings_service
 
@@ -151,12 +388,27 @@ async def main() -> None:
         await dp.start_polling(bot)
 
     finally:
+        # flushed before the database is closed, so no preference signal is lost
+        if preferences is not None:
+            await preferences.close()
+        if article_index is not None:
+            await article_index.close()
+        if up_next is not None:
+            await up_next.close()
+        if pool is not None:
+            await pool.close()
         if http is not None:
             await http.close()
+        if invalidation_bus is not None:
+            await invalidation_bus.close()
         if redis_client is not None:
             await _close_redis(redis_client)
+        if redis_bytes is not None:
+            await _close_redis(redis_bytes)
         if user_repo is not None:
             await user_repo.close()
+        if embeddings is not None:
+            await embeddings.close()
         if bot is not None:
             await bot.session.close()
 
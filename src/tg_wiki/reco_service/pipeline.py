@@ -0,0 +1,471 @@
+import asyncio
+import logging
+import random
+import time
+
+from dataclasses import dataclass, field
+from typing import Final, Optional, Protocol, Sequence
+
+import numpy as np
+
+from tg_wiki.cache.ports import Cache
+from tg_wiki.client.hedging import LatencyTracker
+from tg_wiki.db.ports import ArticleEmbeddingRepository
+from tg_wiki.domain.article import Article
+from tg_wiki.domain.user import UserSettings
+from tg_wiki.embedding_service.index import ArticleIndex
+from tg_wiki.embedding_service.preferences import PreferenceAggregator
+from tg_wiki.reco_service.pool import ArticlePool
+from tg_wiki.wiki_service.wiki import WikiService
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CandidateRequest:
+    user_id: int
+    recent: tuple[int, ...]
+    settings: UserSettings
+    # False for exploration requests, which only use non-personalized sources
+    personalized: bool = True
+    # a recently viewed pageid to expand from (links, morelike:)
+    seed: Optional[int] = None
+
+
+class CandidateSource(Protocol):
+    name: str
+    # added to the score of every candidate from this source
+    weight: float
+    personalized: bool
+
+    async def fetch(self, request: CandidateRequest) -> list[Article]:
+        """Returns candidate articles; may include already seen ones."""
+        ...
+
+    def release(self, unused: Sequence[Article]) -> None:
+        """Takes back fetched articles that were not used."""
+        ...
+
+
+class _Source:
+    name = "source"
+    weight = 0.0
+    personalized = False
+
+    def release(self, unused: Sequence[Article]) -> None:
+        pass
+
+
+class PoolSource(_Source):
+    """Articles from the prefetch pool; unused ones go back to the pool."""
+
+    name = "pool"
+
+    def __init__(self, pool: ArticlePool, n: int = 6) -> None:
+        self._pool = pool
+        self._n = n
+
+    async def fetch(self, request: CandidateRequest) -> list[Article]:
+        exclude = set(request.recent)
+        out = []
+        for _ in range(self._n):
+            article = self._pool.take(exclude=exclude)
+            if article is None:
+                break
+            out.append(article)
+        return out
+
+    def release(self, unused: Sequence[Article]) -> None:
+        for article in unused:
+            self._pool.put(article)
+
+
+class RandomSource(_Source):
+    """One batched random fetch from Wikipedia."""
+
+    name = "random"
+
+    def __init__(self, wiki: WikiService, n: int = 5, min_length: int = 100) -> None:
+        self._wiki = wiki
+        self._n = n
+        self._min_length = min_length
+
+    async def fetch(self, request: CandidateRequest) -> list[Article]:
+        if not self._wiki.available:
+            return []
+        return await self._wiki.get_random_articles(
+            self._n, min_length=self._min_length
+        )
+
+
+class LinksSource(_Source):
+    """Articles linked from a recently viewed page."""
+
+    name = "links"
+    weight = 0.3
+    personalized = True
+
+    def __init__(self, wiki: WikiService, n: int = 10, min_length: int = 100) -> None:
+        self._wiki = wiki
+        self._n = n
+        self._min_length = min_length
+
+    async def fetch(self, request: CandidateRequest) -> list[Article]:
+        if request.seed is None or not self._wiki.available:
+            return []
+        return await self._wiki.get_linked_articles(
+            request.seed, self._n, min_length=self._min_length
+        )
+
+
+class MorelikeSource(_Source):
+    """Articles similar to a recently viewed page (`morelike:` search)."""
+
+    name = "morelike"
+    weight = 0.4
+    personalized = True
+
+    def __init__(
+        self, wiki: WikiService, cache: Cache, n: int = 10, min_length: int = 100
+    ) -> None:
+        self._wiki = wiki
+        self._cache = cache
+        self._n = n
+        self._min_length = min_length
+
+    async def fetch(self, request: CandidateRequest) -> list[Article]:
+        if request.seed is None or not self._wiki.available:
+            return []
+        seed = await self._cache.articles.get(request.seed)
+        if seed is None:
+            return []
+        return await self._wiki.get_similar_articles(
+            seed.meta.title, self._n, min_length=self._min_length
+        )
+
+
+class LocalNeighbourSource(_Source):
+    """Nearest articles to the user's preference vector in the in-process index."""
+
+    name = "local_neighbours"
+    weight = 0.6
+    personalized = True
+
+    def __init__(
+        self, index: ArticleIndex, preferences: PreferenceAggregator, n: int = 20
+    ) -> None:
+        self._index = index
+        self._preferences = preferences
+        self._n = n
+
+    async def fetch(self, request: CandidateRequest) -> list[Article]:
+        vector = await self._preferences.vector(request.user_id)
+        if vector is None:
+            return []
+        pageids = self._index.nearest(vector, self._n, exclude=request.recent)
+        return [
+            article
+            for article in (self._index.get(pageid) for pageid in pageids)
+            if article is not None
+        ]
+
+
+class NeighbourSource(_Source):
+    """
+    Nearest articles to the user's preference vector in `article_embeddings`.
+
+    The few best unseen ones are read from the article cache and any misses
+    fetched in one Wikipedia request.
+    """
+
+    name = "neighbours"
+    weight = 0.6
+    personalized = True
+
+    def __init__(
+        self,
+        embeddings: ArticleEmbeddingRepository,
+        wiki: WikiService,
+        cache: Cache,
+        n: int = 20,
+        fetch: int = 5,
+        model: Optional[str] = None,
+    ) -> None:
+        self._embeddings = embeddings
+        self._wiki = wiki
+        self._cache = cache
+        self._n = n
+        self._fetch = fetch
+        self._model = model
+
+    async def fetch(self, request: CandidateRequest) -> list[Article]:
+        pageids = await self._embeddings.nearest_for_user(
+            request.user_id,
+            self._n,
+            exclude=list(request.recent),
+            model=self._model,
+        )
+        if not pageids:
+            return []
+        # only the best unseen ones are worth a Wikipedia round-trip
+        flags = await self._cache.seen.contains_many(request.user_id, pageids)
+        pageids = [p for p, seen in zip(pageids, flags) if not seen][: self._fetch]
+
+        found: dict[int, Article] = {}
+        for pageid in pageids:
+            article = await self._cache.articles.get(pageid)
+            if article is not None:
+                found[pageid] = article
+        missing = [p for p in pageids if p not in found]
+        if missing and self._wiki.available:
+            fetched = await self._wiki.get_articles_by_pageids(missing)
+            if fetched:
+                await self._cache.articles.update_many(list(fetched.values()))
+            found.update(fetched)
+        return [found[p] for p in pageids if p in found]
+
+
+@dataclass(frozen=True, slots=True)
+class PipelineConfig:
+    deadline_sec: float = 2.0
+    # part of the deadline kept for the fallback sources
+    fallback_sec: float = 0.8
+    min_length: int = 100
+    # score = source weight + length fit + image bonus + jitter
+    length_weight: float = 0.3
+    image_weight: float = 0.2
+    jitter: float = 0.1
+
+
+@dataclass(slots=True)
+class PipelineStats:
+    stages: dict[str, LatencyTracker] = field(default_factory=dict)
+    timeouts: dict[str, int] = field(default_factory=dict)
+    deadline_misses: int = 0
+
+    def observe(self, stage: str, elapsed_sec: float) -> None:
+        tracker = self.stages.get(stage)
+        if tracker is None:
+            tracker = self.stages[stage] = LatencyTracker(500)
+        tracker.observe(elapsed_sec)
+
+
+@dataclass(slots=True)
+class CandidateBatch:
+    # best first; each candidate with the source it came from
+    ranked: list[tuple[Article, CandidateSource]]
+    # candidates filtered out for this user only (history, seen, duplicates);
+    # too short articles are not listed, they are of no use to anyone
+    dropped: list[tuple[Article, CandidateSource]]
+    started: float
+
+
+class CandidatePipeline:
+    """
+    Staged candidate generation for `/next`.
+
+    1. Sources: every applicable source is fetched concurrently; whatever has
+       not answered `fallback_sec` before the deadline is cancelled. Fallback
+       sources (a live random fetch) only run when nothing came back, and
+       always get at least `fallback_sec`.
+    2. Filter and score: one vectorized pass drops duplicates, articles in
+       the recent history, too short extracts and (in one batch call) articles
+       the seen filter knows, then scores the rest by source weight, how well
+       the extract fits the user's page length and, for users who get images,
+       whether there is a thumbnail.
+
+    Selection and the handling of leftovers are up to the caller; `release`
+    hands unused candidates back to their sources.
+    """
+
+    def __init__(
+        self,
+        cache: Cache,
+        sources: Sequence[CandidateSource],
+        fallback: Sequence[CandidateSource] = (),
+        config: PipelineConfig | None = None,
+    ) -> None:
+        self._cfg: Final[PipelineConfig] = config or PipelineConfig()
+        if self._cfg.deadline_sec <= 0:
+            raise ValueError("deadline_sec must be positive")
+        if not 0 <= self._cfg.fallback_sec < self._cfg.deadline_sec:
+            raise ValueError("fallback_sec must be in [0, deadline_sec)")
+        self._cache = cache
+        self._sources = list(sources)
+        self._fallback = list(fallback)
+        self.stats = PipelineStats()
+
+    @property
+    def config(self) -> PipelineConfig:
+        return self._cfg
+
+    def remaining(self, started: float) -> float:
+        return self._cfg.deadline_sec - (time.monotonic() - started)
+
+    async def _timed_fetch(
+        self, source: CandidateSource, request: CandidateRequest
+    ) -> list[Article]:
+        started = time.perf_counter()
+        try:
+            return await source.fetch(request)
+        finally:
+            self.stats.observe(f"source:{source.name}", time.perf_counter() - started)
+
+    async def _gather(
+        self,
+        sources: Sequence[CandidateSource],
+        request: CandidateRequest,
+        timeout: float,
+    ) -> list[tuple[Article, CandidateSource]]:
+        active = [s for s in sources if request.personalized or not s.personalized]
+        if not active or timeout <= 0:
+            return []
+        tasks = {
+            asyncio.create_task(self._timed_fetch(source, request)): source
+            for source in active
+        }
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+            name = tasks[task].name
+            self.stats.timeouts[name] = self.stats.timeouts.get(name, 0) + 1
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        out: list[tuple[Article, CandidateSource]] = []
+        for task, source in tasks.items():
+            if task not in done:
+                continue
+            if task.exception() is not None:
+                logger.warning(
+                    "Candidate source %s failed",
+                    source.name,
+                    exc_info=task.exception(),
+                )
+                continue
+            out.extend((article, source) for article in task.result())
+        return out
+
+    async def run(self, request: CandidateRequest) -> CandidateBatch:
+        started = time.monotonic()
+
+        stage = time.perf_counter()
+        reserve = self._cfg.fallback_sec if self._fallback else 0.0
+        candidates = await self._gather(
+            self._sources, request, self.remaining(started) - reserve
+        )
+        if not candidates:
+            # hanging primaries (e.g. a slow Wikipedia) must not starve the
+            # fallback, which is then the only way to serve anything
+            candidates = await self._gather(
+                self._fallback, request, max(self.remaining(started), reserve)
+            )
+        self.stats.observe("sources", time.perf_counter() - stage)
+
+        stage = time.perf_counter()
+        batch = await self._filter_and_score(request, candidates, started)
+        self.stats.observe("filter", time.perf_counter() - stage)
+        return batch
+
+    async def _filter_and_score(
+        self,
+        request: CandidateRequest,
+        candidates: list[tuple[Article, CandidateSource]],
+        started: float,
+    ) -> CandidateBatch:
+        n = len(candidates)
+        if n == 0:
+            return CandidateBatch([], [], started)
+        cfg = self._cfg
+        settings = request.settings
+
+        pageids = np.fromiter((a.meta.pageid for a, _ in candidates), np.int64, n)
+        lengths = np.fromiter((len(a.extract or "") for a, _ in candidates), np.int64, n)
+        images = np.fromiter(
+            (a.meta.thumbnail_url is not None for a, _ in candidates), bool, n
+        )
+        score = np.fromiter((s.weight for _, s in candidates), np.float64, n)
+
+        if cfg.jitter > 0:
+            score += cfg.jitter * np.random.default_rng().random(n)
+        if settings.send_text:
+            # 1.0 when the extract fits into one message page, less the longer it is
+            score += cfg.length_weight * np.minimum(
+                1.0, settings.page_len / np.maximum(lengths, 1)
+            )
+        if settings.send_image:
+            score += cfg.image_weight * images
+
+        order = np.argsort(-score, kind="stable")
+        # the same article from several sources: keep its best-scored copy
+        _, first = np.unique(pageids[order], return_index=True)
+        keep = np.zeros(n, dtype=bool)
+        keep[order[first]] = True
+        usable = lengths >= cfg.min_length
+        keep &= usable
+        if request.recent:
+            keep &= ~np.isin(pageids, np.asarray(request.recent, dtype=np.int64))
+
+        kept = np.flatnonzero(keep)
+        if len(kept):
+            flags = await self._cache.seen.contains_many(
+                request.user_id, pageids[kept].tolist()
+            )
+            keep[kept[np.asarray(flags, dtype=bool)]] = False
+
+        ranked = [candidates[i] for i in order if keep[i]]
+        dropped = [candidates[i] for i in np.flatnonzero(usable & ~keep)]
+        return CandidateBatch(ranked, dropped, started)
+
+    @staticmethod
+    def release(unused: Sequence[tuple[Article, CandidateSource]]) -> None:
+        """Hands unused candidates back to the sources they came from."""
+        by_source: dict[int, tuple[CandidateSource, list[Article]]] = {}
+        for article, source in unused:
+            by_source.setdefault(id(source), (source, []))[1].append(article)
+        for source, articles in by_source.values():
+            source.release(articles)
+
+
+def build_pipeline(
+    wiki: WikiService,
+    cache: Cache,
+    *,
+    pool: Optional[ArticlePool] = None,
+    index: Optional[ArticleIndex] = None,
+    preferences: Optional[PreferenceAggregator] = None,
+    embeddings: Optional[ArticleEmbeddingRepository] = None,
+    embedding_model: Optional[str] = None,
+    related: bool = True,
+    config: PipelineConfig | None = None,
+) -> CandidatePipeline:
+    """
+    Assembles the sources that the given components allow.
+
+    Args:
+        embedding_model: The model tag of the embedder behind the users'
+            preference vectors; article vectors of other models are ignored.
+        related: Whether to expand from recently viewed pages (links and
+            `morelike:` search; each costs a Wikipedia request).
+    """
+    config = config or PipelineConfig()
+    sources: list[CandidateSource] = []
+    if pool is not None:
+        sources.append(PoolSource(pool))
+    if related:
+        sources.append(LinksSource(wiki, min_length=config.min_length))
+        sources.append(MorelikeSource(wiki, cache, min_length=config.min_length))
+    if index is not None and preferences is not None:
+        sources.append(LocalNeighbourSource(index, preferences))
+    if embeddings is not None:
+        sources.append(
+            NeighbourSource(embeddings, wiki, cache, model=embedding_model)
+        )
+    fallback = [RandomSource(wiki, min_length=config.min_length)]
+    return CandidatePipeline(cache, sources, fallback, config)
+
+
+def pick_seed(recent: Sequence[int]) -> Optional[int]:
+    """A random recently viewed pageid to expand from."""
+    return random.choice(recent) if recent else None
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import math
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Collection, Final, Optional
+
+from tg_wiki.cache.ports import ArticleObserver
+from tg_wiki.wiki_service.wiki import WikiService
+from tg_wiki.domain.article import Article
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ArticlePoolConfig:
+    low_watermark: int = 20
+    high_watermark: int = 60
+    refill_concurrency: int = 3
+    min_length: int = 100
+    retry_delay_sec: float = 1.0
+
+
+class ArticlePool:
+    """
+    Bounded in-process pool of validated random articles.
+
+    A background refiller tops the pool up to `high_watermark` whenever it
+    drops below `low_watermark`, so most `/next` requests are served from memory.
+    """
+
+    def __init__(
+        self,
+        wiki: WikiService,
+        config: ArticlePoolConfig | None = None,
+        observer: Optional[ArticleObserver] = None,
+    ) -> None:
+        self._cfg: Final[ArticlePoolConfig] = config or ArticlePoolConfig()
+        if self._cfg.high_watermark <= 0:
+            raise ValueError("high_watermark must be positive")
+        if not 0 <= self._cfg.low_watermark <= self._cfg.high_watermark:
+            raise ValueError("low_watermark must be in [0, high_watermark]")
+        if self._cfg.refill_concurrency <= 0:
+            raise ValueError("refill_concurrency must be positive")
+
+        self._wiki = wiki
+        self._items: deque[Article] = deque()
+        self._ids: set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._observer = observer
+
+    @property
+    def config(self) -> ArticlePoolConfig:
+        return self._cfg
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def take(self, exclude: Collection[int] = ()) -> Optional[Article]:
+        """
+        Pops the first pooled article whose pageid is not in `exclude`.
+
+        Args:
+            exclude: Pageids that must not be returned (e.g. the user's history).
+
+        Returns:
+            An Article object, or None if the pool has no suitable article.
+        """
+        article = None
+        for i, item in enumerate(self._items):
+            if item.meta.pageid not in exclude:
+                del self._items[i]
+                self._ids.discard(item.meta.pageid)
+                article = item
+                if self._observer is not None:
+                    self._observer.removed(item.meta.pageid)
+                break
+
+        if len(self._items) < self._cfg.low_watermark:
+            self._wakeup.set()
+        return article
+
+    def put(self, article: Article) -> bool:
+        """
+        Adds an article to the pool unless it is full or already pooled.
+
+        Returns:
+            True if the article was added, False otherwise.
+        """
+        pageid = article.meta.pageid
+        if pageid in self._ids or len(self._items) >= self._cfg.high_watermark:
+            return False
+        self._items.append(article)
+        self._ids.add(pageid)
+        if self._observer is not None:
+            self._observer.added(article)
+        return True
+
+    async def _fetch_batch(self, n: int) -> int:
+        articles = await self._wiki.get_random_articles(
+            n, min_length=self._cfg.min_length
+        )
+        return sum(self.put(article) for article in articles)
+
+    async def _refill(self) -> None:
+        while len(self._items) < self._cfg.high_watermark:
+            missing = self._cfg.high_watermark - len(self._items)
+            per_batch = math.ceil(missing / self._cfg.refill_concurrency)
+            sizes = [
+                min(per_batch, missing - i * per_batch)
+                for i in range(self._cfg.refill_concurrency)
+                if missing > i * per_batch
+            ]
+            added = await asyncio.gather(*(self._fetch_batch(n) for n in sizes))
+            if not any(added):
+                await asyncio.sleep(self._cfg.retry_delay_sec)
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self._refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Article pool refill failed")
+                await asyncio.sleep(self._cfg.retry_delay_sec)
+                self._wakeup.set()
@@ -1,10 +1,32 @@
-import asyncio
+import logging
+import random
+import time
 
 from dataclasses import dataclass
+from typing import Collection, Optional, Sequence
 
+from tg_wiki.db.ports import ArticleEmbeddingRepository
+from tg_wiki.embedding_service.index import ArticleIndex
+from tg_wiki.embedding_service.preferences import PreferenceAggregator
 from tg_wiki.wiki_service.wiki import WikiService
 from tg_wiki.domain.article import Article
+from tg_wiki.domain.user import UserSettings
 from tg_wiki.cache.ports import Cache
+from tg_wiki.reco_service.pipeline import (
+    CandidatePipeline,
+    CandidateRequest,
+    CandidateSource,
+    build_pipeline,
+    pick_seed,
+)
+from tg_wiki.reco_service.pool import ArticlePool
+from tg_wiki.reco_service.up_next import UpNextRefiller
+
+
+DEGRADED_SAMPLE_SIZE = 20
+
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -12,6 +34,13 @@ class RecoService:
 
     _wiki: WikiService
     _cache: Cache
+    _pool: Optional[ArticlePool] = None
+    _up_next: Optional[UpNextRefiller] = None
+    _embeddings: Optional[ArticleEmbeddingRepository] = None
+    _explore_ratio: float = 0.2
+    _preferences: Optional[PreferenceAggregator] = None
+    _index: Optional[ArticleIndex] = None
+    _pipeline: Optional[CandidatePipeline] = None
 
     @property
     def wiki(self) -> WikiService:
@@ -21,28 +50,223 @@ class RecoService:
     def cache(self) -> Cache:
         return self._cache
 
-    async def get_next_article(self, user_id: int) -> Article:
+    @property
+    def pool(self) -> Optional[ArticlePool]:
+        return self._pool
+
+    @property
+    def up_next(self) -> Optional[UpNextRefiller]:
+        return self._up_next
+
+    @property
+    def embeddings(self) -> Optional[ArticleEmbeddingRepository]:
+        return self._embeddings
+
+    @property
+    def preferences(self) -> Optional[PreferenceAggregator]:
+        return self._preferences
+
+    @property
+    def index(self) -> Optional[ArticleIndex]:
+        return self._index
+
+    @property
+    def pipeline(self) -> CandidatePipeline:
+        if self._pipeline is None:
+            self._pipeline = build_pipeline(
+                self.wiki,
+                self.cache,
+                pool=self.pool,
+                index=self.index,
+                preferences=self.preferences,
+                embeddings=self.embeddings,
+            )
+        return self._pipeline
+
+    def _shown(self, user_id: int, article: Article) -> Article:
+        if self.preferences is not None:
+            self.preferences.shown(user_id, article)
+        return article
+
+    async def _not_seen_before(
+        self, user_id: int, candidates: Sequence[Article]
+    ) -> list[Article]:
+        """Drops candidates the user's long-term seen filter already contains."""
+        if not candidates:
+            return []
+        flags = await self.cache.seen.contains_many(
+            user_id, [article.meta.pageid for article in candidates]
+        )
+        return [article for article, seen in zip(candidates, flags) if not seen]
+
+    async def _accept_first(
+        self,
+        user_id: int,
+        candidates: Sequence[Article],
+        *,
+        store_article: bool = True,
+        check_seen: bool = True,
+    ) -> Optional[Article]:
+        """
+        Records and returns the first candidate not in the user's history.
+
+        Candidates are first tested in one batch against the long-term seen
+        filter (unless `check_seen` is False because the caller already did).
+        The recent history check and the write happen in one atomic call, so
+        concurrent requests of the same user never serve the same article.
+        """
+        if check_seen:
+            candidates = await self._not_seen_before(user_id, candidates)
+        if not candidates:
+            return None
+
+        pageid = await self.cache.last_view.record_if_unseen(
+            user_id, [article.meta.pageid for article in candidates]
+        )
+        if pageid is None:
+            return None
+        article = next(a for a in candidates if a.meta.pageid == pageid)
+        await self.cache.seen.add(user_id, pageid)
+        if store_article:
+            await self.cache.articles.update(article)
+        return self._shown(user_id, article)
+
+    async def _from_queue(
+        self, user_id: int, recent: Optional[Collection[int]], max_pops: int
+    ) -> tuple[Optional[Article], int]:
+        """
+        Serves the next entry of the user's precomputed queue, skipping
+        entries that were viewed meanwhile. Entries whose article was dropped
+        from the article cache are fetched again by pageid.
+        """
+        for _ in range(max_pops):
+            entry, remaining = await self.cache.up_next.pop(user_id)
+            if entry is None:
+                return None, 0
+            if recent is not None and entry.pageid in recent:
+                continue
+            article = entry.article
+            store_article = article is not None
+            if article is None:
+                article = await self.cache.articles.get(entry.pageid)
+            if article is None and self.wiki.available:
+                article = await self.wiki.get_article_by_pageid(entry.pageid)
+                store_article = True
+            if article is None:
+                continue
+            article = await self._accept_first(
+                user_id, [article], store_article=store_article, check_seen=False
+            )
+            if article is not None:
+                return article, remaining
+        return None, 0
+
+    async def _keep_leftovers(
+        self, user_id: int, leftovers: list[tuple[Article, CandidateSource]]
+    ) -> int:
+        """
+        Queues the best unchosen candidates for the user's next requests and
+        hands the rest back to their sources.
+
+        Returns:
+            The number of queued candidates.
+        """
+        keep: list[tuple[Article, CandidateSource]] = []
+        if self.up_next is not None:
+            keep = leftovers[: self.up_next.config.depth]
+        self.pipeline.release(leftovers[len(keep) :])
+        if not keep:
+            return 0
+
+        articles = [article for article, _ in keep]
+        try:
+            await self.cache.articles.update_many(articles)
+            return await self.cache.up_next.push_many(user_id, articles)
+        except Exception:
+            logger.warning("Could not queue leftover candidates", exc_info=True)
+            self.pipeline.release(keep)
+            return 0
+
+    async def get_next_article(
+        self,
+        user_id: int,
+        recent: Optional[Collection[int]] = None,
+        settings: Optional[UserSettings] = None,
+    ) -> Optional[Article]:
         """
         Retrieve the next article for a user, utilizing cache for performance.
 
+        The user's precomputed "up next" queue is tried first. Otherwise the
+        candidate pipeline gathers articles from all sources concurrently
+        (prefetch pool, pages linked from or similar to a recently viewed one,
+        embedding neighbours; a live random fetch only if they come back
+        empty), filters and scores them, and the best one the user has not
+        seen is served. The next best ones are queued for the following
+        requests. An `explore_ratio` share of requests only uses the
+        non-personalized sources.
+        While Wikipedia is unavailable, a random cached article is served instead.
+
         Args:
             user_id: The unique identifier of the user.
+            recent: The user's recent history, if already loaded, used to
+                filter candidates early; the chosen one is still checked and
+                recorded in one atomic call to the cache.
+            settings: The user's settings, used to score candidates.
 
         Returns:
-            A randomly selected article that is not in the user's recent history.
+            A randomly selected article that is not in the user's recent history,
+            or None if none could be found.
         """
-        last_articles = await self.cache.last_view.get(user_id) or ()
+        if self.up_next is not None:
+            article, remaining = await self._from_queue(
+                user_id, recent, self.up_next.config.depth
+            )
+            if article is not None:
+                self.up_next.schedule(user_id, remaining)
+                return article
 
-        while True:
-            article = await self.wiki.get_random_article()
-            if not article or not article.meta:
-                continue
+        if recent is not None:
+            history = list(recent)
+        else:
+            history = await self.cache.last_view.get(user_id)
+        request = CandidateRequest(
+            user_id=user_id,
+            recent=tuple(history),
+            settings=settings or UserSettings(),
+            personalized=random.random() >= self._explore_ratio,
+            seed=pick_seed(history),
+        )
+        batch = await self.pipeline.run(request)
 
-            pageid = article.meta.pageid
-            if not pageid:
-                continue
+        stage = time.perf_counter()
+        article = await self._accept_first(
+            user_id,
+            [candidate for candidate, _ in batch.ranked],
+            check_seen=False,
+        )
+        self.pipeline.stats.observe("select", time.perf_counter() - stage)
 
-            if pageid not in last_articles:
-                await self.cache.last_view.update(user_id, pageid)
-                asyncio.create_task(self.cache.articles.update(article))
-                return article
+        stage = time.perf_counter()
+        self.pipeline.release(batch.dropped)
+        queued = await self._keep_leftovers(
+            user_id, [pair for pair in batch.ranked if pair[0] is not article]
+        )
+        if self.up_next is not None:
+            self.up_next.schedule(user_id, queued)
+        self.pipeline.stats.observe("leftovers", time.perf_counter() - stage)
+
+        if self.pipeline.remaining(batch.started) < 0:
+            self.pipeline.stats.deadline_misses += 1
+            logger.info(
+                "Recommendation for user %s exceeded the %.1fs deadline",
+                user_id,
+                self.pipeline.config.deadline_sec,
+            )
+        if article is not None:
+            return article
+
+        return await self._accept_first(
+            user_id,
+            await self.cache.articles.sample(DEGRADED_SAMPLE_SIZE),
+            store_article=False,
+        )
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from dataclasses import dataclass
+from typing import Final, Optional
+
+from tg_wiki.cache.ports import Cache
+from tg_wiki.domain.article import Article
+from tg_wiki.reco_service.pool import ArticlePool
+from tg_wiki.wiki_service.wiki import WikiService
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class UpNextConfig:
+    depth: int = 5
+    refill_below: int = 2
+    min_length: int = 100
+
+
+class UpNextRefiller:
+    """
+    Keeps per-user "up next" queues filled in the background.
+
+    After a user consumes an entry and the queue drops below `refill_below`,
+    a single refill per user tops it up to `depth` with history-filtered
+    articles taken from the prefetch pool (or fetched when the pool is empty).
+    The articles are also written to the article cache, which is where queues
+    that only hold pageids read them from.
+    """
+
+    def __init__(
+        self,
+        wiki: WikiService,
+        cache: Cache,
+        pool: Optional[ArticlePool] = None,
+        config: UpNextConfig | None = None,
+    ) -> None:
+        self._cfg: Final[UpNextConfig] = config or UpNextConfig()
+        if self._cfg.depth <= 0:
+            raise ValueError("depth must be positive")
+        if not 0 < self._cfg.refill_below <= self._cfg.depth:
+            raise ValueError("refill_below must be in (0, depth]")
+
+        self._wiki = wiki
+        self._cache = cache
+        self._pool = pool
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    @property
+    def config(self) -> UpNextConfig:
+        return self._cfg
+
+    def schedule(self, user_id: int, remaining: int) -> None:
+        """Starts a background refill unless the queue is full enough or one is running."""
+        if remaining >= self._cfg.refill_below or user_id in self._tasks:
+            return
+        task = asyncio.create_task(self._refill(user_id, self._cfg.depth - remaining))
+        self._tasks[user_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(user_id, None))
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _candidates(self, recent: list[int], n: int) -> list[Article]:
+        out: list[Article] = []
+        if self._pool is not None:
+            while len(out) < n:
+                article = self._pool.take(exclude=recent)
+                if article is None:
+                    break
+                out.append(article)
+        if not out and self._wiki.available:
+            out = await self._wiki.get_random_articles(
+                n, min_length=self._cfg.min_length
+            )
+        return out
+
+    async def _refill(self, user_id: int, need: int) -> None:
+        try:
+            recent = await self._cache.last_view.get(user_id)
+            # over-fetch a little: some candidates may have been seen long ago
+            candidates = await self._candidates(recent, need + self._cfg.refill_below)
+            if not candidates:
+                return
+
+            flags = await self._cache.seen.contains_many(
+                user_id, [article.meta.pageid for article in candidates]
+            )
+            fresh = [a for a, seen in zip(candidates, flags) if not seen][:need]
+            if self._pool is not None:
+                # seen articles and the overflow are still good for other users
+                chosen = {article.meta.pageid for article in fresh}
+                for article in candidates:
+                    if article.meta.pageid not in chosen:
+                        self._pool.put(article)
+            if not fresh:
+                return
+
+            await self._cache.articles.update_many(fresh)
+            await self._cache.up_next.push_many(user_id, fresh)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Up-next refill failed for user %s", user_id)
@@ -1,18 +1,37 @@
 import asyncio
+import logging
 
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Awaitable, Optional
 
+from tg_wiki.client.http import HttpClientError
+from tg_wiki.embedding_service.preferences import PreferenceAggregator
 from tg_wiki.wiki_service.wiki import WikiService
 from tg_wiki.domain.article import Article, ArticleMeta
 from tg_wiki.cache.ports import Cache
 
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOFT_TTL_SEC = 6 * 3600.0
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query for caching: case-folded, whitespace-collapsed, ё→е.
+    """
+    return " ".join(query.casefold().replace("ё", "е").split())
+
+
 @dataclass
 class SearchService:
 
     _wiki: WikiService
     _cache: Cache
+    _soft_ttl: float = DEFAULT_SOFT_TTL_SEC
+    _revalidating: dict[int, asyncio.Task] = field(default_factory=dict)
+    _writes: set[asyncio.Task] = field(default_factory=set)
+    _preferences: Optional[PreferenceAggregator] = None
 
     @property
     def wiki(self) -> WikiService:
@@ -22,6 +41,27 @@ class SearchService:
     def cache(self) -> Cache:
         return self._cache
 
+    @property
+    def preferences(self) -> Optional[PreferenceAggregator]:
+        return self._preferences
+
+    def _viewed(self, user_id: int, article: Article) -> Article:
+        if self.preferences is not None:
+            self.preferences.viewed(user_id, article)
+        return article
+
+    def _write_behind(self, write: Awaitable[None], what: str) -> None:
+        """Runs a cache write in the background, logging it if it fails."""
+        task = asyncio.ensure_future(write)
+        self._writes.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            self._writes.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning("Failed to cache %s", what, exc_info=task.exception())
+
+        task.add_done_callback(done)
+
     async def search_articles(self, query: str, *, limit: int = 5) -> list[ArticleMeta]:
         """
         Searches for articles matching the given query.
@@ -33,8 +73,54 @@ class SearchService:
         Returns:
             A list of ArticleMeta objects matching the search criteria.
         """
-
-        return await self.wiki.search_articles(query, limit=limit)
+        key = normalize_query(query)
+        if not key:
+            return []
+
+        cached = await self.cache.search.get(key, limit)
+        if cached is not None:
+            return cached
+
+        try:
+            articles, complete = await self.wiki.search_full_articles(
+                query, limit=limit
+            )
+        except HttpClientError:
+            return []
+
+        results = [article.meta for article in articles]
+        if results:
+            self._write_behind(
+                self.cache.articles.update_many(articles), "search result articles"
+            )
+        # an empty result is cached too (briefly), so repeated junk queries stay
+        # local; a result missing one of the searches is not cached at all
+        if complete:
+            self._write_behind(
+                self.cache.search.update(key, limit, results), "search results"
+            )
+        return results
+
+    async def _revalidate(self, old: Article) -> None:
+        pageid = old.meta.pageid
+        try:
+            fresh = await self.wiki.get_article_by_pageid(pageid)
+            if fresh is None:
+                return
+            if fresh.lastrevid is not None and fresh.lastrevid == old.lastrevid:
+                await self.cache.articles.touch(pageid)
+            else:
+                await self.cache.articles.update(fresh)
+        except Exception:
+            logger.warning("Failed to revalidate article %s", pageid, exc_info=True)
+        finally:
+            self._revalidating.pop(pageid, None)
+
+    def _schedule_revalidation(self, article: Article) -> None:
+        pageid = article.meta.pageid
+        if pageid in self._revalidating:
+            return
+        self._revalidating[pageid] = asyncio.create_task(self._revalidate(article))
 
     async def get_arcticle_by_pageid(
         self, pageid: int, user_id: int
@@ -42,6 +128,11 @@ class SearchService:
         """
         Retrieves an article by its page ID, utilizing cache for performance.
 
+        A cached copy older than the soft TTL is still served immediately and
+        revalidated against Wikipedia in the background: an unchanged revision
+        only refreshes the cache entry, a new one replaces it. Pageids recently
+        found missing are answered from the negative cache.
+
         Args:
             pageid (int): The unique identifier of the article page.
             user_id (int): The unique identifier of the user requesting the article.
@@ -49,16 +140,28 @@ class SearchService:
         Returns:
             The Article object if found, otherwise None.
         """
-        article = await self.cache.articles.get(pageid)
-        if article:
-            return article
+        if pageid <= 0:
+            return None
 
-        article = await self.wiki.get_article_by_pageid(pageid)
+        entry = await self.cache.articles.get_entry(pageid)
+        if entry is not None:
+            if entry.age > self._soft_ttl and self.wiki.available:
+                self._schedule_revalidation(entry.article)
+            await self.cache.context.record_view(
+                user_id, entry.article, store_article=False
+            )
+            return self._viewed(user_id, entry.article)
+
+        if await self.cache.articles.is_missing(pageid):
+            return None
+
+        try:
+            article = await self.wiki.find_article_by_pageid(pageid)
+        except HttpClientError:
+            return None
         if not article:
+            await self.cache.articles.mark_missing(pageid)
             return None
 
-        await asyncio.gather(
-            self.cache.articles.update(article),
-            self.cache.last_view.update(user_id, pageid),
-        )
-        return article
+        await self.cache.context.record_view(user_id, article)
+        return self._viewed(user_id, article)
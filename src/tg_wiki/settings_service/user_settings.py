@@ -5,7 +5,7 @@ from typing import Optional
 
 from tg_wiki.domain.user import UserSettings, ExternalIdentity, PreferenceVector
 from tg_wiki.db.ports import UserRepository
-from tg_wiki.cache.ports import Cache
+from tg_wiki.cache.ports import Cache, UserContext
 
 
 @dataclass
@@ -69,6 +69,31 @@ class UserSettingsService:
         )
         return user_id
 
+    async def load_telegram_context(self, tg_user_id: int) -> UserContext:
+        """
+        Loads the user id, settings and recent history for a Telegram user.
+
+        Everything is read from the cache in one round-trip; the database is
+        only consulted for the parts that are not cached. If the user id had
+        to be resolved, the history (which outlives the cached id) is read
+        once it is known.
+        """
+        ctx = await self.cache.context.load("telegram", tg_user_id)
+
+        user_id = ctx.user_id
+        if user_id is None:
+            user_id = await self.ensure_telegram_user(tg_user_id)
+
+        settings = ctx.settings
+        if settings is None:
+            settings = await self.get_settings(user_id)
+
+        recent = ctx.recent
+        if recent is None:
+            recent = tuple(await self.cache.last_view.get(user_id))
+
+        return UserContext(user_id=user_id, settings=settings, recent=recent)
+
     async def get_settings(self, user_id: int) -> UserSettings:
         settings = await self.cache.user_settings.get(user_id)
         if settings:
@@ -0,0 +1,83 @@
+import asyncio
+
+from typing import Awaitable, Callable, Optional
+
+
+FetchPages = Callable[[list[int], bool, bool], Awaitable[dict[int, dict]]]
+
+
+class PageidBatcher:
+    """
+    Collects concurrent single-pageid lookups into multi-page API calls.
+
+    Requests are held for at most `max_delay_sec` (or until `max_batch` distinct
+    pageids are queued) and then sent as one `pageids=a|b|c` request; every
+    waiting caller receives its own raw page.
+    """
+
+    def __init__(
+        self, fetch: FetchPages, *, max_delay_sec: float = 0.005, max_batch: int = 20
+    ) -> None:
+        if max_delay_sec < 0:
+            raise ValueError("max_delay_sec must be non-negative")
+        if max_batch <= 0:
+            raise ValueError("max_batch must be positive")
+        self._fetch = fetch
+        self._max_delay = max_delay_sec
+        self._max_batch = max_batch
+        self._pending: dict[tuple[bool, bool], dict[int, list[asyncio.Future]]] = {}
+        self._timers: dict[tuple[bool, bool], asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get(
+        self, pageid: int, *, text: bool = True, image: bool = True
+    ) -> Optional[dict]:
+        """
+        Queues a pageid lookup and waits for the batch it ends up in.
+
+        Returns:
+            The raw page as returned by the Wikipedia API, or None if it is missing
+            or the batch request failed.
+        """
+        loop = asyncio.get_running_loop()
+        key = (text, image)
+        fut: asyncio.Future = loop.create_future()
+
+        batch = self._pending.setdefault(key, {})
+        batch.setdefault(int(pageid), []).append(fut)
+
+        if len(batch) >= self._max_batch:
+            self._dispatch(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self._max_delay, self._dispatch, key)
+
+        return await fut
+
+    def _dispatch(self, key: tuple[bool, bool]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.create_task(self._flush(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(
+        self, key: tuple[bool, bool], batch: dict[int, list[asyncio.Future]]
+    ) -> None:
+        text, image = key
+        try:
+            pages = await self._fetch(list(batch), text, image)
+        except Exception as e:
+            for futures in batch.values():
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(e)
+            return
+
+        for pageid, futures in batch.items():
+            page = pages.get(pageid)
+            for fut in futures:
+                if not fut.done():
+                    fut.set_result(page)
@@ -1,22 +1,25 @@
-from typing import Optional
-from webbrowser import get
 
 from tg_wiki.client.http import HttpClient, Json
 
 
 RUWIKI_API = "https://ru.wikipedia.org/w/api.php"
 IMAGE_WIDTH = 300
+# prop=extracts returns at most 20 intro extracts per request
+EXTRACTS_LIMIT = 20
 
 
-async def fetch_random(http: HttpClient, text: bool = True, image: bool = True) -> Json:
+async def fetch_random(
+    http: HttpClient, limit: int = 1, text: bool = True, image: bool = True
+) -> Json:
     """
-    Fetches a random article from the Ru Wikipedia.
+    Fetches random articles from the Ru Wikipedia.
 
     Args:
         http: The HttpClient instance to use for making requests.
+        limit: The number of random articles to fetch (at most EXTRACTS_LIMIT).
 
     Returns:
-        A Json containing the article's information.
+        A Json containing the articles' information.
     """
     props = ["info"]
     if text:
@@ -28,16 +31,18 @@ async def fetch_random(http: HttpClient, text: bool = True, image: bool = True)
         "action": "query",
         "format": "json",
         "generator": "random",
-        "grnlimit": 1,
+        "grnlimit": max(1, min(limit, EXTRACTS_LIMIT)),
         "grnnamespace": 0,
         "prop": "|".join(props),
         "exintro": 1,
         "explaintext": 1,
+        "exlimit": "max",
         "inprop": "url",
         "pithumbsize": IMAGE_WIDTH,
+        "pilimit": "max",
     }
 
-    return await http.get_json(RUWIKI_API, params=params)
+    return await http.get_json(RUWIKI_API, params=params, hedge=True)
 
 
 async def fetch_by_title(
@@ -70,7 +75,7 @@ async def fetch_by_title(
         "pithumbsize": IMAGE_WIDTH,
     }
 
-    return await http.get_json(RUWIKI_API, params=params)
+    return await http.get_json(RUWIKI_API, params=params, hedge=True)
 
 
 async def fetch_by_pageid(
@@ -103,12 +108,36 @@ async def fetch_by_pageid(
         "pithumbsize": IMAGE_WIDTH,
     }
 
-    return await http.get_json(RUWIKI_API, params=params)
+    return await http.get_json(RUWIKI_API, params=params, hedge=True)
 
 
-async def search_by_title(http: HttpClient, query: str, limit: int = 5) -> Json:
+def _page_props(text: bool, image: bool) -> dict:
+    props = ["info"]
+    if text:
+        props.append("extracts")
+    if image:
+        props.append("pageimages")
+
+    return {
+        "prop": "|".join(props),
+        "exintro": 1,
+        "explaintext": 1,
+        "exlimit": "max",
+        "inprop": "url",
+        "pithumbsize": IMAGE_WIDTH,
+        "pilimit": "max",
+    }
+
+
+async def search_pages_by_title(
+    http: HttpClient,
+    query: str,
+    limit: int = 5,
+    text: bool = False,
+    image: bool = True,
+) -> Json:
     """
-    Searches for articles by matching in the title of article on the Ru Wikipedia.
+    Searches for articles by title prefix and returns their page data in one request.
 
     Args:
         http: The HttpClient instance to use for making requests.
@@ -116,22 +145,31 @@ async def search_by_title(http: HttpClient, query: str, limit: int = 5) -> Json:
         limit: The maximum number of search results to return.
 
     Returns:
-        A Json containing the search results.
+        A Json containing the found pages; each page has a ranking `index`.
     """
     params = {
-        "action": "opensearch",
-        "search": query,
-        "limit": limit,
-        "namespace": 0,
+        "action": "query",
         "format": "json",
+        "generator": "prefixsearch",
+        "gpssearch": query,
+        "gpslimit": limit,
+        "gpsnamespace": 0,
+        "redirects": 1,
+        **_page_props(text, image),
     }
 
-    return await http.get_json(RUWIKI_API, params=params)
+    return await http.get_json(RUWIKI_API, params=params, hedge=True)
 
 
-async def search_by_text(http: HttpClient, query: str, limit: int = 5) -> Json:
+async def search_pages_by_text(
+    http: HttpClient,
+    query: str,
+    limit: int = 5,
+    text: bool = False,
+    image: bool = True,
+) -> Json:
     """
-    Searches for articles by matching in the text of article on the Ru Wikipedia.
+    Searches for articles by full text and returns their page data in one request.
 
     Args:
         http: The HttpClient instance to use for making requests.
@@ -139,16 +177,39 @@ async def search_by_text(http: HttpClient, query: str, limit: int = 5) -> Json:
         limit: The maximum number of search results to return.
 
     Returns:
-        A Json containing the search results.
+        A Json containing the found pages; each page has a ranking `index`.
+    """
+    params = {
+        "action": "query",
+        "format": "json",
+        "generator": "search",
+        "gsrsearch": query,
+        "gsrlimit": limit,
+        "gsrnamespace": 0,
+        **_page_props(text, image),
+    }
+
+    return await http.get_json(RUWIKI_API, params=params, hedge=True)
+
+
+async def fetch_link_titles(http: HttpClient, pageid: int) -> Json:
+    """
+    Lists the titles of the articles an article links to.
+
+    Args:
+        http: The HttpClient instance to use for making requests.
+        pageid: The pageid of the linking article.
+
+    Returns:
+        A Json containing the page with its `links` (at most 500).
     """
     params = {
         "action": "query",
         "format": "json",
-        "prop": "info",
-        "list": "search",
-        "srsearch": query,
-        "srlimit": limit,
-        "srnamespace": 0,
+        "pageids": pageid,
+        "prop": "links",
+        "plnamespace": 0,
+        "pllimit": "max",
     }
 
-    return await http.get_json(RUWIKI_API, params=params)
+    return await http.get_json(RUWIKI_API, params=params, hedge=True)
@@ -1,20 +1,41 @@
+import asyncio
+import math
+import random
+
 from typing import Optional
 
+from tg_wiki.client.breaker import CircuitState
 from tg_wiki.client.http import HttpClient, HttpNotStartedError, HttpRequestError
 from tg_wiki.domain.article import Article, ArticleMeta
+from tg_wiki.wiki_service.batcher import PageidBatcher
 import tg_wiki.wiki_service.client as wiki
 
 
+RANDOM_MIN_ACCEPT_RATE = 0.1
+RANDOM_RATE_SMOOTHING = 0.2
+
+
 class WikiService:
     _http: HttpClient
 
-    def __init__(self, http: HttpClient) -> None:
+    def __init__(self, http: HttpClient, *, batch_delay_sec: float = 0.005) -> None:
         self._http = http
+        self._random_accept_rate = 0.5
+        self._batcher = PageidBatcher(
+            self._fetch_pages_by_pageid,
+            max_delay_sec=batch_delay_sec,
+            max_batch=wiki.EXTRACTS_LIMIT,
+        )
 
     @property
     def http(self) -> HttpClient:
         return self._http
 
+    @property
+    def available(self) -> bool:
+        """False while the circuit breaker for the Wikipedia API is open."""
+        return self.http.circuit_state(wiki.RUWIKI_API) is not CircuitState.OPEN
+
     @staticmethod
     def _to_article_meta(raw: dict) -> ArticleMeta:
         """
@@ -55,8 +76,16 @@ class WikiService:
         """
         meta = WikiService._to_article_meta(raw)
         extract = str(raw.get("extract", "")).strip()
-
-        return Article(meta=meta, extract=extract, lang=lang)
+        lastrevid = raw.get("lastrevid")
+        touched = raw.get("touched")
+
+        return Article(
+            meta=meta,
+            extract=extract,
+            lang=lang,
+            lastrevid=int(lastrevid) if lastrevid else None,
+            touched=str(touched) if touched else None,
+        )
 
     @staticmethod
     def _is_valid_article(
@@ -87,6 +116,65 @@ class WikiService:
                 return False
         return True
 
+    def _random_batch_size(self, n: int) -> int:
+        """
+        Estimates how many random pages to request to get `n` valid articles,
+        based on the observed acceptance rate of previous batches.
+        """
+        size = math.ceil(n / max(self._random_accept_rate, RANDOM_MIN_ACCEPT_RATE))
+        return max(1, min(size, wiki.EXTRACTS_LIMIT))
+
+    def _observe_random_batch(self, requested: int, accepted: int) -> None:
+        rate = accepted / requested
+        self._random_accept_rate += RANDOM_RATE_SMOOTHING * (
+            rate - self._random_accept_rate
+        )
+
+    @property
+    def random_accept_rate(self) -> float:
+        return self._random_accept_rate
+
+    async def get_random_articles(
+        self, n: int, min_length: int = 100, *, text: bool = True, image: bool = True
+    ) -> list[Article]:
+        """
+        Fetches a batch of random articles from the Ru Wikipedia in one request.
+
+        The batch size adapts to the share of pages rejected by length, so that a
+        single call usually yields `n` valid articles.
+
+        Args:
+            n: The desired number of valid articles.
+            min_length: The minimum length of the article's extract.
+
+        Returns:
+            A list of valid articles (may be shorter or longer than `n`).
+        """
+        if n <= 0:
+            return []
+        requested = self._random_batch_size(n)
+
+        try:
+            data = await wiki.fetch_random(
+                self.http, limit=requested, text=text, image=image
+            )
+        except (HttpRequestError, HttpNotStartedError):
+            return []
+
+        if not isinstance(data, dict):
+            return []
+        pages = data.get("query", {}).get("pages", {})
+        if not isinstance(pages, dict) or not pages:
+            return []
+
+        out = [
+            self._to_article(page)
+            for page in pages.values()
+            if self._is_valid_article(page, min_length=min_length, text_required=text)
+        ]
+        self._observe_random_batch(len(pages), len(out))
+        return out
+
     async def get_random_article(
         self, min_length: int = 100, *, text: bool = True, image: bool = True
     ) -> Optional[Article]:
@@ -96,24 +184,90 @@ class WikiService:
         Returns:
             A dictionary containing the article's information or None if no valid article was found.
         """
-        try:
-            data = await wiki.fetch_random(self.http, text=text, image=image)
-        except (HttpRequestError, HttpNotStartedError):
-            return None
+        articles = await self.get_random_articles(
+            1, min_length=min_length, text=text, image=image
+        )
+        return articles[0] if articles else None
 
+    def _valid_articles(self, data: object, min_length: int) -> list[Article]:
         if not isinstance(data, dict):
-            return None
+            return []
         pages = data.get("query", {}).get("pages", {})
-        if not pages:
-            return None
+        if not isinstance(pages, dict):
+            return []
+        return [
+            self._to_article(page)
+            for page in pages.values()
+            if self._is_valid_article(page, min_length=min_length)
+        ]
 
-        article = next(iter(pages.values()))
-        if not self._is_valid_article(
-            article, min_length=min_length, text_required=text
-        ):
-            return None
+    async def get_linked_articles(
+        self, pageid: int, n: int = wiki.EXTRACTS_LIMIT, min_length: int = 100
+    ) -> list[Article]:
+        """
+        Fetches valid articles linked from an article.
 
-        return self._to_article(article)
+        The links are listed first and a random sample of them is fetched, so
+        that repeated calls do not return the alphabetically first links.
+
+        Args:
+            pageid: The pageid of the linking article.
+            n: The maximum number of linked articles to request.
+            min_length: The minimum length of the article's extract.
+
+        Returns:
+            A list of valid articles, empty on errors.
+        """
+        try:
+            data = await wiki.fetch_link_titles(self.http, pageid)
+        except (HttpRequestError, HttpNotStartedError):
+            return []
+        if not isinstance(data, dict):
+            return []
+        titles = [
+            link["title"]
+            for page in data.get("query", {}).get("pages", {}).values()
+            for link in page.get("links", ())
+            if isinstance(link, dict) and "title" in link
+        ]
+        if not titles:
+            return []
+
+        sample = random.sample(titles, min(n, wiki.EXTRACTS_LIMIT, len(titles)))
+        try:
+            data = await wiki.fetch_by_title(self.http, sample)
+        except (HttpRequestError, HttpNotStartedError):
+            return []
+        return self._valid_articles(data, min_length)
+
+    async def get_similar_articles(
+        self, title: str, n: int = wiki.EXTRACTS_LIMIT, min_length: int = 100
+    ) -> list[Article]:
+        """
+        Fetches articles similar to the given one (CirrusSearch `morelike:`).
+
+        Args:
+            title: The title of the reference article.
+            n: The maximum number of similar articles to request.
+            min_length: The minimum length of the article's extract.
+
+        Returns:
+            A list of valid articles in ranking order, empty on errors.
+        """
+        try:
+            data = await wiki.search_pages_by_text(
+                self.http,
+                f"morelike:{title}",
+                limit=min(n, wiki.EXTRACTS_LIMIT),
+                text=True,
+            )
+        except (HttpRequestError, HttpNotStartedError):
+            return []
+        return [
+            self._to_article(page)
+            for page in self._ranked_pages(data, text=True)
+            if self._is_valid_article(page, min_length=min_length)
+        ]
 
     async def get_article_by_title(
         self, title: str, *, text: bool = True, image: bool = True
@@ -144,12 +298,60 @@ class WikiService:
 
         return self._to_article(article)
 
+    async def _fetch_pages_by_pageid(
+        self, pageids: list[int], text: bool = True, image: bool = True
+    ) -> dict[int, dict]:
+        """
+        Fetches raw pages by pageids, splitting them into API-sized requests.
+
+        Returns:
+            A dictionary mapping pageid to the raw page data of valid articles.
+        """
+        out: dict[int, dict] = {}
+        for i in range(0, len(pageids), wiki.EXTRACTS_LIMIT):
+            chunk = pageids[i : i + wiki.EXTRACTS_LIMIT]
+            data = await wiki.fetch_by_pageid(
+                self.http, [str(p) for p in chunk], text=text, image=image
+            )
+            if not isinstance(data, dict):
+                continue
+            pages = data.get("query", {}).get("pages", {})
+            if not isinstance(pages, dict):
+                continue
+            for page in pages.values():
+                if self._is_valid_article(page, text_required=text):
+                    out[int(page["pageid"])] = page
+        return out
+
+    async def get_articles_by_pageids(
+        self, pageids: list[int], *, text: bool = True, image: bool = True
+    ) -> dict[int, Article]:
+        """
+        Fetches several articles by their pageids with as few requests as possible.
+
+        Args:
+            pageids: The pageids of the articles to fetch.
+
+        Returns:
+            A dictionary mapping pageid to Article for every valid article found.
+        """
+        unique = list(dict.fromkeys(int(p) for p in pageids))
+        if not unique:
+            return {}
+        try:
+            pages = await self._fetch_pages_by_pageid(unique, text=text, image=image)
+        except (HttpRequestError, HttpNotStartedError):
+            return {}
+        return {pageid: self._to_article(page) for pageid, page in pages.items()}
+
     async def get_article_by_pageid(
         self, pageid: int, *, text: bool = True, image: bool = True
     ) -> Optional[Article]:
         """
         Fetches an article by its pageid from the Ru Wikipedia and checks if it's valid.
 
+        Concurrent lookups are micro-batched into a single multi-page request.
+
         Args:
             pageid: The pageid of the article to fetch.
 
@@ -157,92 +359,122 @@ class WikiService:
             A dictionary containing the article's information, or None if no valid article was found.
         """
         try:
-            data = await wiki.fetch_by_pageid(
-                self.http, [str(pageid)], text=text, image=image
-            )
+            return await self.find_article_by_pageid(pageid, text=text, image=image)
         except (HttpRequestError, HttpNotStartedError):
             return None
 
-        if not isinstance(data, dict):
-            return None
-        pages = data.get("query", {}).get("pages", {})
-        if not pages:
-            return None
+    async def find_article_by_pageid(
+        self, pageid: int, *, text: bool = True, image: bool = True
+    ) -> Optional[Article]:
+        """
+        Like `get_article_by_pageid`, but lets request errors propagate, so that
+        None always means the page is missing or not a valid article.
 
-        article = next(iter(pages.values()))
-        if not self._is_valid_article(article, text_required=text):
+        Args:
+            pageid: The pageid of the article to fetch.
+
+        Returns:
+            The Article, or None if Wikipedia has no valid article with this pageid.
+
+        Raises:
+            HttpClientError: If the request failed.
+        """
+        article = await self._batcher.get(pageid, text=text, image=image)
+        if article is None:
             return None
 
         return self._to_article(article)
 
+    def _ranked_pages(self, data: object, *, text: bool) -> list[dict]:
+        """
+        Extracts valid pages from a generator response in ranking order.
+        """
+        if not isinstance(data, dict):
+            return []
+        pages = data.get("query", {}).get("pages", {})
+        if not isinstance(pages, dict):
+            return []
+        valid = [
+            page
+            for page in pages.values()
+            if self._is_valid_article(page, text_required=text)
+        ]
+        valid.sort(key=lambda page: page.get("index", 0))
+        return valid
+
+    async def _search_pages(
+        self, query: str, *, limit: int, text: bool = False
+    ) -> tuple[list[dict], bool]:
+        """
+        Runs title and full-text search concurrently and merges the results,
+        title matches first, keeping each source's ranking and dropping duplicates.
+
+        Returns:
+            The merged pages and whether both searches succeeded.
+        """
+        results = await asyncio.gather(
+            wiki.search_pages_by_title(self.http, query, limit=limit, text=text),
+            wiki.search_pages_by_text(self.http, query, limit=limit, text=text),
+            return_exceptions=True,
+        )
+
+        failures = [
+            result
+            for result in results
+            if isinstance(result, (HttpRequestError, HttpNotStartedError))
+        ]
+        if len(failures) == len(results):
+            raise failures[0]
+
+        merged: dict[int, dict] = {}
+        for result in results:
+            if isinstance(result, (HttpRequestError, HttpNotStartedError)):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            for page in self._ranked_pages(result, text=text):
+                merged.setdefault(int(page["pageid"]), page)
+        return list(merged.values())[:limit], not failures
+
     async def search_articles(self, query: str, *, limit: int = 5) -> list[ArticleMeta]:
         """
         Searches for articles by query on the Ru Wikipedia.
 
+        Title and full-text search run in parallel and both return page metadata,
+        so the whole search costs about one round-trip.
+
         Args:
             query: The query to search for.
 
         Returns:
-            A list of dictionaries containing the title and URL of the found articles.
+            A list of ArticleMeta objects of the found articles in ranking order.
         """
-        titles: set[str] = set()
-
         try:
-            data_title = await wiki.search_by_title(self.http, query, limit=limit)
+            pages, _ = await self._search_pages(query, limit=limit)
         except (HttpRequestError, HttpNotStartedError):
             return []
+        return [self._to_article_meta(page) for page in pages]
 
-        if (
-            isinstance(data_title, list)
-            and len(data_title) >= 2
-            and isinstance(data_title[1], list)
-        ):
-            for title in data_title[1]:
-                if not isinstance(title, str) and not title.strip():
-                    continue
-                titles.add(title.strip())
-                if len(titles) >= limit:
-                    break
-
-        if len(titles) < limit:
-            try:
-                data_text = await wiki.search_by_text(
-                    self.http, query, limit=limit - len(titles)
-                )
-            except (HttpRequestError, HttpNotStartedError):
-                data_text = None
-
-            if isinstance(data_text, dict):
-                search_items = data_text.get("query", {}).get("search", [])
-                if isinstance(search_items, list):
-                    for item in search_items:
-                        if len(titles) >= limit:
-                            break
-                        if not isinstance(item, dict):
-                            continue
-                        title = str(item.get("title", "")).strip()
-                        if title.strip():
-                            titles.add(title)
-
-        if not titles:
-            return []
-
-        try:
-            pages_data = await wiki.fetch_by_title(self.http, list(titles))
-        except (HttpRequestError, HttpNotStartedError):
-            return []
+    async def search_full_articles(
+        self, query: str, *, limit: int = 5
+    ) -> tuple[list[Article], bool]:
+        """
+        Searches for articles by query and returns them with their extracts.
 
-        if not isinstance(pages_data, dict):
-            return []
+        Costs the same round-trips as `search_articles`; the results can be cached
+        so that opening a search result needs no further request.
 
-        pages = pages_data.get("query", {}).get("pages", {})
-        if not isinstance(pages, dict) or not pages:
-            return []
+        Args:
+            query: The query to search for.
 
-        out: list[ArticleMeta] = [
-            self._to_article_meta(page)
-            for page in pages.values()
-            if self._is_valid_article(page, text_required=False)
-        ]
+        Returns:
+            A list of Article objects of the found articles in ranking order,
+            and whether it is complete: False if one of the two searches
+            failed, in which case the list must not be cached as the answer.
 
-        return out
+        Raises:
+            HttpClientError: If neither search could be made, so that an empty
+                result always means nothing was found.
+        """
+        pages, complete = await self._search_pages(query, limit=limit, text=True)
+        return [self._to_article(page) for page in pages], complete